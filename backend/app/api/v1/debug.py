@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Dict, Any, List
+from app.core.security import get_current_admin_user
+from app.core.loop_monitor import loop_monitor
+from app.core.profiler import MAX_PROFILE_SECONDS, ProfilerBusyError, request_profiles, sampling_profiler
+from app.models.user import User
+
+router = APIRouter()
+
+@router.get("/event-loop")
+async def event_loop_status(
+    include_stacks: bool = True,
+    current_user: User = Depends(get_current_admin_user)
+) -> Dict[str, Any]:
+    """Event loop lag and the most recent blocking callbacks with their stacks"""
+    return loop_monitor.get_stats(include_stacks=include_stacks)
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def sampling_profile(
+    seconds: float = Query(10.0, gt=0, le=MAX_PROFILE_SECONDS),
+    interval: float = Query(0.01, ge=0.001, le=1.0),
+    include_idle: bool = False,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Sample this worker's threads for `seconds` and return collapsed stacks for a flame graph"""
+    try:
+        return await sampling_profiler.profile_async(seconds, interval, include_idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/profiles")
+async def list_request_profiles(current_user: User = Depends(get_current_admin_user)) -> List[Dict[str, Any]]:
+    """Per-request cProfile results held by this worker"""
+    return request_profiles.list()
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_request_profile(
+    profile_id: str,
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls|ncalls)$"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """pstats report of a request profiled with the X-Profile header"""
+    report = request_profiles.render(profile_id, sort=sort, limit=limit)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found on this worker")
+    return report
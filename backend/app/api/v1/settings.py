@@ -5,6 +5,7 @@ from pydantic import BaseModel
 import uuid
 
 from app.core.database import get_db
+from app.core.cache import CacheStrategies
 from app.core.security import get_current_user
 from app.models import User, UserProfile, UserIntegration, UserCredential, UserPreference, UserProfileDocument
 from app.integrations import integration_engine
@@ -601,8 +602,7 @@ async def clear_user_cache(
 ):
     """Clear user cache and temporary data"""
     try:
-        # TODO: Implement actual cache clearing logic
-        # This would typically clear Redis cache, temp files, etc.
+        await CacheStrategies.invalidate_user_cache(current_user.id)
 
         return {"status": "success", "message": "Cache cleared successfully"}
 
@@ -3,85 +3,492 @@ Redis-based caching system for Core Engine.
 Provides multiple caching strategies and performance optimization.
 """
 
-import redis.asyncio as redis
+import inspect
 import json
 import pickle
 import hashlib
+import math
+import random
 from typing import Any, Optional, Union, Dict, List
 from functools import wraps
 import asyncio
 import logging
-from datetime import datetime, timedelta
+import time
+import sys
+import uuid
+import zlib
+from collections import OrderedDict
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.background import BackgroundTasks
+from starlette.requests import Request
 from app.core.config import settings
+from app.core.circuit_breaker import BreakerRedis, CircuitBreaker, CONNECTION_ERRORS
+from app.core.monitoring import (
+    CACHE_ERRORS,
+    CACHE_FUNCTION_REQUESTS,
+    CACHE_OPERATION_DURATION,
+    CACHE_PAYLOAD_BYTES,
+    CACHE_REQUESTS,
+)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    import lz4.frame
+    LZ4_AVAILABLE = True
+except ImportError:
+    LZ4_AVAILABLE = False
+
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Namespace generations: bumping one makes every key in the namespace unreachable
+GENERATION_KEY_PREFIX = "cache:gen:"
+GENERATION_REFRESH_INTERVAL = 5.0  # seconds a worker trusts its cached generation
+
+# Tag sets: cache:tag:<tag> holds the full Redis keys of entries carrying the tag
+TAG_KEY_PREFIX = "cache:tag:"
+
+# Framed values start with FRAME_MAGIC followed by one header byte holding the
+# codec id (low nibble) and compression id (high nibble). Plain JSON and pickle
+# never start with a NUL byte, so unframed values written before framing
+# existed are still decoded with the caller's method.
+FRAME_MAGIC = 0x00
+CODEC_IDS = {"json": 1, "pickle": 2, "orjson": 3, "msgpack": 4}
+COMPRESSION_IDS = {"none": 0, "zlib": 1, "zstd": 2, "lz4": 3}
+CODEC_NAMES = {v: k for k, v in CODEC_IDS.items()}
+COMPRESSION_NAMES = {v: k for k, v in COMPRESSION_IDS.items()}
+
+
+def _orjson_dumps(data: Any) -> bytes:
+    return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _msgpack_dumps(data: Any) -> bytes:
+    return msgpack.packb(data, default=str, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+# Compare-and-delete so a worker never releases a lock another worker re-acquired
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache used as the L1 tier in front of Redis.
+
+    Holds the serialized bytes exactly as stored in Redis and the manager
+    decodes them on every hit, so callers never share (and cannot mutate)
+    the objects other readers get back.
+    """
+
+    def __init__(self, max_entries: int = 10000, default_ttl: int = 30):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.namespace_ttls: Dict[str, int] = {}
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    def set_namespace_ttl(self, namespace: str, ttl: int):
+        """Override the L1 TTL for a namespace (0 disables L1 for it)"""
+        self.namespace_ttls[namespace] = ttl
+
+    def ttl_for(self, namespace: str) -> int:
+        return self.namespace_ttls.get(namespace, self.default_ttl)
+
+    def get(self, cache_key: str) -> tuple:
+        """Return (found, serialized data) for a namespaced key"""
+        entry = self._entries.get(cache_key)
+        if entry is None:
+            return False, None
+
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[cache_key]
+            return False, None
+
+        self._entries.move_to_end(cache_key)
+        return True, value
+
+    def set(self, cache_key: str, value: bytes, namespace: str, ttl: Optional[int] = None):
+        """Store serialized data, bounded by the namespace TTL and the Redis TTL"""
+        l1_ttl = self.ttl_for(namespace)
+        if ttl is not None:
+            l1_ttl = min(l1_ttl, ttl)
+        if l1_ttl <= 0:
+            return
+
+        self._entries[cache_key] = (value, time.monotonic() + l1_ttl)
+        self._entries.move_to_end(cache_key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, cache_key: str):
+        self._entries.pop(cache_key, None)
+
+    def clear_namespace(self, namespace: str):
+        prefix = f"{namespace}:"
+        for cache_key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[cache_key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 class CacheManager:
     """Advanced Redis cache manager with multiple strategies"""
 
     def __init__(self):
-        self.redis_client = None
+        self._redis = None
         self.default_ttl = 3600  # 1 hour
         self.serializers = {
-            'json': (json.dumps, json.loads),
-            'pickle': (pickle.dumps, pickle.loads)
+            'json': (lambda data: json.dumps(data, default=str).encode(), json.loads),
+            'pickle': (pickle.dumps, pickle.loads),
         }
-
-    async def connect(self):
-        """Initialize Redis connection with connection pooling"""
-        try:
-            self.redis_client = redis.Redis(
-                host=getattr(settings, 'REDIS_HOST', 'localhost'),
-                port=getattr(settings, 'REDIS_PORT', 6379),
-                db=getattr(settings, 'REDIS_DB', 0),
-                password=getattr(settings, 'REDIS_PASSWORD', None),
-                max_connections=20,
-                retry_on_timeout=True,
-                socket_keepalive=True,
-                socket_keepalive_options={},
-                health_check_interval=30,
+        if ORJSON_AVAILABLE:
+            self.serializers['orjson'] = (_orjson_dumps, orjson.loads)
+        if MSGPACK_AVAILABLE:
+            self.serializers['msgpack'] = (_msgpack_dumps, _msgpack_loads)
+
+        self.compressors = {'zlib': (zlib.compress, zlib.decompress)}
+        if ZSTD_AVAILABLE:
+            self.compressors['zstd'] = (_zstd_compress, _zstd_decompress)
+        if LZ4_AVAILABLE:
+            self.compressors['lz4'] = (lz4.frame.compress, lz4.frame.decompress)
+
+        self.compression = getattr(settings, 'CACHE_COMPRESSION', 'zstd')
+        if self.compression != 'none' and self.compression not in self.compressors:
+            logger.warning(f"Cache compression '{self.compression}' unavailable, using zlib")
+            self.compression = 'zlib'
+        self.compression_threshold = getattr(settings, 'CACHE_COMPRESSION_THRESHOLD', 1024)
+        self.namespace_codecs: Dict[str, str] = {}
+        self.payload_stats: Dict[str, Dict[str, int]] = {}
+        self.local_cache: Optional[LocalCache] = None
+        if getattr(settings, 'CACHE_L1_ENABLED', False):
+            self.local_cache = LocalCache(
+                max_entries=getattr(settings, 'CACHE_L1_MAX_ENTRIES', 10000),
+                default_ttl=getattr(settings, 'CACHE_L1_DEFAULT_TTL', 30),
             )
+        self.instance_id = uuid.uuid4().hex
+        # Not shared with the rate limiter, which uses another database
+        self.breaker = CircuitBreaker("redis_cache")
+        self._invalidation_task: Optional[asyncio.Task] = None
+        self._generations: Dict[str, tuple] = {}  # namespace -> (generation, fetched_at)
+        self._purge_tasks: set = set()
+        self.tier_stats = {
+            "l1_hits": 0,
+            "l1_misses": 0,
+            "l2_hits": 0,
+            "l2_misses": 0,
+        }
+
+    @property
+    def redis_client(self):
+        """The Redis client, or None while unconfigured or its circuit is open"""
+        if self._redis is not None and self.breaker.allow():
+            return self._redis
+        return None
+
+    @redis_client.setter
+    def redis_client(self, client):
+        self._redis = client
+
+    async def connect(self, listen: bool = True):
+        """
+        Initialize Redis connection with connection pooling.
+
+        listen=False skips the pub/sub invalidation listener, for one-shot
+        clients such as maintenance tasks that keep no L1 or generations.
+        """
+        self._redis = BreakerRedis(
+            host=getattr(settings, 'REDIS_HOST', 'localhost'),
+            port=getattr(settings, 'REDIS_PORT', 6379),
+            db=getattr(settings, 'REDIS_DB', 0),
+            password=getattr(settings, 'REDIS_PASSWORD', None),
+            max_connections=20,
+            retry_on_timeout=True,
+            socket_keepalive=True,
+            socket_keepalive_options={},
+            health_check_interval=30,
+            breaker=self.breaker,
+        )
+        # The listener waits for the circuit to close, so it also covers
+        # Redis becoming reachable after startup
+        if listen:
+            self._invalidation_task = asyncio.create_task(self._listen_for_invalidations())
 
+        try:
             # Test connection
-            await self.redis_client.ping()
+            await self._redis.ping()
             logger.info("Redis cache manager connected successfully")
-
         except Exception as e:
-            logger.error(f"Failed to connect to Redis: {e}")
-            self.redis_client = None
+            logger.error(f"Failed to connect to Redis, retrying in the background: {e}")
+            self.breaker.trip(self._redis.probe)
 
     async def disconnect(self):
         """Close Redis connection"""
-        if self.redis_client:
-            await self.redis_client.close()
+        if self._invalidation_task:
+            self._invalidation_task.cancel()
+            self._invalidation_task = None
+
+        self.breaker.stop()
+        if self._redis:
+            await self._redis.close()
             logger.info("Redis cache manager disconnected")
 
-    def _generate_key(self, key: str, namespace: str = "core") -> str:
-        """Generate namespaced cache key"""
-        return f"{namespace}:{key}"
+    def _generate_key(self, key: str, namespace: str = "core", generation: int = 0) -> str:
+        """Generate namespaced, generation-versioned cache key"""
+        return f"{namespace}:v{generation}:{key}"
+
+    async def _get_generation(self, namespace: str, refresh: bool = False) -> int:
+        """Current generation of a namespace, cached locally for a few seconds"""
+        cached_generation = self._generations.get(namespace)
+        now = time.monotonic()
+        if (
+            not refresh
+            and cached_generation is not None
+            and now - cached_generation[1] < GENERATION_REFRESH_INTERVAL
+        ):
+            return cached_generation[0]
+
+        pipe = self.redis_client.pipeline()
+        self._seed_generation(pipe, namespace)
+        pipe.get(f"{GENERATION_KEY_PREFIX}{namespace}")
+        _, value = await pipe.execute()
+        generation = int(value)
+        self._generations[namespace] = (generation, now)
+        return generation
 
-    def _serialize(self, data: Any, method: str = 'json') -> bytes:
-        """Serialize data for caching"""
+    @staticmethod
+    def _seed_generation(pipe, namespace: str):
+        """
+        Queue creation of a missing generation key.
+
+        Generation keys are evictable under allkeys-lru. Restarting a lost one at
+        0 would make entries from earlier generations reachable again, so it is
+        seeded from the clock, which is always past any generation it had.
+        """
+        pipe.set(f"{GENERATION_KEY_PREFIX}{namespace}", time.time_ns(), nx=True)
+
+    async def _resolve_key(self, key: str, namespace: str = "core") -> str:
+        """Full Redis key for a logical key in the namespace's current generation"""
+        generation = await self._get_generation(namespace)
+        return self._generate_key(key, namespace, generation)
+
+    async def _publish_invalidation(self, namespace: Optional[str],
+                                    cache_keys: Optional[List[str]] = None,
+                                    generation: Optional[int] = None):
+        """Tell other workers to drop full keys from L1, or adopt a new namespace generation"""
+        if not self.redis_client:
+            return
+        if cache_keys is not None and self.local_cache is None:
+            return
+
+        message = json.dumps({
+            "origin": self.instance_id,
+            "namespace": namespace,
+            "cache_keys": cache_keys,
+            "generation": generation,
+        })
         try:
-            if method == 'json':
-                return json.dumps(data, default=str).encode()
-            elif method == 'pickle':
-                return pickle.dumps(data)
-            else:
-                raise ValueError(f"Unknown serialization method: {method}")
+            await self.redis_client.publish(INVALIDATION_CHANNEL, message)
+        except Exception as e:
+            logger.error(f"Cache invalidation publish error for {namespace}: {e}")
+
+    def _apply_invalidation(self, message: Dict[str, Any]):
+        """Apply an invalidation message received from another worker"""
+        if message.get("origin") == self.instance_id:
+            return
+
+        namespace = message.get("namespace")
+        cache_keys = message.get("cache_keys")
+        generation = message.get("generation")
+
+        if cache_keys is None:
+            if generation is not None:
+                self._generations[namespace] = (generation, time.monotonic())
+            if self.local_cache is not None:
+                self.local_cache.clear_namespace(namespace)
+        elif self.local_cache is not None:
+            for cache_key in cache_keys:
+                self.local_cache.delete(cache_key)
+
+    async def _listen_for_invalidations(self):
+        """Keep L1 and namespace generations coherent across workers via Redis pub/sub"""
+        while self._redis is not None:
+            await self.breaker.wait_closed()
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        self._apply_invalidation(json.loads(message["data"]))
+                    except Exception as e:
+                        logger.error(f"Invalid cache invalidation message: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Messages may have been missed while disconnected, so start clean
+                logger.error(f"Cache invalidation listener error: {e}")
+                if isinstance(e, CONNECTION_ERRORS):
+                    self.breaker.record_failure(self._redis.probe)
+                self._generations.clear()
+                if self.local_cache is not None:
+                    self.local_cache.clear()
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+    def configure_namespace(self, namespace: str, codec: Optional[str] = None,
+                            l1_ttl: Optional[int] = None):
+        """
+        Set per-namespace cache options.
+
+        codec replaces the default 'json' method for the namespace (for example
+        'orjson' or 'msgpack'); callers that explicitly ask for 'pickle' keep it.
+        l1_ttl overrides the in-process tier TTL for the namespace.
+        """
+        if codec is not None:
+            if codec not in self.serializers:
+                logger.warning(f"Cache codec '{codec}' unavailable for {namespace}, using json")
+                codec = 'json'
+            self.namespace_codecs[namespace] = codec
+        if l1_ttl is not None and self.local_cache is not None:
+            self.local_cache.set_namespace_ttl(namespace, l1_ttl)
+
+    def _codec_for(self, namespace: str, method: str) -> str:
+        if method == 'json':
+            return self.namespace_codecs.get(namespace, 'json')
+        return method
+
+    def _count(self, namespace: str, tier: str, result: str, amount: int = 1):
+        """Record lookup outcomes in the worker counters and in Prometheus"""
+        self.tier_stats[f"{tier}_{'misses' if result == 'miss' else 'hits'}"] += amount
+        CACHE_REQUESTS.labels(namespace=namespace, tier=tier, result=result).inc(amount)
+
+    def _error(self, namespace: Optional[str], operation: str):
+        CACHE_ERRORS.labels(namespace=namespace or "", operation=operation).inc()
+
+    def _observe(self, namespace: str, operation: str, start: float):
+        CACHE_OPERATION_DURATION.labels(namespace=namespace, operation=operation).observe(
+            time.perf_counter() - start
+        )
+
+    def _record_payload(self, namespace: str, serialized: int, stored: int):
+        stats = self.payload_stats.setdefault(namespace, {
+            "values": 0,
+            "compressed_values": 0,
+            "serialized_bytes": 0,
+            "stored_bytes": 0,
+        })
+        stats["values"] += 1
+        stats["serialized_bytes"] += serialized
+        stats["stored_bytes"] += stored
+        if stored < serialized:
+            stats["compressed_values"] += 1
+
+        CACHE_PAYLOAD_BYTES.labels(namespace=namespace, stage="serialized").observe(serialized)
+        CACHE_PAYLOAD_BYTES.labels(namespace=namespace, stage="stored").observe(stored)
+
+    def _serialize(self, data: Any, method: str = 'json', namespace: str = "core") -> bytes:
+        """Serialize data for caching, compressing values above the size threshold"""
+        try:
+            codec = self._codec_for(namespace, method)
+            if codec not in self.serializers:
+                raise ValueError(f"Unknown serialization method: {codec}")
+
+            payload = self.serializers[codec][0](data)
+            serialized_size = len(payload)
+
+            compression = 'none'
+            if self.compression != 'none' and serialized_size >= self.compression_threshold:
+                compressed = self.compressors[self.compression][0](payload)
+                if len(compressed) < serialized_size:
+                    payload = compressed
+                    compression = self.compression
+
+            header = CODEC_IDS[codec] | (COMPRESSION_IDS[compression] << 4)
+            framed = bytes((FRAME_MAGIC, header)) + payload
+            self._record_payload(namespace, serialized_size, len(framed))
+            return framed
+
         except Exception as e:
             logger.error(f"Serialization error: {e}")
             raise
 
     def _deserialize(self, data: bytes, method: str = 'json') -> Any:
-        """Deserialize cached data"""
+        """Deserialize cached data, framed or legacy"""
         try:
-            if method == 'json':
-                return json.loads(data.decode())
-            elif method == 'pickle':
-                return pickle.loads(data)
-            else:
-                raise ValueError(f"Unknown deserialization method: {method}")
+            if len(data) < 2 or data[0] != FRAME_MAGIC:
+                # Unframed value written before codecs were introduced
+                if method not in ('json', 'pickle'):
+                    method = 'json'
+                return self.serializers[method][1](data)
+
+            header = data[1]
+            codec = CODEC_NAMES.get(header & 0x0F)
+            compression = COMPRESSION_NAMES.get(header >> 4)
+            if codec not in self.serializers:
+                raise ValueError(f"Unknown deserialization method: {codec}")
+            if compression is None or (compression != 'none' and compression not in self.compressors):
+                raise ValueError(f"Unknown compression: {header >> 4}")
+
+            payload = data[2:]
+            if compression != 'none':
+                payload = self.compressors[compression][1](payload)
+            return self.serializers[codec][1](payload)
+
         except Exception as e:
             logger.error(f"Deserialization error: {e}")
             raise
@@ -92,34 +499,77 @@ class CacheManager:
             return None
 
         try:
-            cache_key = self._generate_key(key, namespace)
+            cache_key = await self._resolve_key(key, namespace)
+
+            if self.local_cache is not None:
+                found, data = self.local_cache.get(cache_key)
+                if found:
+                    self._count(namespace, "l1", "hit")
+                    return self._deserialize(data, method)
+                self._count(namespace, "l1", "miss")
+
+            start = time.perf_counter()
             data = await self.redis_client.get(cache_key)
+            self._observe(namespace, "get", start)
 
             if data is None:
+                self._count(namespace, "l2", "miss")
                 return None
 
-            return self._deserialize(data, method)
+            self._count(namespace, "l2", "hit")
+            value = self._deserialize(data, method)
+
+            if self.local_cache is not None:
+                self.local_cache.set(cache_key, data, namespace)
+
+            return value
 
         except Exception as e:
             logger.error(f"Cache get error for key {key}: {e}")
+            self._error(namespace, "get")
             return None
 
+    def _add_tag_commands(self, pipe, cache_key: str, tags: List[str], ttl: int):
+        """Queue commands recording cache_key under each tag set"""
+        for tag in tags:
+            tag_key = f"{TAG_KEY_PREFIX}{tag}"
+            pipe.sadd(tag_key, cache_key)
+            # Keep the tag set alive as long as its longest-lived member
+            pipe.expire(tag_key, ttl, nx=True)
+            pipe.expire(tag_key, ttl, gt=True)
+
     async def set(self, key: str, value: Any, ttl: Optional[int] = None,
-                  namespace: str = "core", method: str = 'json') -> bool:
-        """Set value in cache"""
+                  namespace: str = "core", method: str = 'json',
+                  tags: Optional[List[str]] = None) -> bool:
+        """Set value in cache, optionally tagging it for invalidate_tags()"""
         if not self.redis_client:
             return False
 
         try:
-            cache_key = self._generate_key(key, namespace)
-            data = self._serialize(value, method)
+            generation = await self._get_generation(namespace)
+            cache_key = self._generate_key(key, namespace, generation)
+            data = self._serialize(value, method, namespace)
             ttl = ttl or self.default_ttl
 
-            result = await self.redis_client.setex(cache_key, ttl, data)
+            start = time.perf_counter()
+            if tags:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.setex(cache_key, ttl, data)
+                self._add_tag_commands(pipe, cache_key, tags, ttl)
+                result = (await pipe.execute())[0]
+            else:
+                result = await self.redis_client.setex(cache_key, ttl, data)
+            self._observe(namespace, "set", start)
+
+            if self.local_cache is not None:
+                self.local_cache.set(cache_key, data, namespace, ttl)
+                await self._publish_invalidation(namespace, [cache_key])
+
             return bool(result)
 
         except Exception as e:
             logger.error(f"Cache set error for key {key}: {e}")
+            self._error(namespace, "set")
             return False
 
     async def delete(self, key: str, namespace: str = "core") -> bool:
@@ -128,38 +578,321 @@ class CacheManager:
             return False
 
         try:
-            cache_key = self._generate_key(key, namespace)
+            generation = await self._get_generation(namespace)
+            cache_key = self._generate_key(key, namespace, generation)
             result = await self.redis_client.delete(cache_key)
+
+            if self.local_cache is not None:
+                self.local_cache.delete(cache_key)
+                await self._publish_invalidation(namespace, [cache_key])
+
             return bool(result)
 
         except Exception as e:
             logger.error(f"Cache delete error for key {key}: {e}")
+            self._error(namespace, "delete")
             return False
 
-    async def clear_namespace(self, namespace: str) -> int:
-        """Clear all keys in a namespace"""
-        if not self.redis_client:
+    async def get_many(self, keys: List[str], namespace: str = "core",
+                       method: str = 'json') -> Dict[str, Any]:
+        """
+        Get several keys with a single MGET.
+
+        Returns only the hits, keyed by the logical key, so callers can load
+        the missing keys from the database and pass them to set_many.
+        """
+        if not self.redis_client or not keys:
+            return {}
+
+        try:
+            generation = await self._get_generation(namespace)
+            results: Dict[str, Any] = {}
+            remote_keys = []
+
+            for key in keys:
+                cache_key = self._generate_key(key, namespace, generation)
+                if self.local_cache is not None:
+                    found, data = self.local_cache.get(cache_key)
+                    if found:
+                        results[key] = self._deserialize(data, method)
+                        continue
+                remote_keys.append(key)
+
+            if self.local_cache is not None:
+                self._count(namespace, "l1", "hit", len(results))
+                self._count(namespace, "l1", "miss", len(remote_keys))
+
+            if not remote_keys:
+                return results
+
+            start = time.perf_counter()
+            values = await self.redis_client.mget(
+                [self._generate_key(key, namespace, generation) for key in remote_keys]
+            )
+            self._observe(namespace, "get_many", start)
+
+            l2_hits = sum(1 for data in values if data is not None)
+            self._count(namespace, "l2", "hit", l2_hits)
+            self._count(namespace, "l2", "miss", len(values) - l2_hits)
+
+            for key, data in zip(remote_keys, values):
+                if data is None:
+                    continue
+
+                value = self._deserialize(data, method)
+                results[key] = value
+
+                if self.local_cache is not None:
+                    self.local_cache.set(
+                        self._generate_key(key, namespace, generation), data, namespace
+                    )
+
+            return results
+
+        except Exception as e:
+            logger.error(f"Cache get_many error for {len(keys)} keys in {namespace}: {e}")
+            self._error(namespace, "get_many")
+            return {}
+
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None,
+                       namespace: str = "core", method: str = 'json',
+                       tags: Optional[Dict[str, List[str]]] = None) -> bool:
+        """
+        Set several keys with one pipelined round trip of SETEX commands.
+
+        tags optionally maps a key to the tags its entry should carry.
+        """
+        if not self.redis_client or not items:
+            return False
+
+        try:
+            generation = await self._get_generation(namespace)
+            ttl = ttl or self.default_ttl
+            cache_keys = {key: self._generate_key(key, namespace, generation) for key in items}
+
+            payloads = {key: self._serialize(value, method, namespace) for key, value in items.items()}
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, data in payloads.items():
+                pipe.setex(cache_keys[key], ttl, data)
+            for key, key_tags in (tags or {}).items():
+                if key in cache_keys and key_tags:
+                    self._add_tag_commands(pipe, cache_keys[key], key_tags, ttl)
+            start = time.perf_counter()
+            results = await pipe.execute()
+            self._observe(namespace, "set_many", start)
+
+            if self.local_cache is not None:
+                for key, data in payloads.items():
+                    self.local_cache.set(cache_keys[key], data, namespace, ttl)
+                await self._publish_invalidation(namespace, list(cache_keys.values()))
+
+            return all(results[:len(items)])
+
+        except Exception as e:
+            logger.error(f"Cache set_many error for {len(items)} keys in {namespace}: {e}")
+            self._error(namespace, "set_many")
+            return False
+
+    async def delete_many(self, keys: List[str], namespace: str = "core") -> int:
+        """Delete several keys in one round trip, returning how many existed"""
+        if not self.redis_client or not keys:
+            return 0
+
+        try:
+            generation = await self._get_generation(namespace)
+            cache_keys = [self._generate_key(key, namespace, generation) for key in keys]
+            result = await self.redis_client.delete(*cache_keys)
+
+            if self.local_cache is not None:
+                for cache_key in cache_keys:
+                    self.local_cache.delete(cache_key)
+                await self._publish_invalidation(namespace, cache_keys)
+
+            return result
+
+        except Exception as e:
+            logger.error(f"Cache delete_many error for {len(keys)} keys in {namespace}: {e}")
+            self._error(namespace, "delete_many")
+            return 0
+
+    async def invalidate_tags(self, tags: List[str]) -> int:
+        """Evict every entry carrying any of the tags, returning how many were deleted"""
+        if not self.redis_client or not tags:
             return 0
 
         try:
-            pattern = f"{namespace}:*"
-            keys = await self.redis_client.keys(pattern)
+            tag_keys = [f"{TAG_KEY_PREFIX}{tag}" for tag in tags]
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            member_sets = await pipe.execute()
+
+            cache_keys = sorted({
+                member.decode() if isinstance(member, bytes) else member
+                for members in member_sets
+                for member in members
+            })
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            if cache_keys:
+                pipe.delete(*cache_keys)
+            pipe.delete(*tag_keys)
+            results = await pipe.execute()
+            deleted = results[0] if cache_keys else 0
+
+            if self.local_cache is not None and cache_keys:
+                for cache_key in cache_keys:
+                    self.local_cache.delete(cache_key)
+                await self._publish_invalidation(None, cache_keys)
+
+            logger.debug(f"Invalidated {deleted} cache entries for tags {tags}")
+            return deleted
+
+        except Exception as e:
+            logger.error(f"Cache tag invalidation error for {tags}: {e}")
+            self._error(None, "invalidate_tags")
+            return 0
 
-            if keys:
-                result = await self.redis_client.delete(*keys)
-                logger.info(f"Cleared {result} keys from namespace {namespace}")
-                return result
+    async def clear_namespace(self, namespace: str, purge: bool = False) -> int:
+        """
+        Invalidate every key in a namespace in O(1) by bumping its generation.
 
+        Old keys become unreachable immediately and age out by TTL. Pass purge=True
+        to also reclaim their memory with a background SCAN. Returns the new
+        generation, or 0 if nothing was invalidated.
+        """
+        if not self.redis_client:
             return 0
 
+        try:
+            pipe = self.redis_client.pipeline()
+            self._seed_generation(pipe, namespace)
+            pipe.incr(f"{GENERATION_KEY_PREFIX}{namespace}")
+            _, generation = await pipe.execute()
+            self._generations[namespace] = (generation, time.monotonic())
+
+            if self.local_cache is not None:
+                self.local_cache.clear_namespace(namespace)
+            await self._publish_invalidation(namespace, generation=generation)
+
+            logger.info(f"Invalidated namespace {namespace} (generation {generation})")
+
+            if purge:
+                task = asyncio.create_task(self.purge_stale_keys(namespace))
+                self._purge_tasks.add(task)
+                task.add_done_callback(self._purge_tasks.discard)
+
+            return generation
+
         except Exception as e:
             logger.error(f"Cache clear namespace error for {namespace}: {e}")
+            self._error(namespace, "clear_namespace")
+            return 0
+
+    async def purge_stale_keys(self, namespace: str, batch_size: int = 500) -> int:
+        """Delete keys left behind by older generations of a namespace using SCAN"""
+        if not self.redis_client:
+            return 0
+
+        try:
+            current = await self._get_generation(namespace, refresh=True)
+            prefix = f"{namespace}:v"
+            deleted = 0
+            stale = []
+
+            async for raw_key in self.redis_client.scan_iter(match=f"{prefix}*", count=batch_size):
+                full_key = raw_key.decode() if isinstance(raw_key, bytes) else raw_key
+                generation = full_key[len(prefix):].split(":", 1)[0]
+                if generation.isdigit() and int(generation) < current:
+                    stale.append(full_key)
+
+                if len(stale) >= batch_size:
+                    deleted += await self.redis_client.unlink(*stale)
+                    stale = []
+
+            if stale:
+                deleted += await self.redis_client.unlink(*stale)
+
+            if deleted:
+                logger.info(f"Purged {deleted} stale keys from namespace {namespace}")
+            return deleted
+
+        except Exception as e:
+            logger.error(f"Cache purge error for {namespace}: {e}")
+            return 0
+
+    async def purge_all_stale_keys(self, batch_size: int = 500) -> int:
+        """Run purge_stale_keys for every namespace with a generation key"""
+        if not self.redis_client:
             return 0
 
+        total = 0
+        try:
+            async for raw_key in self.redis_client.scan_iter(
+                match=f"{GENERATION_KEY_PREFIX}*", count=batch_size
+            ):
+                gen_key = raw_key.decode() if isinstance(raw_key, bytes) else raw_key
+                total += await self.purge_stale_keys(gen_key[len(GENERATION_KEY_PREFIX):], batch_size)
+        except Exception as e:
+            logger.error(f"Cache purge error: {e}")
+        return total
+
+    async def acquire_lock(self, key: str, namespace: str = "core",
+                           timeout: float = 10.0) -> Optional[str]:
+        """
+        Try to take a short-lived recompute lock for a key.
+
+        Returns a token when the lock was acquired (an empty token when Redis is
+        unavailable, so callers proceed unlocked), or None when another process
+        already holds it.
+        """
+        if not self.redis_client:
+            return ""
+
+        try:
+            lock_key = await self._resolve_key(f"lock:{key}", namespace)
+            token = uuid.uuid4().hex
+            acquired = await self.redis_client.set(
+                lock_key, token, nx=True, px=int(timeout * 1000)
+            )
+            return token if acquired else None
+
+        except Exception as e:
+            logger.error(f"Cache lock acquire error for key {key}: {e}")
+            return ""
+
+    async def release_lock(self, key: str, token: str, namespace: str = "core") -> bool:
+        """Release a recompute lock if it is still owned by this token"""
+        if not self.redis_client or not token:
+            return False
+
+        try:
+            lock_key = await self._resolve_key(f"lock:{key}", namespace)
+            result = await self.redis_client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            return bool(result)
+
+        except Exception as e:
+            logger.error(f"Cache lock release error for key {key}: {e}")
+            return False
+
+    async def wait_for(self, key: str, namespace: str = "core", method: str = 'json',
+                       timeout: float = 5.0, interval: float = 0.05) -> Optional[Any]:
+        """Poll for a key being filled by another process, up to timeout seconds"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(interval)
+            value = await self.get(key, namespace, method)
+            if value is not None:
+                return value
+            interval = min(interval * 2, 0.5)
+        return None
+
     async def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
         if not self.redis_client:
-            return {"status": "disconnected"}
+            return {"status": "disconnected", "circuit": self.breaker.get_stats()}
 
         try:
             info = await self.redis_client.info()
@@ -173,13 +906,38 @@ class CacheManager:
                 "hit_rate": self._calculate_hit_rate(
                     info.get("keyspace_hits", 0),
                     info.get("keyspace_misses", 0)
-                )
+                ),
+                "tiers": self.get_tier_stats(),
+                "payloads": self.get_payload_stats(),
             }
 
         except Exception as e:
             logger.error(f"Cache stats error: {e}")
             return {"status": "error", "error": str(e)}
 
+    def get_tier_stats(self) -> Dict[str, Any]:
+        """Per-tier hit/miss counters for this worker"""
+        stats = dict(self.tier_stats)
+        stats["l1_enabled"] = self.local_cache is not None
+        stats["l1_hit_rate"] = self._calculate_hit_rate(stats["l1_hits"], stats["l1_misses"])
+        stats["l2_hit_rate"] = self._calculate_hit_rate(stats["l2_hits"], stats["l2_misses"])
+        if self.local_cache is not None:
+            stats["l1_size"] = len(self.local_cache)
+            stats["l1_evictions"] = self.local_cache.evictions
+        return stats
+
+    def get_payload_stats(self) -> Dict[str, Any]:
+        """Serialized vs stored byte counts per namespace for this worker"""
+        stats = {}
+        for namespace, counts in self.payload_stats.items():
+            stats[namespace] = dict(counts)
+            stats[namespace]["codec"] = self.namespace_codecs.get(namespace, 'json')
+            stats[namespace]["compression_ratio"] = (
+                counts["stored_bytes"] / counts["serialized_bytes"]
+                if counts["serialized_bytes"] else 1.0
+            )
+        return stats
+
     def _calculate_hit_rate(self, hits: int, misses: int) -> float:
         """Calculate cache hit rate"""
         total = hits + misses
@@ -190,39 +948,243 @@ class CacheManager:
 cache_manager = CacheManager()
 
 
+# Argument types that never influence a cached result and are left out of keys
+_skip_key_types: tuple = (AsyncSession, Session, Request, BackgroundTasks)
+
+# Type -> function returning the identity of an argument of that type
+_key_extractors: Dict[type, callable] = {}
+
+# Classes keyed by name alone that have already been warned about
+_warned_key_types: set = set()
+
+
+def register_key_extractor(cls: type, extractor: callable):
+    """Key arguments of type cls (and subclasses) by extractor(value)"""
+    _key_extractors[cls] = extractor
+
+
+def skip_key_argument_type(cls: type):
+    """Leave arguments of type cls out of generated cache keys"""
+    global _skip_key_types
+    if cls not in _skip_key_types:
+        _skip_key_types = _skip_key_types + (cls,)
+
+
+def _uses_request_scope(args: tuple, kwargs: dict) -> bool:
+    """Whether a call was passed an argument bound to the caller, such as its session"""
+    return any(isinstance(value, _skip_key_types) for value in (*args, *kwargs.values()))
+
+
+def _fast_hash(data: bytes) -> str:
+    """Non-cryptographic 128-bit hash for cache keys"""
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _orm_identity(value: Any, state: Any) -> str:
+    """Primary key plus updated_at (when present) of a mapped instance"""
+    identity = state.identity if state.identity is not None else ("transient", id(value))
+    part = f"{type(value).__name__}{identity!r}"
+    updated_at = getattr(value, "updated_at", None) if "updated_at" in state.dict else None
+    if updated_at is not None:
+        part += f"@{updated_at.isoformat()}"
+    return part
+
+
+def _key_part(value: Any) -> str:
+    """Stable string form of one argument"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return repr(value)
+
+    for cls in type(value).__mro__:
+        extractor = _key_extractors.get(cls)
+        if extractor is not None:
+            return f"{type(value).__name__}({extractor(value)!r})"
+
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(_key_part(item) for item in value) + "]"
+    if isinstance(value, (set, frozenset)):
+        return "{" + ",".join(sorted(_key_part(item) for item in value)) + "}"
+    if isinstance(value, dict):
+        return "{" + ",".join(
+            f"{_key_part(k)}:{_key_part(v)}"
+            for k, v in sorted(value.items(), key=lambda item: repr(item[0]))
+        ) + "}"
+
+    state = getattr(value, "_sa_instance_state", None)
+    if state is not None:
+        return _orm_identity(value, state)
+
+    if isinstance(value, BaseModel):
+        return f"{type(value).__name__}{value.model_dump_json()}"
+
+    if type(value).__repr__ is object.__repr__:
+        # Default reprs embed the memory address; services and other stateless
+        # helpers are keyed by class, as before. Instances with state would all
+        # share one key, so say so once per class
+        cls = type(value)
+        if cls not in _warned_key_types:
+            _warned_key_types.add(cls)
+            logger.warning(
+                f"Cache key for {cls.__module__}.{cls.__qualname__} arguments uses only the class name, "
+                f"so every instance shares one key; call register_key_extractor({cls.__qualname__}, ...) "
+                f"or define __repr__ if instances differ"
+            )
+        return cls.__qualname__
+
+    return repr(value)
+
+
 def cache_key_generator(*args, **kwargs) -> str:
-    """Generate a unique cache key from function arguments"""
-    key_parts = []
+    """
+    Generate a unique cache key from function arguments.
+
+    Sessions, requests and other registered non-key types are skipped, ORM
+    instances are keyed by primary key and updated_at, and types with a
+    registered extractor use it. Objects with the default repr are keyed by
+    class name alone, with a warning the first time each class is seen.
+    """
+    key_parts = [
+        _key_part(arg) for arg in args
+        if not isinstance(arg, _skip_key_types)
+    ]
+    key_parts.extend(
+        f"{k}={_key_part(v)}" for k, v in sorted(kwargs.items())
+        if not isinstance(v, _skip_key_types)
+    )
+
+    return _fast_hash("|".join(key_parts).encode())
+
+
+# In-flight computations per cache key, shared by all callers in this worker
+_inflight: Dict[str, asyncio.Task] = {}
 
-    # Add positional arguments
-    for arg in args:
-        if hasattr(arg, '__dict__'):
-            # For objects, use their class name and relevant attributes
-            key_parts.append(f"{arg.__class__.__name__}")
-        else:
-            key_parts.append(str(arg))
 
-    # Add keyword arguments
-    for k, v in sorted(kwargs.items()):
-        key_parts.append(f"{k}:{v}")
+def _start_flight(key: str, compute) -> asyncio.Task:
+    """Return the in-flight task for key, starting compute() if there is none"""
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(compute())
+        _inflight[key] = task
 
-    # Create hash of the combined key
-    key_string = "|".join(key_parts)
-    return hashlib.md5(key_string.encode()).hexdigest()
+        def _done(finished: asyncio.Task):
+            if _inflight.get(key) is finished:
+                del _inflight[key]
+            # Mark the exception as retrieved even if every caller was cancelled
+            if not finished.cancelled() and finished.exception() is not None:
+                logger.debug(f"Cache computation for {key} failed: {finished.exception()}")
+
+        task.add_done_callback(_done)
+    return task
+
+
+async def _single_flight(key: str, compute) -> Any:
+    """Run compute() once per key; concurrent callers await the same task"""
+    # Shield so one cancelled caller does not cancel the work for the others
+    return await asyncio.shield(_start_flight(key, compute))
+
+
+def _make_entry(value: Any, ttl: int, compute_time: float) -> Dict[str, Any]:
+    """Wrap a cached() result with its soft expiry and recompute cost"""
+    return {"__cached__": 1, "value": value, "soft_expiry": time.time() + ttl,
+            "delta": compute_time}
+
+
+def _should_refresh(entry: Dict[str, Any], beta: float) -> bool:
+    """
+    True once the soft expiry has passed, or earlier with XFetch probability.
+
+    XFetch (Vattani et al.) refreshes when now - delta * beta * ln(rand) exceeds
+    the expiry, so expensive entries are refreshed earlier and refreshes spread out
+    instead of lining up on the TTL boundary.
+    """
+    now = time.time()
+    if now >= entry["soft_expiry"]:
+        return True
+    if beta <= 0:
+        return False
+    return now - entry["delta"] * beta * math.log(1.0 - random.random()) >= entry["soft_expiry"]
 
 
 def cached(ttl: int = 3600, namespace: str = "core", method: str = 'json',
-           key_func: Optional[callable] = None):
+           key_func: Optional[callable] = None, single_flight: bool = True,
+           lock_timeout: float = 10.0, lock_wait: float = 5.0,
+           stale_ttl: int = 0, early_refresh_beta: float = 0.0,
+           tags: Optional[Union[List[str], callable]] = None):
     """
     Decorator for caching function results
 
     Args:
-        ttl: Time to live in seconds
+        ttl: Time to live in seconds (soft expiry)
         namespace: Cache namespace
         method: Serialization method ('json' or 'pickle')
         key_func: Custom key generation function
+        single_flight: Coalesce concurrent misses for the same key into one
+            computation, in this worker and across workers via a Redis lock.
+            Calls passed a request-bound argument (see stale_ttl) only take
+            the Redis lock, and compute in the caller's own task
+        lock_timeout: Expiry of the cross-worker recompute lock in seconds
+        lock_wait: How long to wait for another worker to fill the key before
+            computing it anyway
+        stale_ttl: Seconds past ttl during which the stale value is still served
+            while a background task refreshes it (hard expiry is ttl + stale_ttl).
+            Calls passed a request-bound argument (an AsyncSession, Session,
+            Request or other skip_key_argument_type() type) are never refreshed
+            in the background, since the refresh would use that object after
+            or alongside the caller: they recompute in the request once the
+            ttl has passed and skip early refreshes
+        early_refresh_beta: XFetch beta for probabilistic early refresh; 0 disables,
+            1.0 is the usual choice and larger values refresh earlier
+        tags: Tags for invalidate_tags(), either a list or a function called with
+            the decorated function's arguments, e.g.
+            ``lambda user_id, *args, **kwargs: [f"user:{user_id}"]``
     """
     def decorator(func):
+        function_name = f"{func.__module__}.{func.__name__}"
+        function_requests = {
+            result: CACHE_FUNCTION_REQUESTS.labels(
+                function=function_name, namespace=namespace, result=result
+            )
+            for result in ("hit", "stale", "miss")
+        }
+
+        async def call_func(*args, **kwargs):
+            # Handle both sync and async functions
+            if asyncio.iscoroutinefunction(func):
+                return await func(*args, **kwargs)
+            return func(*args, **kwargs)
+
+        async def fill(cache_key, args, kwargs):
+            start = time.monotonic()
+            result = await call_func(*args, **kwargs)
+            entry = _make_entry(result, ttl, time.monotonic() - start)
+            entry_tags = tags(*args, **kwargs) if callable(tags) else tags
+            await cache_manager.set(
+                cache_key, entry, ttl + stale_ttl, namespace, method, tags=entry_tags
+            )
+            return entry
+
+        async def compute_and_fill(cache_key, args, kwargs, wait: bool = True):
+            token = await cache_manager.acquire_lock(cache_key, namespace, lock_timeout)
+            if token is None:
+                if not wait:
+                    # Another worker is already refreshing this key
+                    return None
+                # Another worker is recomputing this key; wait for it to land
+                entry = await cache_manager.wait_for(
+                    cache_key, namespace, method, timeout=lock_wait
+                )
+                if entry is not None:
+                    return entry
+                logger.debug(f"Timed out waiting for fill of {cache_key}")
+
+            try:
+                return await fill(cache_key, args, kwargs)
+            finally:
+                if token:
+                    await cache_manager.release_lock(cache_key, token, namespace)
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # Generate cache key
@@ -232,25 +1194,55 @@ def cached(ttl: int = 3600, namespace: str = "core", method: str = 'json',
                 func_name = f"{func.__module__}.{func.__name__}"
                 args_key = cache_key_generator(*args, **kwargs)
                 cache_key = f"{func_name}:{args_key}"
+            flight_key = f"{namespace}:{cache_key}"
 
             # Try to get from cache
-            cached_result = await cache_manager.get(cache_key, namespace, method)
-            if cached_result is not None:
+            entry = await cache_manager.get(cache_key, namespace, method)
+            if isinstance(entry, dict) and entry.get("__cached__"):
+                if _should_refresh(entry, early_refresh_beta):
+                    if not _uses_request_scope(args, kwargs):
+                        # Serve the current value and refresh it in the background
+                        logger.debug(f"Cache refresh scheduled for {cache_key}")
+                        function_requests["stale"].inc()
+                        _start_flight(
+                            flight_key,
+                            lambda: compute_and_fill(cache_key, args, kwargs, wait=False),
+                        )
+                        return entry["value"]
+
+                    if time.time() >= entry["soft_expiry"]:
+                        # The caller's session cannot be shared with a background
+                        # task, so recompute within the request
+                        logger.debug(f"Cache expired for {cache_key}, recomputing in request")
+                        function_requests["miss"].inc()
+                        return (await fill(cache_key, args, kwargs))["value"]
+                    # Early refresh is only an optimisation; skip it
+
                 logger.debug(f"Cache hit for {cache_key}")
-                return cached_result
+                function_requests["hit"].inc()
+                return entry["value"]
 
             # Execute function and cache result
             logger.debug(f"Cache miss for {cache_key}")
+            function_requests["miss"].inc()
 
-            # Handle both sync and async functions
-            if asyncio.iscoroutinefunction(func):
-                result = await func(*args, **kwargs)
-            else:
-                result = func(*args, **kwargs)
+            if not single_flight:
+                return (await fill(cache_key, args, kwargs))["value"]
 
-            # Cache the result
-            await cache_manager.set(cache_key, result, ttl, namespace, method)
-            return result
+            if _uses_request_scope(args, kwargs):
+                # A shared, shielded flight would run on the first caller's
+                # session outside its task, and keep using it after that caller
+                # is cancelled; rely on the Redis lock alone and compute here
+                entry = await compute_and_fill(cache_key, args, kwargs)
+            else:
+                entry = await _single_flight(
+                    flight_key, lambda: compute_and_fill(cache_key, args, kwargs)
+                )
+            if entry is None:
+                # Joined a background refresh that found another worker holding
+                # the lock; the stale value is gone, so compute directly
+                entry = await fill(cache_key, args, kwargs)
+            return entry["value"]
 
         # Add cache management methods to the wrapped function
         wrapper.cache_clear = lambda: cache_manager.clear_namespace(namespace)
@@ -263,6 +1255,87 @@ def cached(ttl: int = 3600, namespace: str = "core", method: str = 'json',
     return decorator
 
 
+def cached_many(ttl: int = 3600, namespace: str = "core", method: str = 'json',
+                key_func: Optional[callable] = None, ids_arg: Union[int, str] = 0,
+                tags: Optional[callable] = None):
+    """
+    Decorator for caching per-id results of functions that take a list of ids
+
+    The wrapped function receives only the ids that missed the cache and must
+    return a dict mapping id to value; ids absent from that dict are not cached.
+    The wrapper returns a dict for all requested ids that have a value, in the
+    order they were requested.
+
+    Args:
+        ttl: Time to live in seconds
+        namespace: Cache namespace
+        method: Serialization method ('json' or 'pickle')
+        key_func: Custom per-id key function, called as key_func(id)
+        ids_arg: Name of the ids parameter, or its position in the signature
+        tags: Function returning the tags for one id, e.g.
+            ``lambda course_id: [f"course:{course_id}"]``
+    """
+    def decorator(func):
+        func_name = f"{func.__module__}.{func.__name__}"
+        function_requests = {
+            result: CACHE_FUNCTION_REQUESTS.labels(
+                function=func_name, namespace=namespace, result=result
+            )
+            for result in ("hit", "miss")
+        }
+        signature = inspect.signature(func)
+        ids_param = list(signature.parameters)[ids_arg] if isinstance(ids_arg, int) else ids_arg
+
+        def id_key(item_id) -> str:
+            return key_func(item_id) if key_func else f"{func_name}:{item_id}"
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            # Bound by name, so the ids may be passed positionally or by keyword
+            bound = signature.bind(*args, **kwargs)
+            ids = list(bound.arguments[ids_param])
+            keys = {item_id: id_key(item_id) for item_id in ids}
+
+            hits = await cache_manager.get_many(list(keys.values()), namespace, method)
+            missing = [item_id for item_id in ids if keys[item_id] not in hits]
+            function_requests["hit"].inc(len(ids) - len(missing))
+            function_requests["miss"].inc(len(missing))
+
+            loaded = {}
+            if missing:
+                logger.debug(f"Cache miss for {len(missing)}/{len(ids)} ids in {func_name}")
+                bound.arguments[ids_param] = missing
+                if asyncio.iscoroutinefunction(func):
+                    loaded = await func(*bound.args, **bound.kwargs)
+                else:
+                    loaded = func(*bound.args, **bound.kwargs)
+
+                if loaded:
+                    stored = {item_id: value for item_id, value in loaded.items() if item_id in keys}
+                    await cache_manager.set_many(
+                        {keys[item_id]: value for item_id, value in stored.items()},
+                        ttl, namespace, method,
+                        tags={keys[item_id]: tags(item_id) for item_id in stored} if tags else None,
+                    )
+
+            results = {}
+            for item_id in ids:
+                if keys[item_id] in hits:
+                    results[item_id] = hits[keys[item_id]]
+                elif item_id in loaded:
+                    results[item_id] = loaded[item_id]
+            return results
+
+        wrapper.cache_clear = lambda: cache_manager.clear_namespace(namespace)
+        wrapper.cache_delete = lambda item_ids: cache_manager.delete_many(
+            [id_key(item_id) for item_id in item_ids], namespace
+        )
+        wrapper.cache_key = id_key
+
+        return wrapper
+    return decorator
+
+
 class CacheStrategies:
     """Common caching strategies for different data types"""
 
@@ -270,7 +1343,7 @@ class CacheStrategies:
     async def cache_user_data(user_id: int, data: Dict, ttl: int = 1800):
         """Cache user-specific data"""
         key = f"user:{user_id}:data"
-        await cache_manager.set(key, data, ttl, namespace="users")
+        await cache_manager.set(key, data, ttl, namespace="users", tags=[f"user:{user_id}"])
 
     @staticmethod
     async def get_user_data(user_id: int) -> Optional[Dict]:
@@ -282,10 +1355,10 @@ class CacheStrategies:
     async def cache_course_data(course_id: int, data: Dict, ttl: int = 3600):
         """Cache course data"""
         key = f"course:{course_id}"
-        await cache_manager.set(key, data, ttl, namespace="courses")
+        await cache_manager.set(key, data, ttl, namespace="courses", tags=[f"course:{course_id}"])
 
     @staticmethod
-    async def invalidate_user_cache(user_id: int):
+    async def invalidate_user_cache(user_id: int) -> int:
         """Invalidate all user-related cache"""
         pattern_keys = [
             f"user:{user_id}:data",
@@ -293,64 +1366,232 @@ class CacheStrategies:
             f"user:{user_id}:assignments"
         ]
 
-        for key in pattern_keys:
-            await cache_manager.delete(key, namespace="users")
+        deleted = await cache_manager.delete_many(pattern_keys, namespace="users")
+        return deleted + await cache_manager.invalidate_tags([f"user:{user_id}"])
+
+    @staticmethod
+    async def invalidate_course_cache(course_id: int) -> int:
+        """Invalidate everything tagged with a course"""
+        return await cache_manager.invalidate_tags([f"course:{course_id}"])
+
+    @staticmethod
+    async def invalidate_plugin_cache(plugin_name: str) -> int:
+        """Invalidate everything tagged with a plugin"""
+        return await cache_manager.invalidate_tags([f"plugin:{plugin_name}"])
 
     @staticmethod
     async def cache_api_response(endpoint: str, params: Dict, response: Any, ttl: int = 900):
         """Cache API responses"""
-        params_hash = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+        params_hash = _fast_hash(json.dumps(params, sort_keys=True, default=str).encode())
         key = f"api:{endpoint}:{params_hash}"
         await cache_manager.set(key, response, ttl, namespace="api")
 
     @staticmethod
     async def get_cached_api_response(endpoint: str, params: Dict) -> Optional[Any]:
         """Get cached API response"""
-        params_hash = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+        params_hash = _fast_hash(json.dumps(params, sort_keys=True, default=str).encode())
         key = f"api:{endpoint}:{params_hash}"
         return await cache_manager.get(key, namespace="api")
 
 
+# Model class -> function returning the tags a committed write to an instance invalidates
+_model_tags: Dict[type, callable] = {}
+_tag_invalidation_tasks: set = set()
+
+
+def register_model_tags(model: type, tag_func: callable):
+    """Invalidate tag_func(instance) whenever an instance of model is committed"""
+    _model_tags[model] = tag_func
+
+
+def _collect_model_tags(session, flush_context):
+    """after_flush: remember tags for written instances until the transaction commits"""
+    pending = None
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        tag_func = _model_tags.get(type(instance))
+        if tag_func is None:
+            continue
+        if pending is None:
+            pending = session.info.setdefault("cache_tags", set())
+        pending.update(tag for tag in tag_func(instance) if tag)
+
+
+def _invalidate_committed_tags(session):
+    """after_commit: fire the collected tags without blocking the commit"""
+    tags = session.info.pop("cache_tags", None)
+    if not tags:
+        return
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        logger.debug(f"No event loop to invalidate cache tags {sorted(tags)}")
+        return
+
+    task = loop.create_task(cache_manager.invalidate_tags(sorted(tags)))
+    _tag_invalidation_tasks.add(task)
+    task.add_done_callback(_tag_invalidation_tasks.discard)
+
+
+def _discard_model_tags(session):
+    """after_rollback: nothing was written, so nothing to invalidate"""
+    session.info.pop("cache_tags", None)
+
+
+def install_model_invalidation_hooks():
+    """Register tag invalidation for Course, Assignment and Resource writes"""
+    from sqlalchemy import event
+    from app.models import Course, Assignment, Resource
+
+    register_model_tags(Course, lambda course: [
+        f"course:{course.id}",
+        f"user:{course.user_id}",
+    ])
+    register_model_tags(Assignment, lambda assignment: [
+        f"assignment:{assignment.id}",
+        f"course:{assignment.course_id}",
+    ])
+    register_model_tags(Resource, lambda resource: [
+        f"resource:{resource.id}",
+        f"user:{resource.user_id}",
+        f"course:{resource.course_id}" if resource.course_id else None,
+    ])
+
+    if not event.contains(Session, "after_flush", _collect_model_tags):
+        event.listen(Session, "after_flush", _collect_model_tags)
+        event.listen(Session, "after_commit", _invalidate_committed_tags)
+        event.listen(Session, "after_rollback", _discard_model_tags)
+
+
 # Session-based caching for temporary data
 class SessionCache:
-    """In-memory session cache for temporary data"""
+    """
+    Bounded in-memory session cache for temporary data.
 
-    def __init__(self):
-        self._cache = {}
-        self._expiry = {}
+    Entries are evicted LRU once max_entries or max_bytes is exceeded, and
+    expire via a hashed timing wheel: each entry sits in the slot for its
+    expiry tick, and a background task sweeps one slot per tick, so expiry
+    costs O(1) amortized per entry. Expiry uses the monotonic clock; sizes are
+    shallow sys.getsizeof estimates.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024,
+                 tick: float = 1.0, wheel_size: int = 512):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.tick = tick
+        self.wheel_size = wheel_size
+        # key -> (value, expires_at, size, slot)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._wheel: List[set] = [set() for _ in range(wheel_size)]
+        self._last_tick = self._tick_for(time.monotonic())
+        self._bytes = 0
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def _tick_for(self, timestamp: float) -> int:
+        return int(timestamp / self.tick)
 
     def set(self, key: str, value: Any, ttl: int = 300):
         """Set value with TTL"""
-        self._cache[key] = value
-        self._expiry[key] = datetime.now() + timedelta(seconds=ttl)
+        self.delete(key)
+
+        expires_at = time.monotonic() + ttl
+        # Round up so the slot is never swept before the entry is due
+        slot = (self._tick_for(expires_at) + 1) % self.wheel_size
+        size = sys.getsizeof(key) + sys.getsizeof(value)
+
+        self._cache[key] = (value, expires_at, size, slot)
+        self._wheel[slot].add(key)
+        self._bytes += size
+
+        while self._cache and (
+            len(self._cache) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._cache))
+            self.delete(oldest)
+            self.stats["evictions"] += 1
 
     def get(self, key: str) -> Optional[Any]:
         """Get value if not expired"""
-        if key not in self._cache:
+        entry = self._cache.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
             return None
 
-        if datetime.now() > self._expiry[key]:
+        if time.monotonic() >= entry[1]:
             self.delete(key)
+            self.stats["expirations"] += 1
+            self.stats["misses"] += 1
             return None
 
-        return self._cache[key]
+        self._cache.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry[0]
 
     def delete(self, key: str):
         """Delete key"""
-        self._cache.pop(key, None)
-        self._expiry.pop(key, None)
-
-    def clear_expired(self):
-        """Clear all expired keys"""
-        now = datetime.now()
-        expired_keys = [
-            key for key, expiry in self._expiry.items()
-            if now > expiry
-        ]
+        entry = self._cache.pop(key, None)
+        if entry is None:
+            return
+        self._wheel[entry[3]].discard(key)
+        self._bytes -= entry[2]
+
+    def clear_expired(self) -> int:
+        """Advance the timing wheel to now, expiring every due entry"""
+        now = time.monotonic()
+        current_tick = self._tick_for(now)
+        # One full rotation visits every slot, so larger gaps need no more work
+        start_tick = max(self._last_tick + 1, current_tick - self.wheel_size + 1)
+        expired = 0
+
+        for tick in range(start_tick, current_tick + 1):
+            slot = self._wheel[tick % self.wheel_size]
+            # Entries due in a later rotation share the slot and stay put
+            for key in [k for k in slot if self._cache[k][1] <= now]:
+                self.delete(key)
+                expired += 1
+
+        self._last_tick = current_tick
+        self.stats["expirations"] += expired
+        return expired
+
+    async def _run_wheel(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                self.clear_expired()
+            except Exception as e:
+                logger.error(f"Session cache expiry error: {e}")
+
+    def start(self):
+        """Start the background expiry task on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_wheel())
+
+    async def stop(self):
+        """Stop the background expiry task"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Size, memory and eviction statistics"""
+        return {
+            "entries": len(self._cache),
+            "max_entries": self.max_entries,
+            "approx_bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            **self.stats,
+        }
 
-        for key in expired_keys:
-            self.delete(key)
+    def __len__(self) -> int:
+        return len(self._cache)
 
 
 # Global session cache instance
-session_cache = SessionCache()
\ No newline at end of file
+session_cache = SessionCache()
@@ -0,0 +1,251 @@
+"""
+Circuit breaker for Redis-backed subsystems.
+Fails fast while Redis is unreachable instead of waiting out socket
+timeouts on every call, and probes in the background until it recovers.
+"""
+
+import asyncio
+import time
+from enum import Enum
+from typing import Awaitable, Callable, Optional
+import logging
+
+import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+from app.core.monitoring import (
+    CIRCUIT_BREAKER_REJECTIONS,
+    CIRCUIT_BREAKER_STATE,
+    CIRCUIT_BREAKER_TRIPS,
+)
+from app.core.tracing import SpanKind, tracer
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the server is unreachable, as opposed to a bad command
+CONNECTION_ERRORS = (RedisConnectionError, RedisTimeoutError, asyncio.TimeoutError, OSError)
+
+
+class CircuitState(Enum):
+    """Breaker states, with their metric values"""
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+
+class CircuitOpenError(RedisConnectionError):
+    """Raised instead of calling a backend whose circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker with a background recovery probe.
+
+    After failure_threshold consecutive connection failures the circuit
+    opens: callers checking allow() skip the backend and calls made anyway
+    are rejected with CircuitOpenError. A background task then runs the
+    probe (e.g. a PING) with exponential back-off from recovery_timeout up
+    to max_recovery_timeout, and closes the circuit on the first success.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 1.0,
+        max_recovery_timeout: float = 30.0,
+        probe_timeout: float = 2.0,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.max_recovery_timeout = max_recovery_timeout
+        self.probe_timeout = probe_timeout
+
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe: Optional[Callable[[], Awaitable]] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        # Created per event loop by wait_closed(); Celery tasks each run their own
+        self._closed: Optional[asyncio.Event] = None
+        self._closed_loop: Optional[asyncio.AbstractEventLoop] = None
+        CIRCUIT_BREAKER_STATE.labels(name=name).set(self.state.value)
+
+    def allow(self) -> bool:
+        """Whether callers should use the backend right now"""
+        return self.state is CircuitState.CLOSED
+
+    def before_call(self):
+        """Reject a call outright while the circuit is open"""
+        if self.state is CircuitState.OPEN:
+            CIRCUIT_BREAKER_REJECTIONS.labels(name=self.name).inc()
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+
+    def record_success(self):
+        if self.state is CircuitState.CLOSED:
+            self.failures = 0
+        elif self.state is CircuitState.HALF_OPEN:
+            # A call let through while half-open got an answer: Redis is back
+            self.reset()
+
+    def record_failure(self, probe: Optional[Callable[[], Awaitable]] = None):
+        """Count a connection failure; probe is used to detect recovery"""
+        if probe is not None:
+            self._probe = probe
+        if self.state is not CircuitState.CLOSED:
+            return
+
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.trip(probe)
+
+    def trip(self, probe: Optional[Callable[[], Awaitable]] = None):
+        """Open the circuit and start probing for recovery"""
+        if probe is not None:
+            self._probe = probe
+        if self.state is not CircuitState.CLOSED:
+            # Probing may have been stopped with its event loop (a finished
+            # Celery task); resume it in the current one
+            if self._probe_task is None or self._probe_task.done():
+                self._start_probe()
+            return
+
+        self._set_state(CircuitState.OPEN)
+        self.opened_at = time.monotonic()
+        if self._closed is not None:
+            self._closed.clear()
+        CIRCUIT_BREAKER_TRIPS.labels(name=self.name).inc()
+        logger.warning(f"Circuit '{self.name}' opened after {self.failures} consecutive failures")
+        self._start_probe()
+
+    def _start_probe(self):
+        self._probe_task = None
+        if self._probe is not None:
+            try:
+                self._probe_task = asyncio.get_running_loop().create_task(self._recover())
+            except RuntimeError:
+                # No running loop (sync caller); the next trip inside one will probe
+                pass
+
+    async def _recover(self):
+        delay = self.recovery_timeout
+        while self.state is not CircuitState.CLOSED:
+            await asyncio.sleep(delay)
+            self._set_state(CircuitState.HALF_OPEN)
+            try:
+                await asyncio.wait_for(self._probe(), self.probe_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.debug(f"Circuit '{self.name}' probe failed: {e}")
+                self._set_state(CircuitState.OPEN)
+                delay = min(delay * 2, self.max_recovery_timeout)
+                continue
+            self.reset()
+            logger.info(
+                f"Circuit '{self.name}' closed after {time.monotonic() - self.opened_at:.1f}s"
+            )
+
+    def reset(self):
+        """Close the circuit"""
+        self.failures = 0
+        self._set_state(CircuitState.CLOSED)
+        if self._closed is not None:
+            self._closed.set()
+
+    async def wait_closed(self):
+        """Wait until the circuit is closed"""
+        loop = asyncio.get_running_loop()
+        if self._closed is None or self._closed_loop is not loop:
+            self._closed = asyncio.Event()
+            self._closed_loop = loop
+            if self.state is CircuitState.CLOSED:
+                self._closed.set()
+        await self._closed.wait()
+
+    def stop(self):
+        """Cancel background probing"""
+        if self._probe_task:
+            self._probe_task.cancel()
+            self._probe_task = None
+        # A probe cancelled mid-flight leaves the circuit half-open; reopen it
+        # so the next trip() in a live loop resumes probing
+        if self.state is CircuitState.HALF_OPEN:
+            self._set_state(CircuitState.OPEN)
+
+    def _set_state(self, state: CircuitState):
+        self.state = state
+        CIRCUIT_BREAKER_STATE.labels(name=self.name).set(state.value)
+
+    def get_stats(self):
+        return {
+            "state": self.state.name.lower(),
+            "consecutive_failures": self.failures,
+            "open_for": round(time.monotonic() - self.opened_at, 1)
+            if self.opened_at and self.state is not CircuitState.CLOSED else 0,
+        }
+
+
+class _BreakerPipeline(Pipeline):
+    """Pipeline whose execute() reports to the client's circuit breaker"""
+
+    breaker: Optional[CircuitBreaker] = None
+    probe: Optional[Callable[[], Awaitable]] = None
+
+    async def execute(self, raise_on_error: bool = True):
+        self.breaker.before_call()
+        try:
+            with tracer.start_span(
+                "redis.pipeline",
+                kind=SpanKind.CLIENT,
+                attributes={"db.system": "redis", "db.redis.commands": len(self.command_stack)},
+                require_parent=True,
+            ):
+                result = await super().execute(raise_on_error)
+        except CONNECTION_ERRORS:
+            self.breaker.record_failure(self.probe)
+            raise
+        self.breaker.record_success()
+        return result
+
+
+class BreakerRedis(redis.Redis):
+    """
+    redis.asyncio.Redis guarded by a circuit breaker.
+
+    Commands, scripts and pipelines report connection failures to the
+    breaker and fail immediately while it is open. Each command or pipeline
+    run inside a trace is recorded as a span.
+    """
+
+    def __init__(self, *args, breaker: Optional[CircuitBreaker] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker or CircuitBreaker("redis")
+
+    async def execute_command(self, *args, **options):
+        self.breaker.before_call()
+        try:
+            with tracer.start_span(
+                f"redis.{args[0]}",
+                kind=SpanKind.CLIENT,
+                attributes={"db.system": "redis", "db.operation": args[0]},
+                require_parent=True,
+            ):
+                result = await super().execute_command(*args, **options)
+        except CONNECTION_ERRORS:
+            self.breaker.record_failure(self.probe)
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def probe(self):
+        """PING bypassing the breaker, used to detect recovery"""
+        return await super().execute_command("PING")
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        pipe = _BreakerPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.breaker = self.breaker
+        pipe.probe = self.probe
+        return pipe
@@ -9,6 +9,31 @@ class Settings(BaseSettings):
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Cache
+    CACHE_L1_ENABLED: bool = False  # in-process tier in front of Redis
+    CACHE_L1_MAX_ENTRIES: int = 10000
+    CACHE_L1_DEFAULT_TTL: int = 30  # seconds
+    CACHE_COMPRESSION: str = "zstd"  # zstd, lz4, zlib or none
+    CACHE_COMPRESSION_THRESHOLD: int = 1024  # bytes
+
+    # Load shedding (adaptive in-flight request limit)
+    LOAD_SHEDDING_ENABLED: bool = True
+    CONCURRENCY_INITIAL_LIMIT: int = 40
+    CONCURRENCY_MIN_LIMIT: int = 10
+    CONCURRENCY_MAX_LIMIT: int = 200
+    CONCURRENCY_MAX_QUEUE_TIME: float = 0.5  # seconds
+
+    # Event loop monitoring
+    EVENT_LOOP_MONITOR_ENABLED: bool = True
+    EVENT_LOOP_SLOW_THRESHOLD: float = 0.1  # seconds
+
+    # Tracing (OTLP/JSON spans for requests, DB, Redis, plugins, outbound HTTP)
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATE: float = 0.1  # fraction of new traces recorded
+    TRACING_EXPORTER: str = "otlp"  # otlp or file
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_FILE_PATH: str = "traces.jsonl"
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -28,6 +53,11 @@ class Settings(BaseSettings):
     
     # Environment
     ENVIRONMENT: str = "development"
+
+    # Users allowed to reach admin-only debug endpoints
+    ADMIN_EMAILS: List[str] = []
+    # Requests sending this value in X-Profile are run under cProfile (empty disables)
+    PROFILING_TOKEN: str = ""
     
     # External APIs
     CANVAS_CLIENT_ID: str = ""
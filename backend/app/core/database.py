@@ -3,6 +3,7 @@ from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.pool import QueuePool
 from sqlalchemy import event
 from app.core.config import settings
+from app.core.tracing import MAX_STATEMENT_LENGTH, SpanKind, tracer
 import logging
 import time
 from contextlib import asynccontextmanager
@@ -99,9 +100,29 @@ async def init_db():
 @event.listens_for(engine.sync_engine, "before_cursor_execute")
 def receive_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
     context._query_start_time = time.time()
+    # SQLAlchemy runs these hooks in a greenlet sharing the caller's context,
+    # so the span is a child of the request's current span
+    context._trace_span = tracer.start_span(
+        "db.query",
+        kind=SpanKind.CLIENT,
+        attributes={
+            "db.system": conn.dialect.name,
+            "db.statement": statement[:MAX_STATEMENT_LENGTH],
+            "db.executemany": executemany,
+        },
+        require_parent=True,
+    )
 
 @event.listens_for(engine.sync_engine, "after_cursor_execute")
 def receive_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
     total = time.time() - context._query_start_time
+    context._trace_span.end()
     if total > 1.0:  # Log slow queries
-        logger.warning(f"Slow query detected: {total:.2f}s - {statement[:100]}...")
\ No newline at end of file
+        logger.warning(f"Slow query detected: {total:.2f}s - {statement[:100]}...")
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def receive_handle_error(exception_context):
+    span = getattr(exception_context.execution_context, "_trace_span", None)
+    if span is not None:
+        span.record_exception(exception_context.original_exception)
+        span.end()
@@ -14,6 +14,7 @@ import logging
 from datetime import datetime
 
 from .plugin_system import plugin_registry
+from .tracing import StatusCode, tracer
 from .plugin_interface import (
     Document, PluginResult, PluginType,
     StoragePlugin, ParserPlugin, ProcessorPlugin,
@@ -60,6 +61,13 @@ class DocumentEngine:
         Returns:
             PluginResult: Result of the processing operation
         """
+        with tracer.start_span("document.process_file", attributes={"file.name": Path(file_path).name}) as span:
+            result = await self._process_file(file_path, metadata, storage_plugins)
+            if not result.success:
+                span.set_status(StatusCode.ERROR, result.error_message or "")
+            return result
+
+    async def _process_file(self, file_path: str, metadata: Dict[str, Any], storage_plugins: Optional[List[StoragePlugin]]) -> PluginResult:
         try:
             self.logger.info(f"Processing file: {file_path}")
             
@@ -87,7 +95,10 @@ class DocumentEngine:
             
             # Step 2: Parse the file
             self.logger.info(f"Parsing with {parser.metadata.name}")
-            parse_result = await parser.parse(file_path)
+            with tracer.start_span("plugin.parse", attributes={"plugin.name": parser.metadata.name}) as span:
+                parse_result = await parser.parse(file_path)
+                if not parse_result.success:
+                    span.set_status(StatusCode.ERROR, parse_result.error_message or "")
             
             if not parse_result.success:
                 return PluginResult(
@@ -117,7 +128,8 @@ class DocumentEngine:
                 try:
                     if await processor.can_process('document', document.metadata):
                         self.logger.info(f"Processing with {processor.metadata.name}")
-                        process_result = await processor.transform(document.content, document.metadata)
+                        with tracer.start_span("plugin.transform", attributes={"plugin.name": processor.metadata.name}):
+                            process_result = await processor.transform(document.content, document.metadata)
                         
                         if process_result.success:
                             # Update document with processed data
@@ -155,7 +167,10 @@ class DocumentEngine:
             for storage in storage_plugins:
                 try:
                     self.logger.info(f"Storing with {storage.metadata.name}")
-                    store_result = await storage.store(document.content, document.metadata)
+                    with tracer.start_span("plugin.store", attributes={"plugin.name": storage.metadata.name}) as span:
+                        store_result = await storage.store(document.content, document.metadata)
+                        if not store_result.success:
+                            span.set_status(StatusCode.ERROR, store_result.error_message or "")
                     
                     if store_result.success:
                         storage_id = store_result.data.get('storage_id') or store_result.data.get('id')
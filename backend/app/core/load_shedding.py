@@ -0,0 +1,275 @@
+"""
+Adaptive concurrency limiting and load shedding for Core Engine.
+Caps in-flight requests with a latency-driven adaptive limit and rejects
+excess load quickly instead of letting it queue on the database pool.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.monitoring import (
+    CONCURRENCY_IN_FLIGHT,
+    CONCURRENCY_LIMIT,
+    CONCURRENCY_QUEUE_WAIT,
+    CONCURRENCY_SHED,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RequestPriority(IntEnum):
+    """Priority classes; lower values are admitted first"""
+    CRITICAL = 0  # Never limited (health checks, metrics)
+    HIGH = 1  # May use the reserved headroom above the limit (auth)
+    NORMAL = 2
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    In-flight request limiter with a gradient-based limit driven by latency.
+
+    Two moving averages of request latency are kept: a short one tracking
+    current conditions and a long one approximating the latency of a
+    healthy server. Their ratio (times latency_tolerance, capped at 1) is
+    the gradient: while short-term latency stays within tolerance the limit
+    grows by about sqrt(limit), and as queueing inflates latency the limit
+    shrinks proportionally, down to half per update. Comparing averages over
+    the same request mix keeps slow endpoints from dragging the limit down
+    on their own. The limit only grows while at least half of it is in use.
+
+    Requests over the limit wait in a priority queue for at most
+    max_queue_time seconds; when that budget or the queue length is
+    exceeded they are rejected immediately.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 40,
+        min_limit: int = 10,
+        max_limit: int = 200,
+        max_queue_time: float = 0.5,
+        max_queue_size: int = 100,
+        latency_tolerance: float = 1.5,
+        smoothing: float = 0.2,
+        short_window: int = 10,
+        long_window: int = 600,
+        reserved_ratio: float = 0.1,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue_time = max_queue_time
+        self.max_queue_size = max_queue_size
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.short_alpha = 2 / (short_window + 1)
+        self.long_alpha = 2 / (long_window + 1)
+        # Extra slots above the limit that only HIGH priority requests may use
+        self.reserved = max(1, int(max_limit * reserved_ratio))
+
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self.short_latency: Optional[float] = None
+        self.long_latency: Optional[float] = None
+        self.stats = {"admitted": 0, "queued": 0, "shed": 0}
+
+        CONCURRENCY_LIMIT.set(int(self.limit))
+
+    def _capacity(self, priority: RequestPriority) -> int:
+        capacity = int(self.limit)
+        if priority <= RequestPriority.HIGH:
+            capacity += self.reserved
+        return capacity
+
+    async def acquire(self, priority: RequestPriority) -> Optional[str]:
+        """
+        Take an in-flight slot.
+
+        Returns None once admitted, or the reason the request was shed
+        ("queue_full", "queue_timeout" or "displaced"); release() must
+        follow admission.
+        """
+        # Never overtake queued requests of the same or a higher priority
+        if priority == RequestPriority.CRITICAL or (
+            (not self._waiters or self._waiters[0][0] > priority)
+            and self.in_flight < self._capacity(priority)
+        ):
+            self._admit()
+            return None
+
+        if len(self._waiters) >= self.max_queue_size:
+            # A full queue only makes room by displacing lower priority work
+            worst = max(self._waiters)
+            if worst[0] <= priority:
+                return self._shed(priority, "queue_full")
+            self._remove_waiter(worst)
+            worst[2].set_result(False)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (int(priority), next(self._sequence), future)
+        heapq.heappush(self._waiters, entry)
+        self.stats["queued"] += 1
+        queued_at = time.monotonic()
+
+        try:
+            granted = await asyncio.wait_for(asyncio.shield(future), self.max_queue_time)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._remove_waiter(entry)
+                return self._shed(priority, "queue_timeout")
+            granted = future.result()
+        except asyncio.CancelledError:
+            # Client went away; hand the slot on if it was granted meanwhile
+            if not future.done():
+                self._remove_waiter(entry)
+            elif future.result():
+                self.release(time.monotonic(), sample=False)
+            raise
+        finally:
+            CONCURRENCY_QUEUE_WAIT.observe(time.monotonic() - queued_at)
+
+        if not granted:
+            return self._shed(priority, "displaced")
+
+        # The slot was transferred by release(); in_flight already counts it
+        self.stats["admitted"] += 1
+        return None
+
+    def _remove_waiter(self, entry: Tuple[int, int, asyncio.Future]):
+        self._waiters.remove(entry)
+        heapq.heapify(self._waiters)
+
+    def _admit(self):
+        self.in_flight += 1
+        self.stats["admitted"] += 1
+        CONCURRENCY_IN_FLIGHT.set(self.in_flight)
+
+    def _shed(self, priority: RequestPriority, reason: str) -> str:
+        self.stats["shed"] += 1
+        CONCURRENCY_SHED.labels(priority=priority.name.lower(), reason=reason).inc()
+        return reason
+
+    def release(self, started_at: float, failed: bool = False, sample: bool = True):
+        """Return a slot and feed the request's latency into the limit"""
+        # Failed requests say little about queueing, so they are not sampled
+        if sample and not failed:
+            self._update_limit(time.monotonic() - started_at)
+
+        # Hand the slot straight to the best waiter that still fits
+        if self._waiters:
+            priority, _, future = self._waiters[0]
+            if self.in_flight - 1 < self._capacity(RequestPriority(priority)):
+                heapq.heappop(self._waiters)
+                future.set_result(True)
+                return
+
+        self.in_flight -= 1
+        CONCURRENCY_IN_FLIGHT.set(self.in_flight)
+
+    def _update_limit(self, latency: float):
+        if self.short_latency is None:
+            self.short_latency = self.long_latency = latency
+            return
+
+        self.short_latency += (latency - self.short_latency) * self.short_alpha
+        self.long_latency += (latency - self.long_latency) * self.long_alpha
+        # After an overload the long average is inflated; let it recover faster
+        if self.long_latency / self.short_latency > 2:
+            self.long_latency *= 0.95
+
+        gradient = max(0.5, min(1.0, self.latency_tolerance * self.long_latency / self.short_latency))
+        new_limit = self.limit * gradient + math.sqrt(self.limit)
+        if new_limit > self.limit and self.in_flight < self.limit / 2:
+            # Only grow while the limit is actually constraining
+            return
+
+        new_limit = self.limit * (1 - self.smoothing) + new_limit * self.smoothing
+        self.limit = max(self.min_limit, min(self.max_limit, new_limit))
+        CONCURRENCY_LIMIT.set(int(self.limit))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "short_latency": self.short_latency,
+            "long_latency": self.long_latency,
+            **self.stats,
+        }
+
+
+# Global limiter instance
+concurrency_limiter = AdaptiveConcurrencyLimiter(
+    initial_limit=settings.CONCURRENCY_INITIAL_LIMIT,
+    min_limit=settings.CONCURRENCY_MIN_LIMIT,
+    max_limit=settings.CONCURRENCY_MAX_LIMIT,
+    max_queue_time=settings.CONCURRENCY_MAX_QUEUE_TIME,
+)
+
+
+class LoadSheddingMiddleware:
+    """
+    ASGI middleware admitting requests through the concurrency limiter.
+
+    Shed requests get an immediate 503 with Retry-After. Health checks and
+    metrics bypass the limiter; auth routes are queued ahead of other
+    traffic and may use reserved headroom above the limit.
+    """
+
+    critical_paths = frozenset({"/health", "/metrics"})
+    high_priority_prefixes: Tuple[str, ...] = ("/api/v1/auth/",)
+
+    def __init__(self, app: ASGIApp, limiter: Optional[AdaptiveConcurrencyLimiter] = None, retry_after: int = 1):
+        self.app = app
+        self.limiter = limiter or concurrency_limiter
+        self.retry_after = retry_after
+
+    def get_priority(self, path: str) -> RequestPriority:
+        if path in self.critical_paths:
+            return RequestPriority.CRITICAL
+        if path.startswith(self.high_priority_prefixes):
+            return RequestPriority.HIGH
+        return RequestPriority.NORMAL
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not settings.LOAD_SHEDDING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        priority = self.get_priority(scope["path"])
+        if priority == RequestPriority.CRITICAL:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await self.limiter.acquire(priority)
+        if reason:
+            response = JSONResponse(
+                status_code=503,
+                content={
+                    "error": "Service overloaded",
+                    "message": "The server is at capacity, please retry shortly",
+                    "retry_after": self.retry_after
+                },
+                headers={"Retry-After": str(self.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        started_at = time.monotonic()
+        failed = True
+        try:
+            await self.app(scope, receive, send)
+            failed = False
+        finally:
+            self.limiter.release(started_at, failed=failed)
@@ -0,0 +1,197 @@
+"""
+Event loop lag monitoring for Core Engine.
+Measures how late the event loop runs a periodic timer and, when the loop
+is blocked past a threshold, captures the stack of the code blocking it
+together with the request that was being served.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+import logging
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.monitoring import EVENT_LOOP_BLOCKED, EVENT_LOOP_LAG, PrometheusMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Label for blocking code that ran outside any tracked request
+BACKGROUND_ENDPOINT = "<background>"
+
+
+class EventLoopMonitor:
+    """
+    Event loop lag monitor with a watchdog for blocking callbacks.
+
+    A task on the loop sleeps for `interval` and records how late it woke
+    up in the event_loop_lag_seconds histogram. A watchdog thread checks
+    when that timer is next due; once it is overdue by slow_threshold the
+    loop must be stuck in a single callback (or a long run of them), so the
+    watchdog grabs the loop thread's current stack from sys._current_frames()
+    and the request owning the running task. That captures the blocking
+    code while it is still on the stack, which asyncio's debug mode
+    (it only logs the callback's name afterwards) cannot do.
+
+    One report is kept per stall, completed with the measured lag once the
+    loop recovers; the last max_reports are kept.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        slow_threshold: float = 0.1,
+        max_reports: int = 50,
+        stack_depth: int = 30,
+    ):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.stack_depth = stack_depth
+        self.reports: Deque[Dict[str, Any]] = deque(maxlen=max_reports)
+        # Request scopes by the task serving them, filled in by the middleware
+        self.active_requests: Dict[asyncio.Task, Scope] = {}
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._timer_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._next_due = 0.0
+        self._pending: Optional[Dict[str, Any]] = None
+        self.stats = {"samples": 0, "max_lag": 0.0, "last_lag": 0.0, "blocked": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._timer_task is not None and not self._timer_task.done()
+
+    def start(self):
+        """Start monitoring the running event loop"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._next_due = time.monotonic() + self.interval
+        self._stop.clear()
+        self._timer_task = self._loop.create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._timer_task:
+            self._timer_task.cancel()
+            try:
+                await self._timer_task
+            except asyncio.CancelledError:
+                pass
+            self._timer_task = None
+        if self._watchdog:
+            self._watchdog.join(1.0)
+            self._watchdog = None
+
+    async def _measure(self):
+        while True:
+            await asyncio.sleep(max(0.0, self._next_due - time.monotonic()))
+            now = time.monotonic()
+            lag = max(0.0, now - self._next_due)
+            self._next_due = now + self.interval
+
+            EVENT_LOOP_LAG.observe(lag)
+            self.stats["samples"] += 1
+            self.stats["last_lag"] = lag
+            self.stats["max_lag"] = max(self.stats["max_lag"], lag)
+
+            report = self._pending
+            if report is not None:
+                # The stall the watchdog caught is over; record how long it lasted
+                report["lag"] = round(lag, 4)
+                self._pending = None
+                logger.warning(
+                    f"Event loop blocked for {lag:.3f}s in {report['endpoint']}\n"
+                    + "".join(report["stack"][-5:])
+                )
+
+    def _watch(self):
+        check_interval = max(0.01, self.slow_threshold / 2)
+        while not self._stop.wait(check_interval):
+            if self._pending is not None:
+                # Already captured this stall
+                continue
+            overdue = time.monotonic() - self._next_due
+            if overdue >= self.slow_threshold:
+                self._capture(overdue)
+
+    def _capture(self, overdue: float):
+        """Record what the loop thread is running; called from the watchdog thread"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame, limit=self.stack_depth) if frame else []
+        del frame
+
+        task = asyncio.current_task(self._loop)
+        scope = self.active_requests.get(task) if task else None
+        if scope is not None:
+            endpoint = PrometheusMiddleware.get_route_template(scope)
+            method, path = scope.get("method"), scope.get("path")
+        else:
+            endpoint, method, path = BACKGROUND_ENDPOINT, None, None
+
+        report = {
+            "detected_at": time.time(),
+            # Lower bound while blocked; replaced by the full lag on recovery
+            "lag": round(overdue, 4),
+            "endpoint": endpoint,
+            "method": method,
+            "path": path,
+            "task": task.get_name() if task else None,
+            "stack": stack,
+        }
+        self.reports.append(report)
+        self._pending = report
+        self.stats["blocked"] += 1
+        EVENT_LOOP_BLOCKED.labels(endpoint=endpoint).inc()
+
+    def get_stats(self, include_stacks: bool = True) -> Dict[str, Any]:
+        reports = [
+            report if include_stacks else {k: v for k, v in report.items() if k != "stack"}
+            for report in reversed(self.reports)
+        ]
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "slow_threshold": self.slow_threshold,
+            "active_requests": len(self.active_requests),
+            **self.stats,
+            "reports": reports,
+        }
+
+
+# Global monitor instance
+loop_monitor = EventLoopMonitor(slow_threshold=settings.EVENT_LOOP_SLOW_THRESHOLD)
+
+
+class EventLoopMonitorMiddleware:
+    """
+    ASGI middleware recording which request each task is serving, so
+    blocking code caught by the monitor can be attributed to a route.
+    """
+
+    def __init__(self, app: ASGIApp, monitor: Optional[EventLoopMonitor] = None):
+        self.app = app
+        self.monitor = monitor or loop_monitor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.monitor.running:
+            await self.app(scope, receive, send)
+            return
+
+        task = asyncio.current_task()
+        self.monitor.active_requests[task] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.active_requests.pop(task, None)
@@ -5,16 +5,29 @@ Includes Prometheus metrics, structured logging, and health checks.
 
 import time
 import logging
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, Optional
 from functools import wraps
 import psutil
 import asyncio
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
 from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import json
 
 
+# Latency buckets bracket the 2s p95 alert threshold, with extra resolution
+# under 250ms where most API calls land
+HTTP_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.15, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 30.0
+)
+
+# Label for requests that matched no route (404s, scanners), so arbitrary
+# paths cannot create new series
+UNMATCHED_ROUTE = "<unmatched>"
+KNOWN_METHODS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"})
+
 # Prometheus Metrics
 REQUEST_COUNT = Counter(
     'http_requests_total',
@@ -25,7 +38,15 @@ REQUEST_COUNT = Counter(
 REQUEST_DURATION = Histogram(
     'http_request_duration_seconds',
     'HTTP request duration in seconds',
-    ['method', 'endpoint']
+    ['method', 'endpoint'],
+    buckets=HTTP_LATENCY_BUCKETS
+)
+
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes',
+    'HTTP response body size in bytes',
+    ['method', 'endpoint'],
+    buckets=(128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608, 33554432)
 )
 
 ACTIVE_CONNECTIONS = Gauge(
@@ -59,24 +80,185 @@ SYSTEM_DISK_USAGE = Gauge(
     'System disk usage in bytes'
 )
 
+# RSS and open FDs are already exported by prometheus_client's process collector
+PROCESS_THREADS = Gauge(
+    'process_threads',
+    'Number of OS threads in the process'
+)
+
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Cache lookups by namespace, tier and result',
+    ['namespace', 'tier', 'result']
+)
+
+CACHE_ERRORS = Counter(
+    'cache_errors_total',
+    'Cache operation errors',
+    ['namespace', 'operation']
+)
+
+CACHE_OPERATION_DURATION = Histogram(
+    'cache_operation_duration_seconds',
+    'Cache operation latency in seconds',
+    ['namespace', 'operation'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+
+CACHE_PAYLOAD_BYTES = Histogram(
+    'cache_payload_bytes',
+    'Size of cache values written, before (serialized) and after (stored) compression',
+    ['namespace', 'stage'],
+    buckets=(64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+)
+
+RATE_LIMIT_MEMORY_ENTRIES = Gauge(
+    'rate_limit_memory_store_entries',
+    'Entries in the in-memory rate limit fallback store'
+)
+
+RATE_LIMIT_MEMORY_EVICTIONS = Counter(
+    'rate_limit_memory_store_removals_total',
+    'Entries removed from the in-memory rate limit fallback store',
+    ['reason']
+)
+
+CONCURRENCY_LIMIT = Gauge(
+    'http_concurrency_limit',
+    'Current adaptive limit on in-flight HTTP requests'
+)
+
+CONCURRENCY_IN_FLIGHT = Gauge(
+    'http_concurrency_in_flight',
+    'HTTP requests currently admitted by the concurrency limiter'
+)
+
+CONCURRENCY_QUEUE_WAIT = Histogram(
+    'http_concurrency_queue_wait_seconds',
+    'Time requests spent queued for an in-flight slot',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
 
-class PrometheusMiddleware(BaseHTTPMiddleware):
-    """Middleware to collect Prometheus metrics for HTTP requests."""
+CONCURRENCY_SHED = Counter(
+    'http_requests_shed_total',
+    'Requests rejected with 503 by the concurrency limiter',
+    ['priority', 'reason']
+)
+
+OUTBOUND_WAIT = Histogram(
+    'outbound_api_wait_seconds',
+    'Time outbound API calls waited for the rate governor',
+    ['provider'],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+
+OUTBOUND_BACKOFFS = Counter(
+    'outbound_api_backoffs_total',
+    'Pauses applied to outbound API calls after provider rate limit signals',
+    ['provider', 'reason']
+)
+
+CIRCUIT_BREAKER_STATE = Gauge(
+    'circuit_breaker_state',
+    'Circuit breaker state (0 closed, 1 half-open, 2 open)',
+    ['name']
+)
+
+CIRCUIT_BREAKER_TRIPS = Counter(
+    'circuit_breaker_trips_total',
+    'Times a circuit breaker opened',
+    ['name']
+)
+
+CIRCUIT_BREAKER_REJECTIONS = Counter(
+    'circuit_breaker_rejections_total',
+    'Calls rejected without reaching the backend because the circuit was open',
+    ['name']
+)
+
+EVENT_LOOP_LAG = Histogram(
+    'event_loop_lag_seconds',
+    'How late the event loop ran a periodic timer',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+EVENT_LOOP_BLOCKED = Counter(
+    'event_loop_blocked_total',
+    'Times the event loop was blocked longer than the slow callback threshold',
+    ['endpoint']
+)
+
+TRACING_SPANS = Counter(
+    'tracing_spans_total',
+    'Finished trace spans by export outcome',
+    ['result']
+)
+
+CACHE_FUNCTION_REQUESTS = Counter(
+    'cache_function_requests_total',
+    'Outcomes of cached() and cached_many() lookups per decorated function',
+    ['function', 'namespace', 'result']
+)
+
+
+class PrometheusMiddleware:
+    """
+    Middleware to collect Prometheus metrics for HTTP requests.
+
+    Implemented as plain ASGI so requests are not wrapped in the extra task
+    and memory streams of BaseHTTPMiddleware, and streaming responses pass
+    through untouched.
+
+    Requests are labelled with the matched route template (e.g.
+    /api/v1/courses/{course_id}) rather than the raw path, keeping the
+    number of series bounded by the number of routes.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    @staticmethod
+    def get_route_template(scope: Scope) -> str:
+        """Template of the route the router matched, set in scope during routing"""
+        route = scope.get("route")
+        if route is None:
+            # Rejected before routing (rate limited, shed) or no route at all
+            for candidate in getattr(scope.get("app"), "routes", ()):
+                match, _ = candidate.matches(scope)
+                if match != Match.NONE:
+                    route = candidate
+                    break
+
+        path = getattr(route, "path", None)
+        return path if path else UNMATCHED_ROUTE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next):
         start_time = time.time()
+        status_code = None
+        response_size = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
 
         # Increment active connections
         ACTIVE_CONNECTIONS.inc()
 
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, send_wrapper)
 
             # Record metrics
             duration = time.time() - start_time
-            endpoint = request.url.path
-            method = request.method
-            status_code = response.status_code
+            endpoint = self.get_route_template(scope)
+            method = scope["method"] if scope["method"] in KNOWN_METHODS else "OTHER"
 
             REQUEST_COUNT.labels(
                 method=method,
@@ -89,7 +271,10 @@ class PrometheusMiddleware(BaseHTTPMiddleware):
                 endpoint=endpoint
             ).observe(duration)
 
-            return response
+            RESPONSE_SIZE.labels(
+                method=method,
+                endpoint=endpoint
+            ).observe(response_size)
 
         finally:
             # Decrement active connections
@@ -178,83 +363,155 @@ def monitor_function(func_name: str = None):
     return decorator
 
 
-async def update_system_metrics():
-    """Update system metrics periodically."""
-    while True:
-        try:
-            # CPU usage
-            cpu_percent = psutil.cpu_percent(interval=1)
-            SYSTEM_CPU_USAGE.set(cpu_percent)
-
-            # Memory usage
-            memory = psutil.virtual_memory()
-            SYSTEM_MEMORY_USAGE.set(memory.used)
-
-            # Disk usage
-            disk = psutil.disk_usage('/')
-            SYSTEM_DISK_USAGE.set(disk.used)
-
-        except Exception as e:
-            logger.error("Failed to update system metrics", error=str(e))
-
-        await asyncio.sleep(30)  # Update every 30 seconds
+class SystemMetricsCollector:
+    """
+    Samples host and process resource usage on a background thread.
+
+    psutil calls can block (cpu_percent with an interval sleeps, disk and
+    /proc reads can stall), so they never run on the event loop. Each pass
+    builds a fresh snapshot dict and swaps it in with a single assignment;
+    readers get the latest complete snapshot without locking or waiting.
+    """
+
+    def __init__(self, interval: float = 15.0, disk_path: str = '/'):
+        self.interval = interval
+        self.disk_path = disk_path
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._process = psutil.Process()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="system-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        # cpu_percent(None) measures since the previous call; prime both
+        # counters so the first snapshot covers a real interval
+        psutil.cpu_percent(interval=None)
+        self._process.cpu_percent(interval=None)
+        if self._stop.wait(min(1.0, self.interval)):
+            return
+
+        while True:
+            try:
+                self._snapshot = self.sample()
+                self._publish(self._snapshot)
+            except Exception as e:
+                logger.error("Failed to update system metrics", error=str(e))
 
+            if self._stop.wait(self.interval):
+                return
 
-def get_health_status() -> Dict[str, Any]:
-    """Get comprehensive health status."""
-    try:
-        # System metrics
-        cpu_percent = psutil.cpu_percent()
+    def sample(self) -> Dict[str, Any]:
+        """Collect one snapshot; blocking, call from the collector thread"""
         memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
-
-        # Calculate health score based on resource usage
-        health_score = 100
-        if cpu_percent > 80:
-            health_score -= 20
-        if memory.percent > 80:
-            health_score -= 20
-        if disk.percent > 90:
-            health_score -= 30
-
-        status = "healthy"
-        if health_score < 70:
-            status = "degraded"
-        if health_score < 50:
-            status = "unhealthy"
+        disk = psutil.disk_usage(self.disk_path)
+        process = self._process
+
+        with process.oneshot():
+            process_stats = {
+                "cpu_percent": process.cpu_percent(interval=None),
+                "rss_bytes": process.memory_info().rss,
+                "threads": process.num_threads(),
+                "open_fds": process.num_fds() if hasattr(process, "num_fds") else None,
+            }
 
         return {
-            "status": status,
-            "health_score": health_score,
             "timestamp": time.time(),
-            "system": {
-                "cpu_percent": cpu_percent,
-                "memory_percent": memory.percent,
-                "disk_percent": disk.percent,
-                "load_average": psutil.getloadavg()[0] if hasattr(psutil, 'getloadavg') else None,
-            },
-            "service": "core-engine",
-            "version": "1.0.0",
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory_percent": memory.percent,
+            "memory_used_bytes": memory.used,
+            "disk_percent": disk.percent,
+            "disk_used_bytes": disk.used,
+            "load_average": psutil.getloadavg()[0] if hasattr(psutil, 'getloadavg') else None,
+            "process": process_stats,
         }
-    except Exception as e:
+
+    @staticmethod
+    def _publish(snapshot: Dict[str, Any]):
+        SYSTEM_CPU_USAGE.set(snapshot["cpu_percent"])
+        SYSTEM_MEMORY_USAGE.set(snapshot["memory_used_bytes"])
+        SYSTEM_DISK_USAGE.set(snapshot["disk_used_bytes"])
+        PROCESS_THREADS.set(snapshot["process"]["threads"])
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """Latest snapshot, or None before the first sample completes"""
+        return self._snapshot
+
+
+# Global collector instance
+system_metrics = SystemMetricsCollector()
+
+
+def get_health_status() -> Dict[str, Any]:
+    """Get comprehensive health status from the latest resource snapshot."""
+    snapshot = system_metrics.snapshot()
+    if snapshot is None:
+        # Collector has not reported yet (startup); don't sample inline
         return {
-            "status": "unhealthy",
-            "health_score": 0,
+            "status": "healthy",
+            "health_score": 100,
             "timestamp": time.time(),
-            "error": str(e),
+            "system": None,
             "service": "core-engine",
             "version": "1.0.0",
         }
 
+    # Calculate health score based on resource usage
+    health_score = 100
+    if snapshot["cpu_percent"] > 80:
+        health_score -= 20
+    if snapshot["memory_percent"] > 80:
+        health_score -= 20
+    if snapshot["disk_percent"] > 90:
+        health_score -= 30
+
+    status = "healthy"
+    if health_score < 70:
+        status = "degraded"
+    if health_score < 50:
+        status = "unhealthy"
+
+    return {
+        "status": status,
+        "health_score": health_score,
+        "timestamp": time.time(),
+        "system": {
+            "cpu_percent": snapshot["cpu_percent"],
+            "memory_percent": snapshot["memory_percent"],
+            "disk_percent": snapshot["disk_percent"],
+            "load_average": snapshot["load_average"],
+            "process": snapshot["process"],
+            "sampled_at": snapshot["timestamp"],
+        },
+        "service": "core-engine",
+        "version": "1.0.0",
+    }
+
 
 def setup_monitoring():
     """Initialize monitoring setup."""
     # Start system metrics collection
-    asyncio.create_task(update_system_metrics())
+    system_metrics.start()
 
     logger.info("Monitoring system initialized")
 
 
+def shutdown_monitoring():
+    """Stop background metric collection."""
+    system_metrics.stop()
+
+
 # Global logger instance
 logger = StructuredLogger(__name__)
 
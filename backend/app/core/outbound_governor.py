@@ -0,0 +1,275 @@
+"""
+Outbound API rate governor for third-party integrations.
+Paces requests to Canvas, GitHub and Notion per provider and credential,
+shared across workers through the Redis rate limiter, and backs off when
+a provider reports its limit is exhausted.
+"""
+
+import asyncio
+import hashlib
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+import logging
+
+from app.core.monitoring import OUTBOUND_BACKOFFS, OUTBOUND_WAIT
+from app.core.rate_limiter import RateLimit, RateLimitStrategy, rate_limiter
+
+logger = logging.getLogger(__name__)
+
+BLOCK_KEY_PREFIX = "outbound:block:"
+# Used when a provider answers 429 without saying how long to wait
+DEFAULT_BACKOFF = 5.0
+# Largest header-derived pause honoured, in case of bogus reset values
+MAX_BACKOFF = 3600.0
+
+
+@dataclass
+class ProviderPolicy:
+    """Client-side budget for one credential of a provider"""
+    limit: RateLimit
+    # Providers that signal exhaustion with 403 instead of 429
+    forbidden_means_limited: bool = False
+
+
+# Token buckets keep requests evenly paced after an initial burst
+DEFAULT_POLICIES: Dict[str, ProviderPolicy] = {
+    # Canvas throttles per token with a cost-based leaky bucket and answers 403
+    "canvas": ProviderPolicy(
+        RateLimit(300, 60, RateLimitStrategy.TOKEN_BUCKET, burst=20), forbidden_means_limited=True
+    ),
+    # GitHub: 5000/hour primary (tracked through headers), ~900/minute secondary
+    "github": ProviderPolicy(
+        RateLimit(800, 60, RateLimitStrategy.TOKEN_BUCKET, burst=50), forbidden_means_limited=True
+    ),
+    # Notion: an average of three requests per second per integration
+    "notion": ProviderPolicy(RateLimit(3, 1, RateLimitStrategy.TOKEN_BUCKET, burst=3)),
+}
+
+
+class _KeyQueue:
+    """FIFO of local callers waiting on one provider/credential budget"""
+
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        # asyncio.Lock wakes waiters in arrival order
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class OutboundRateGovernor:
+    """
+    Client-side rate governor for outbound API calls.
+
+    Each (provider, credential) pair has its own budget in the shared Redis
+    rate limiter, so all workers syncing with one token draw from the same
+    bucket. Callers in a worker queue for it in arrival order rather than
+    failing. Responses are fed back through observe(): Retry-After, or an
+    exhausted X-RateLimit-Remaining with its reset time, pauses the pair
+    for every worker until the provider is ready again.
+    """
+
+    def __init__(self, policies: Optional[Dict[str, ProviderPolicy]] = None):
+        self.policies = dict(policies or DEFAULT_POLICIES)
+        self._queues: Dict[str, _KeyQueue] = {}
+        self._blocked_until: Dict[str, float] = {}
+
+    def register_provider(self, provider: str, policy: ProviderPolicy):
+        """Add or replace the budget for a provider"""
+        self.policies[provider] = policy
+
+    @staticmethod
+    def _key(provider: str, credential: Optional[str]) -> str:
+        # Never put raw tokens into Redis keys
+        digest = hashlib.blake2b((credential or "").encode(), digest_size=8).hexdigest()
+        return f"{provider}:{digest}"
+
+    async def acquire(self, provider: str, credential: Optional[str], max_wait: Optional[float] = None):
+        """
+        Wait until a request may be sent for this provider and credential.
+
+        Raises asyncio.TimeoutError if max_wait seconds pass first.
+        """
+        policy = self.policies.get(provider)
+        if policy is None:
+            return
+
+        key = self._key(provider, credential)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _KeyQueue()
+
+        queue.users += 1
+        started = time.monotonic()
+        try:
+            if max_wait is None:
+                await self._wait_turn(key, queue, policy)
+            else:
+                await asyncio.wait_for(self._wait_turn(key, queue, policy), max_wait)
+        finally:
+            queue.users -= 1
+            if not queue.users:
+                del self._queues[key]
+            OUTBOUND_WAIT.labels(provider=provider).observe(time.monotonic() - started)
+
+    async def _wait_turn(self, key: str, queue: _KeyQueue, policy: ProviderPolicy):
+        async with queue.lock:
+            while True:
+                delay = await self._block_remaining(key)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+
+                allowed, metadata = await rate_limiter.check_rate_limit(f"outbound:{key}", policy.limit)
+                if allowed:
+                    return
+
+                # Roughly one refill interval, jittered so workers do not align
+                interval = policy.limit.window / policy.limit.requests
+                await asyncio.sleep(interval * random.uniform(1.0, 1.5))
+
+    async def _block_remaining(self, key: str) -> float:
+        now = time.time()
+        until = self._blocked_until.get(key, 0.0)
+        if until <= now:
+            self._blocked_until.pop(key, None)
+            until = 0.0
+            # Another worker may have been told to back off
+            if rate_limiter.redis_client:
+                try:
+                    value = await rate_limiter.redis_client.get(f"{BLOCK_KEY_PREFIX}{key}")
+                    if value:
+                        until = float(value)
+                        self._blocked_until[key] = until
+                except Exception as e:
+                    logger.warning(f"Outbound governor block lookup failed: {e}")
+        return max(0.0, until - now)
+
+    async def block(self, provider: str, credential: Optional[str], seconds: float, reason: str = "retry_after"):
+        """Pause all requests for this provider and credential"""
+        seconds = min(max(seconds, 0.0), MAX_BACKOFF)
+        if not seconds:
+            return
+
+        key = self._key(provider, credential)
+        until = time.time() + seconds
+        if until <= self._blocked_until.get(key, 0.0):
+            return
+
+        self._blocked_until[key] = until
+        OUTBOUND_BACKOFFS.labels(provider=provider, reason=reason).inc()
+        logger.warning(f"Backing off {provider} requests for {seconds:.1f}s ({reason})")
+
+        if rate_limiter.redis_client:
+            try:
+                await rate_limiter.redis_client.set(
+                    f"{BLOCK_KEY_PREFIX}{key}", until, px=int(seconds * 1000) + 1
+                )
+            except Exception as e:
+                logger.warning(f"Outbound governor block publish failed: {e}")
+
+    @staticmethod
+    def _retry_after(value: str) -> Optional[float]:
+        """Retry-After is either delta seconds or an HTTP date"""
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+
+    async def observe(self, provider: str, credential: Optional[str], status: int, headers: Mapping[str, Any]) -> bool:
+        """
+        Apply a provider response's rate limit signals.
+
+        Returns True if the response was a throttling response that should be
+        retried once the governor lets the next request through.
+        """
+        retry_after = headers.get("Retry-After")
+        remaining = headers.get("X-RateLimit-Remaining", headers.get("X-Rate-Limit-Remaining"))
+        try:
+            exhausted = remaining is not None and float(remaining) <= 0
+        except ValueError:
+            exhausted = False
+
+        policy = self.policies.get(provider)
+        limited = status == 429 or (
+            # A 403 is only a rate limit when the provider says so
+            status == 403 and bool(policy and policy.forbidden_means_limited)
+            and (retry_after is not None or exhausted)
+        )
+
+        delay = None
+        reason = "retry_after"
+        if retry_after is not None and (limited or status == 503):
+            delay = self._retry_after(retry_after)
+
+        reset = headers.get("X-RateLimit-Reset")
+        if delay is None and exhausted and reset is not None:
+            reason = "remaining_exhausted"
+            try:
+                reset = float(reset)
+                # GitHub sends an epoch timestamp, others a delta
+                delay = reset - time.time() if reset > 1e9 else reset
+            except ValueError:
+                pass
+
+        if delay is None and limited:
+            reason = "throttled"
+            delay = DEFAULT_BACKOFF
+
+        if delay:
+            await self.block(provider, credential, delay, reason)
+        return limited
+
+    @asynccontextmanager
+    async def request(
+        self,
+        provider: str,
+        credential: Optional[str],
+        session,
+        method: str,
+        url: str,
+        max_retries: int = 3,
+        **kwargs
+    ):
+        """
+        Governed aiohttp request, usable in place of session.request():
+
+            async with outbound_governor.request("github", token, session, "GET", url) as response:
+                ...
+
+        Throttled responses are retried up to max_retries times after the
+        back-off they asked for; the last response is yielded either way.
+        """
+        for attempt in range(max_retries + 1):
+            await self.acquire(provider, credential)
+            response = await session.request(method, url, **kwargs)
+            limited = await self.observe(provider, credential, response.status, response.headers)
+            if not limited or attempt == max_retries:
+                break
+            response.release()
+
+        try:
+            yield response
+        finally:
+            response.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "providers": sorted(self.policies),
+            "queued_keys": len(self._queues),
+            "waiting": sum(queue.users for queue in self._queues.values()),
+            "blocked_keys": sum(1 for until in self._blocked_until.values() if until > now),
+        }
+
+
+# Global governor instance
+outbound_governor = OutboundRateGovernor()
@@ -0,0 +1,216 @@
+"""
+On-demand profiling for live Core Engine workers.
+A thread-based sampling profiler producing collapsed stacks for flame
+graphs, and per-request cProfile runs triggered by a header.
+"""
+
+import asyncio
+import cProfile
+import hmac
+import io
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Optional
+import logging
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_PROFILE_SECONDS = 60.0
+MIN_SAMPLE_INTERVAL = 0.001
+
+# Leaf functions of threads parked waiting for work (the event loop in
+# select, executor threads blocked on their queue), left out unless asked for
+IDLE_FUNCTIONS = frozenset({
+    "select", "poll", "epoll", "kqueue", "wait", "acquire", "sleep", "_wait_for_tstate_lock", "_worker",
+})
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profile is requested while another one is running"""
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(APP_ROOT):
+        filename = os.path.relpath(filename, APP_ROOT)
+    else:
+        # Library code: keep the package path, drop the interpreter prefix
+        marker = "site-packages" + os.sep
+        index = filename.rfind(marker)
+        filename = filename[index + len(marker):] if index != -1 else os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling every thread's stack with sys._current_frames().
+
+    A background thread wakes every `interval` seconds and records the
+    stack of each other thread, so profiled code runs unmodified and the
+    overhead is one stack walk per thread per sample. Results are returned
+    in the collapsed format read by flamegraph.pl and speedscope:
+    one "thread;outer;...;inner count" line per distinct stack.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def profile(self, duration: float, interval: float = 0.01, include_idle: bool = False) -> str:
+        """Sample for duration seconds; blocking, run it off the event loop"""
+        duration = min(max(duration, interval), MAX_PROFILE_SECONDS)
+        interval = max(interval, MIN_SAMPLE_INTERVAL)
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running")
+
+        try:
+            stacks: Counter = Counter()
+            labels: Dict[object, str] = {}
+            own_thread = threading.get_ident()
+            deadline = time.monotonic() + duration
+            samples = 0
+
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    if not include_idle and frame.f_code.co_name in IDLE_FUNCTIONS:
+                        continue
+
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        label = labels.get(code)
+                        if label is None:
+                            label = labels[code] = _frame_label(code)
+                        stack.append(label)
+                        frame = frame.f_back
+                    stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                    stacks[";".join(reversed(stack))] += 1
+                frame = None
+                samples += 1
+                time.sleep(interval)
+        finally:
+            self._lock.release()
+
+        logger.info(f"Sampling profile finished: {samples} samples over {duration:.1f}s")
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+    async def profile_async(self, duration: float, interval: float = 0.01, include_idle: bool = False) -> str:
+        """Run profile() in a worker thread so the event loop keeps serving (and being sampled)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.profile, duration, interval, include_idle)
+
+
+# Global profiler instance
+sampling_profiler = SamplingProfiler()
+
+
+class RequestProfileStore:
+    """Most recent per-request cProfile results, by profile id"""
+
+    def __init__(self, max_profiles: int = 20):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, Dict]" = OrderedDict()
+        self._ids = itertools.count(1)
+
+    def new_id(self) -> str:
+        return f"{os.getpid()}-{next(self._ids)}"
+
+    def add(self, profile_id: str, method: str, path: str, duration: float, profiler: cProfile.Profile):
+        self._profiles[profile_id] = {
+            "method": method,
+            "path": path,
+            "duration": duration,
+            "created_at": time.time(),
+            "stats": pstats.Stats(profiler),
+        }
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+
+    def render(self, profile_id: str, sort: str = "cumulative", limit: int = 50) -> Optional[str]:
+        """pstats report for a profile, or None if it is unknown or evicted"""
+        profile = self._profiles.get(profile_id)
+        if profile is None:
+            return None
+        output = io.StringIO()
+        output.write(f"{profile['method']} {profile['path']} took {profile['duration']:.3f}s\n")
+        stats = profile["stats"]
+        stats.stream = output
+        stats.sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def list(self):
+        return [
+            {"id": profile_id, **{k: v for k, v in profile.items() if k != "stats"}}
+            for profile_id, profile in reversed(self._profiles.items())
+        ]
+
+
+# Global store instance
+request_profiles = RequestProfileStore()
+
+
+class RequestProfilingMiddleware:
+    """
+    ASGI middleware running cProfile over a single request.
+
+    Requests carrying an X-Profile header equal to PROFILING_TOKEN are
+    profiled and answered with an X-Profile-Id header; once the response
+    has finished the report is available from the debug API. cProfile
+    hooks the whole thread, so other requests interleaved on the event
+    loop show up too. Only one request is profiled at a time; others
+    proceed unprofiled.
+    """
+
+    header = b"x-profile"
+
+    def __init__(self, app: ASGIApp, store: Optional[RequestProfileStore] = None):
+        self.app = app
+        self.store = store or request_profiles
+        self._active = False
+
+    def _requested(self, scope: Scope) -> bool:
+        token = settings.PROFILING_TOKEN
+        if not token:
+            return False
+        for name, value in scope.get("headers", ()):
+            if name == self.header:
+                return hmac.compare_digest(value, token.encode("latin-1"))
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or self._active or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self._active = True
+        profiler = cProfile.Profile()
+        # Allocated up front so it can go out in the response headers
+        profile_id = self.store.new_id()
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile_id
+            await send(message)
+
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            self._active = False
+            self.store.add(profile_id, scope["method"], scope["path"], time.perf_counter() - started, profiler)
@@ -5,18 +5,128 @@ Supports multiple rate limiting strategies and algorithms.
 
 import time
 import asyncio
-from typing import Dict, Optional, Tuple, Any
+import itertools
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Any, Union
 from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
 from starlette.responses import Response, JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logging
 from dataclasses import dataclass
 from enum import Enum
-import redis.asyncio as redis
 from app.core.config import settings
+from app.core.circuit_breaker import BreakerRedis, CircuitBreaker
+from app.core.monitoring import RATE_LIMIT_MEMORY_ENTRIES, RATE_LIMIT_MEMORY_EVICTIONS
 
 logger = logging.getLogger(__name__)
 
+# Server-side scripts: each check is one atomic EVALSHA round trip, so
+# concurrent requests can no longer interleave between read and write.
+# Floats are returned as strings because Redis truncates Lua numbers to integers.
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key)
+redis.call('ZADD', key, now, ARGV[3])
+redis.call('EXPIRE', key, math.ceil(window))
+return count + 1
+"""
+
+TOKEN_BUCKET_SCRIPT = """
+local key = KEYS[1]
+local burst = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', key, 'tokens', 'last_refill')
+local tokens = tonumber(bucket[1])
+local last_refill = tonumber(bucket[2])
+if tokens == nil then
+    tokens = burst
+    last_refill = now
+end
+tokens = math.min(burst, tokens + math.max(0, now - last_refill) * refill_rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', key, 'tokens', tostring(tokens), 'last_refill', tostring(now))
+redis.call('EXPIRE', key, ttl)
+return {allowed, tostring(tokens)}
+"""
+
+LEAKY_BUCKET_SCRIPT = """
+local key = KEYS[1]
+local bucket_size = tonumber(ARGV[1])
+local leak_rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', key, 'volume', 'last_leak')
+local volume = tonumber(bucket[1])
+local last_leak = tonumber(bucket[2])
+if volume == nil then
+    volume = 0
+    last_leak = now
+end
+volume = math.max(0, volume - math.max(0, now - last_leak) * leak_rate)
+local allowed = 0
+if volume < bucket_size then
+    volume = volume + 1
+    allowed = 1
+end
+redis.call('HSET', key, 'volume', tostring(volume), 'last_leak', tostring(now))
+redis.call('EXPIRE', key, ttl)
+return {allowed, tostring(volume)}
+"""
+
+# Two fixed-window counters per client; usage is estimated as
+# previous * (1 - elapsed fraction of current window) + current
+SLIDING_WINDOW_COUNTER_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local weight = tonumber(ARGV[2])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local estimate = previous * weight + current
+if estimate + 1 > limit then
+    return {0, tostring(estimate)}
+end
+current = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+return {1, tostring(previous * weight + current)}
+"""
+
+# Grants up to ARGV[2] requests from the window's shared budget in one call.
+# KEYS[2] is the previous window, weighted by ARGV[4] (0 for a fixed window).
+# A refusal also returns both counters so the caller can tell when the
+# previous window's weight will have fallen far enough to grant again.
+LEASE_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local weight = tonumber(ARGV[4])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local used = math.ceil(previous * weight) + current
+local grant = math.min(tonumber(ARGV[2]), limit - used)
+if grant <= 0 then
+    return {0, used, current, previous}
+end
+redis.call('INCRBY', KEYS[1], grant)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+return {grant, used + grant}
+"""
+
+SCRIPTS = {
+    "sliding_window": SLIDING_WINDOW_SCRIPT,
+    "token_bucket": TOKEN_BUCKET_SCRIPT,
+    "leaky_bucket": LEAKY_BUCKET_SCRIPT,
+    "sliding_window_counter": SLIDING_WINDOW_COUNTER_SCRIPT,
+    "lease": LEASE_SCRIPT,
+}
+
 
 class RateLimitStrategy(Enum):
     """Rate limiting strategies"""
@@ -24,6 +134,11 @@ class RateLimitStrategy(Enum):
     SLIDING_WINDOW = "sliding_window"
     TOKEN_BUCKET = "token_bucket"
     LEAKY_BUCKET = "leaky_bucket"
+    SLIDING_WINDOW_COUNTER = "sliding_window_counter"
+
+
+# Strategies backed by per-window counters, which leases draw from
+LEASED_STRATEGIES = frozenset({RateLimitStrategy.FIXED_WINDOW, RateLimitStrategy.SLIDING_WINDOW_COUNTER})
 
 
 @dataclass
@@ -33,30 +148,165 @@ class RateLimit:
     window: int  # seconds
     strategy: RateLimitStrategy = RateLimitStrategy.FIXED_WINDOW
     burst: Optional[int] = None  # For token bucket
+    # Hybrid mode: admit locally from leases of this many requests taken from
+    # the shared fixed-window budget, instead of one Redis call per request.
+    # Only FIXED_WINDOW and SLIDING_WINDOW_COUNTER can be leased.
+    lease_size: Optional[int] = None
+
+    def __post_init__(self):
+        if self.lease_size and self.strategy not in LEASED_STRATEGIES:
+            raise ValueError(f"lease_size is not supported with the {self.strategy.value} strategy")
+
+
+@dataclass
+class _Lease:
+    """Requests this worker may admit locally for one identifier and window"""
+    window_start: int
+    tokens: int = 0
+    used: int = 0  # Window-wide usage reported by Redis at the last grant
+    # After a refusal, when Redis may grant again (the window's end for a
+    # fixed window, earlier for a sliding window counter as the weight falls)
+    retry_at: float = 0.0
+    pending: Optional[asyncio.Future] = None
+
+
+class MemoryStore:
+    """
+    Capacity-bounded, self-expiring fallback store for rate limit state.
+
+    Every entry carries a TTL matching the Redis expiry it stands in for.
+    Expired entries are dropped when read and by a full sweep at most once per
+    sweep_interval; beyond max_entries the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_entries: int = 100000, sweep_interval: float = 30.0):
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expires_at)
+        self._next_sweep = time.monotonic() + sweep_interval
+        self.stats = {"expired": 0, "evicted": 0}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self.sweep(now)
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if entry[1] <= now:
+            del self._entries[key]
+            self._record_removal("expired")
+            return default
+
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def set(self, key: str, value: Any, ttl: float):
+        """Store value (or refresh its TTL) for ttl seconds"""
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._record_removal("evicted")
+
+        RATE_LIMIT_MEMORY_ENTRIES.set(len(self._entries))
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drop every expired entry"""
+        now = now or time.monotonic()
+        expired = [key for key, (_, expires_at) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._record_removal("expired", len(expired))
+
+        self._next_sweep = now + self.sweep_interval
+        RATE_LIMIT_MEMORY_ENTRIES.set(len(self._entries))
+        return len(expired)
+
+    def _record_removal(self, reason: str, count: int = 1):
+        self.stats[reason] += count
+        RATE_LIMIT_MEMORY_EVICTIONS.labels(reason=reason).inc(count)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, **self.stats}
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
 
 
 class RateLimiter:
     """Advanced rate limiter with multiple algorithms"""
 
-    def __init__(self):
-        self.redis_client = None
-        self.memory_store = {}  # Fallback to memory if Redis unavailable
+    def __init__(self, max_leases: int = 10000):
+        self._redis = None
+        self.memory_store = MemoryStore()  # Fallback to memory if Redis unavailable
+        self.scripts = {}
+        # Least recently used first; bounded by max_leases
+        self.leases: "OrderedDict[str, _Lease]" = OrderedDict()
+        self.max_leases = max_leases
+        self.lease_stats = {"local_admits": 0, "redis_calls": 0, "evicted_leases": 0}
+        # Not shared with the cache, which uses another database
+        self.breaker = CircuitBreaker("redis_rate_limiter")
+
+    @property
+    def redis_client(self):
+        """The Redis client, or None while unconfigured or its circuit is open"""
+        if self._redis is not None and self.breaker.allow():
+            return self._redis
+        return None
+
+    @redis_client.setter
+    def redis_client(self, client):
+        self._redis = client
 
     async def connect(self):
         """Initialize Redis connection for distributed rate limiting"""
+        self._redis = BreakerRedis(
+            host=getattr(settings, 'REDIS_HOST', 'localhost'),
+            port=getattr(settings, 'REDIS_PORT', 6379),
+            db=1,  # Use separate DB for rate limiting
+            password=getattr(settings, 'REDIS_PASSWORD', None),
+            max_connections=10,
+            breaker=self.breaker,
+        )
+        self._register_scripts()
         try:
-            self.redis_client = redis.Redis(
-                host=getattr(settings, 'REDIS_HOST', 'localhost'),
-                port=getattr(settings, 'REDIS_PORT', 6379),
-                db=1,  # Use separate DB for rate limiting
-                password=getattr(settings, 'REDIS_PASSWORD', None),
-                max_connections=10,
-            )
-            await self.redis_client.ping()
+            # Ping past the breaker, so a circuit left open when an earlier
+            # Celery task's event loop ended closes as soon as Redis answers
+            await asyncio.wait_for(self._redis.probe(), self.breaker.probe_timeout)
+            self.breaker.reset()
+            await self._load_scripts()
             logger.info("Rate limiter Redis connection established")
         except Exception as e:
-            logger.warning(f"Redis unavailable for rate limiting, using memory store: {e}")
-            self.redis_client = None
+            # Scripts load themselves on first use once the circuit closes
+            logger.warning(f"Redis unavailable for rate limiting, using memory store until it recovers: {e}")
+            self.breaker.trip(self._redis.probe)
+
+    async def disconnect(self):
+        """Close the Redis connection, e.g. before a Celery task's event loop ends"""
+        self.breaker.stop()
+        if self._redis:
+            await self._redis.close()
+            self._redis = None
+
+    def _register_scripts(self):
+        """Create the limiter's Script objects; they reload themselves on NOSCRIPT"""
+        for name, source in SCRIPTS.items():
+            self.scripts[name] = self._redis.register_script(source)
+
+    async def _load_scripts(self):
+        """Preload the registered scripts so calls use EVALSHA"""
+        for source in SCRIPTS.values():
+            await self._redis.script_load(source)
 
     async def check_rate_limit(
         self,
@@ -69,6 +319,9 @@ class RateLimiter:
         Returns:
             (allowed, metadata) where metadata contains rate limit info
         """
+        if rate_limit.lease_size and self.redis_client:
+            return await self._leased_window(identifier, rate_limit)
+
         if rate_limit.strategy == RateLimitStrategy.FIXED_WINDOW:
             return await self._fixed_window(identifier, rate_limit)
         elif rate_limit.strategy == RateLimitStrategy.SLIDING_WINDOW:
@@ -77,6 +330,8 @@ class RateLimiter:
             return await self._token_bucket(identifier, rate_limit)
         elif rate_limit.strategy == RateLimitStrategy.LEAKY_BUCKET:
             return await self._leaky_bucket(identifier, rate_limit)
+        elif rate_limit.strategy == RateLimitStrategy.SLIDING_WINDOW_COUNTER:
+            return await self._sliding_window_counter(identifier, rate_limit)
         else:
             raise ValueError(f"Unknown rate limit strategy: {rate_limit.strategy}")
 
@@ -98,17 +353,14 @@ class RateLimiter:
                 logger.error(f"Redis error in fixed window: {e}")
                 return True, {}  # Allow on Redis error
         else:
-            # Memory fallback
-            if key not in self.memory_store:
-                self.memory_store[key] = {"count": 0, "expires": window_start + rate_limit.window}
-
-            # Clean expired entries
-            if time.time() > self.memory_store[key]["expires"]:
-                del self.memory_store[key]
-                self.memory_store[key] = {"count": 0, "expires": window_start + rate_limit.window}
+            # Memory fallback; the entry expires with its window
+            counter = self.memory_store.get(key)
+            if counter is None:
+                counter = {"count": 0}
+                self.memory_store.set(key, counter, window_start + rate_limit.window - now)
 
-            self.memory_store[key]["count"] += 1
-            current_count = self.memory_store[key]["count"]
+            counter["count"] += 1
+            current_count = counter["count"]
 
         allowed = current_count <= rate_limit.requests
         reset_time = window_start + rate_limit.window
@@ -122,6 +374,197 @@ class RateLimiter:
 
         return allowed, metadata
 
+    async def _leased_window(self, identifier: str, rate_limit: RateLimit) -> Tuple[bool, Dict]:
+        """
+        Fixed window (or sliding window counter) admitted from locally held leases.
+
+        Each worker takes up to lease_size requests at a time from the window's
+        Redis counter and admits against them without a round trip. The limit is
+        never exceeded across workers; requests leased but unused when the
+        window ends are simply lost, so admission errs on the strict side. With
+        SLIDING_WINDOW_COUNTER the previous window's weight only falls after a
+        grant, so leased requests stay within the estimate, and a refused lease
+        is retried as soon as the falling weight frees capacity rather than at
+        the end of the window.
+        """
+        lease = self._current_lease(identifier, rate_limit)
+
+        # Loop because callers that shared a renewal may find it already drained
+        while lease.tokens <= 0 and time.time() >= lease.retry_at:
+            if lease.pending is None:
+                lease.pending = asyncio.ensure_future(
+                    self._renew_lease(identifier, lease, rate_limit)
+                )
+            try:
+                await asyncio.shield(lease.pending)
+            except Exception as e:
+                logger.error(f"Redis error in leased window: {e}")
+                return True, {}  # Allow on Redis error
+            # A renewal can finish after the window has turned over; never renew
+            # against the previous window's counters
+            lease = self._current_lease(identifier, rate_limit)
+
+        if lease.tokens > 0:
+            lease.tokens -= 1
+            allowed = True
+            self.lease_stats["local_admits"] += 1
+        else:
+            allowed = False
+
+        metadata = {
+            "limit": rate_limit.requests,
+            "remaining": max(0, rate_limit.requests - lease.used) + lease.tokens,
+            "reset": lease.window_start + rate_limit.window,
+            "strategy": f"leased_{rate_limit.strategy.value}"
+        }
+
+        return allowed, metadata
+
+    def _current_lease(self, identifier: str, rate_limit: RateLimit) -> _Lease:
+        """The identifier's lease for the current window, replacing one from an earlier window"""
+        now = time.time()
+        window_start = int(now - (now % rate_limit.window))
+
+        lease = self.leases.get(identifier)
+        if lease is None or lease.window_start != window_start:
+            lease = _Lease(window_start=window_start)
+            self.leases[identifier] = lease
+        self.leases.move_to_end(identifier)
+        if len(self.leases) > self.max_leases:
+            self._evict_leases()
+        return lease
+
+    async def _renew_lease(self, identifier: str, lease: _Lease, rate_limit: RateLimit):
+        """Take the next batch of requests for a lease from Redis"""
+        try:
+            prefix = self._lease_prefix(rate_limit)
+            window = rate_limit.window
+            keys = [
+                f"rate_limit:{prefix}:{identifier}:{lease.window_start}",
+                f"rate_limit:{prefix}:{identifier}:{lease.window_start - window}",
+            ]
+            weight = 0.0
+            if rate_limit.strategy == RateLimitStrategy.SLIDING_WINDOW_COUNTER:
+                weight = self._previous_window_weight(time.time(), lease.window_start, window)
+
+            self.lease_stats["redis_calls"] += 1
+            result = await self.scripts["lease"](
+                keys=keys,
+                args=[rate_limit.requests, rate_limit.lease_size, window * 2, weight],
+            )
+            granted, used = int(result[0]), int(result[1])
+            lease.tokens += granted
+            lease.used = used
+            if not granted:
+                lease.retry_at = self._lease_retry_at(
+                    rate_limit, lease.window_start, int(result[2]), int(result[3])
+                )
+        finally:
+            lease.pending = None
+
+    @staticmethod
+    def _lease_retry_at(rate_limit: RateLimit, window_start: int, current: int, previous: int) -> float:
+        """
+        Earliest time a refused lease can be granted again.
+
+        The lease script grants while ceil(previous * weight) + current < limit,
+        i.e. while previous * weight <= limit - current - 1. For a sliding
+        window counter the weight falls linearly over the window, so that
+        point is reached before the window ends unless the current window
+        alone has used up the limit.
+        """
+        retry_at = window_start + rate_limit.window
+        headroom = rate_limit.requests - current - 1
+        if rate_limit.strategy == RateLimitStrategy.SLIDING_WINDOW_COUNTER and headroom >= 0 and previous:
+            # weight = 1 - (t - window_start) / window <= headroom / previous
+            retry_at = min(retry_at, window_start + rate_limit.window * (1 - headroom / previous))
+        # Never retry in a busy loop: refusals at the same instant, or renewals
+        # that finished after the window ended, wait a little
+        return max(retry_at, time.time() + 0.001)
+
+    @staticmethod
+    def _lease_prefix(rate_limit: RateLimit) -> str:
+        # Leases share counters with unleased checks, so toggling lease_size
+        # keeps every client's usage for the current window
+        if rate_limit.strategy == RateLimitStrategy.SLIDING_WINDOW_COUNTER:
+            return "sliding_window_counter"
+        return "fixed"
+
+    @staticmethod
+    def _previous_window_weight(now: float, window_start: int, window: int) -> float:
+        """Share of the previous window still inside the sliding window"""
+        return max(0.0, 1.0 - (now - window_start) / window)
+
+    def _evict_leases(self):
+        """
+        Evict least recently used leases down to 90% of max_leases.
+
+        Evicting below the cap spreads the scans over many inserts. Leases with
+        a renewal in flight are skipped; unused tokens of an evicted lease are
+        lost, which only makes admission stricter.
+        """
+        target = max(1, int(self.max_leases * 0.9))
+        for identifier in [
+            i for i, lease in itertools.islice(self.leases.items(), len(self.leases) - target)
+            if lease.pending is None
+        ]:
+            del self.leases[identifier]
+            self.lease_stats["evicted_leases"] += 1
+
+    async def _sliding_window_counter(self, identifier: str, rate_limit: RateLimit) -> Tuple[bool, Dict]:
+        """
+        Sliding window counter rate limiting.
+
+        Keeps only the current and previous fixed-window counts per client and
+        weights the previous one by how much of it still overlaps the sliding
+        window: constant memory, accurate to a few percent for steady traffic.
+        """
+        now = time.time()
+        window = rate_limit.window
+        window_start = int(now - (now % window))
+        weight = self._previous_window_weight(now, window_start, window)
+
+        if self.redis_client:
+            try:
+                allowed, estimate = await self.scripts["sliding_window_counter"](
+                    keys=[
+                        f"rate_limit:sliding_window_counter:{identifier}:{window_start}",
+                        f"rate_limit:sliding_window_counter:{identifier}:{window_start - window}",
+                    ],
+                    args=[rate_limit.requests, weight, window * 2],
+                )
+                allowed = bool(allowed)
+                estimate = float(estimate)
+            except Exception as e:
+                logger.error(f"Redis error in sliding window counter: {e}")
+                return True, {}
+        else:
+            # Memory fallback: one small record per client
+            key = f"rate_limit:sliding_window_counter:{identifier}"
+            counter = self.memory_store.get(key)
+            if counter is None or counter["window_start"] < window_start - window:
+                counter = {"window_start": window_start, "current": 0, "previous": 0}
+            elif counter["window_start"] < window_start:
+                counter["previous"] = counter["current"]
+                counter["current"] = 0
+                counter["window_start"] = window_start
+            self.memory_store.set(key, counter, window * 2)
+
+            estimate = counter["previous"] * weight + counter["current"]
+            allowed = estimate + 1 <= rate_limit.requests
+            if allowed:
+                counter["current"] += 1
+                estimate += 1
+
+        metadata = {
+            "limit": rate_limit.requests,
+            "remaining": max(0, int(rate_limit.requests - estimate)),
+            "reset": window_start + window,
+            "strategy": "sliding_window_counter"
+        }
+
+        return allowed, metadata
+
     async def _sliding_window(self, identifier: str, rate_limit: RateLimit) -> Tuple[bool, Dict]:
         """Sliding window rate limiting using sorted sets"""
         now = time.time()
@@ -130,34 +573,25 @@ class RateLimiter:
 
         if self.redis_client:
             try:
-                pipe = self.redis_client.pipeline()
-                # Remove old entries
-                pipe.zremrangebyscore(key, 0, window_start)
-                # Count current entries
-                pipe.zcard(key)
-                # Add current request
-                pipe.zadd(key, {str(now): now})
-                # Set expiry
-                pipe.expire(key, rate_limit.window)
-                results = await pipe.execute()
-                current_count = results[1] + 1  # +1 for current request
+                # Unique member so concurrent requests in the same instant all count
+                current_count = await self.scripts["sliding_window"](
+                    keys=[key],
+                    args=[now, rate_limit.window, f"{now}:{uuid.uuid4().hex[:8]}"],
+                )
             except Exception as e:
                 logger.error(f"Redis error in sliding window: {e}")
                 return True, {}
         else:
-            # Memory fallback with sorted list
-            if key not in self.memory_store:
-                self.memory_store[key] = []
-
-            # Remove old entries
-            self.memory_store[key] = [
-                timestamp for timestamp in self.memory_store[key]
+            # Memory fallback with sorted list, minus entries outside the window
+            timestamps = [
+                timestamp for timestamp in self.memory_store.get(key, [])
                 if timestamp > window_start
             ]
 
             # Add current request
-            self.memory_store[key].append(now)
-            current_count = len(self.memory_store[key])
+            timestamps.append(now)
+            self.memory_store.set(key, timestamps, rate_limit.window)
+            current_count = len(timestamps)
 
         allowed = current_count <= rate_limit.requests
 
@@ -179,50 +613,26 @@ class RateLimiter:
 
         if self.redis_client:
             try:
-                # Get current bucket state
-                bucket_data = await self.redis_client.hmget(
-                    key, "tokens", "last_refill"
+                allowed, tokens = await self.scripts["token_bucket"](
+                    keys=[key],
+                    args=[burst, refill_rate, now, rate_limit.window * 2],
                 )
-
-                if bucket_data[0] is None:
-                    # Initialize bucket
-                    tokens = float(burst)
-                    last_refill = now
-                else:
-                    tokens = float(bucket_data[0])
-                    last_refill = float(bucket_data[1])
-
-                # Calculate tokens to add
-                time_passed = now - last_refill
-                tokens_to_add = time_passed * refill_rate
-                tokens = min(burst, tokens + tokens_to_add)
-
-                # Check if request can be satisfied
-                if tokens >= 1:
-                    tokens -= 1
-                    allowed = True
-                else:
-                    allowed = False
-
-                # Update bucket
-                await self.redis_client.hmset(key, {
-                    "tokens": tokens,
-                    "last_refill": now
-                })
-                await self.redis_client.expire(key, rate_limit.window * 2)
+                allowed = bool(allowed)
+                tokens = float(tokens)
 
             except Exception as e:
                 logger.error(f"Redis error in token bucket: {e}")
                 return True, {}
         else:
             # Memory fallback
-            if key not in self.memory_store:
-                self.memory_store[key] = {
+            bucket = self.memory_store.get(key)
+            if bucket is None:
+                bucket = {
                     "tokens": float(burst),
                     "last_refill": now
                 }
+            self.memory_store.set(key, bucket, rate_limit.window * 2)
 
-            bucket = self.memory_store[key]
             time_passed = now - bucket["last_refill"]
             tokens_to_add = time_passed * refill_rate
             bucket["tokens"] = min(burst, bucket["tokens"] + tokens_to_add)
@@ -254,48 +664,26 @@ class RateLimiter:
 
         if self.redis_client:
             try:
-                bucket_data = await self.redis_client.hmget(
-                    key, "volume", "last_leak"
+                allowed, volume = await self.scripts["leaky_bucket"](
+                    keys=[key],
+                    args=[bucket_size, leak_rate, now, rate_limit.window * 2],
                 )
-
-                if bucket_data[0] is None:
-                    volume = 0.0
-                    last_leak = now
-                else:
-                    volume = float(bucket_data[0])
-                    last_leak = float(bucket_data[1])
-
-                # Calculate leaked volume
-                time_passed = now - last_leak
-                leaked = time_passed * leak_rate
-                volume = max(0, volume - leaked)
-
-                # Check if bucket can accept new request
-                if volume < bucket_size:
-                    volume += 1
-                    allowed = True
-                else:
-                    allowed = False
-
-                # Update bucket
-                await self.redis_client.hmset(key, {
-                    "volume": volume,
-                    "last_leak": now
-                })
-                await self.redis_client.expire(key, rate_limit.window * 2)
+                allowed = bool(allowed)
+                volume = float(volume)
 
             except Exception as e:
                 logger.error(f"Redis error in leaky bucket: {e}")
                 return True, {}
         else:
             # Memory fallback
-            if key not in self.memory_store:
-                self.memory_store[key] = {
+            bucket = self.memory_store.get(key)
+            if bucket is None:
+                bucket = {
                     "volume": 0.0,
                     "last_leak": now
                 }
+            self.memory_store.set(key, bucket, rate_limit.window * 2)
 
-            bucket = self.memory_store[key]
             time_passed = now - bucket["last_leak"]
             leaked = time_passed * leak_rate
             bucket["volume"] = max(0, bucket["volume"] - leaked)
@@ -306,6 +694,7 @@ class RateLimiter:
                 allowed = True
             else:
                 allowed = False
+            volume = bucket["volume"]
 
         metadata = {
             "limit": rate_limit.requests,
@@ -321,18 +710,170 @@ class RateLimiter:
 rate_limiter = RateLimiter()
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Middleware for applying rate limits to HTTP requests"""
+@dataclass
+class RateLimitRule:
+    """
+    Limits applied to requests matching a route template.
+
+    Templates are matched per path segment: "{param}" matches any single
+    segment and a trailing "**" matches the route itself and everything below
+    it. A request must be admitted by every limit of its rule, so a rule can
+    combine a short burst limit with a sustained one. Rules sharing a name
+    share their counters.
+    """
+    route: str
+    limits: Tuple[RateLimit, ...]
+    methods: Optional[Tuple[str, ...]] = None  # None matches any method
+    tiers: Optional[Tuple[str, ...]] = None  # None matches any client tier
+    name: Optional[str] = None
+
+    def __post_init__(self):
+        self.limits = tuple(self.limits)
+        if self.methods:
+            self.methods = tuple(method.upper() for method in self.methods)
+        if self.name is None:
+            self.name = self.route
+
+
+class _RuleTable:
+    """Rules declared at one route node, keyed by (method, tier) with "*" wildcards"""
+
+    __slots__ = ("rules",)
 
-    def __init__(self, app, rate_limits: Dict[str, RateLimit] = None):
-        super().__init__(app)
-        self.rate_limits = rate_limits or {}
-        # Default rate limits
-        self.default_limits = {
-            "default": RateLimit(100, 60),  # 100 requests per minute
-            "auth": RateLimit(5, 60),  # 5 auth requests per minute
-            "upload": RateLimit(10, 60),  # 10 uploads per minute
-        }
+    def __init__(self):
+        self.rules: Dict[Tuple[str, str], RateLimitRule] = {}
+
+    def add(self, rule: RateLimitRule):
+        # The first rule declared for a (method, tier) pair wins
+        for method in rule.methods or ("*",):
+            for tier in rule.tiers or ("*",):
+                self.rules.setdefault((method, tier), rule)
+
+    def resolve(self, method: str, tier: str) -> Optional[RateLimitRule]:
+        if not self.rules:
+            return None
+        rules = self.rules
+        return (
+            rules.get((method, tier))
+            or rules.get((method, "*"))
+            or rules.get(("*", tier))
+            or rules.get(("*", "*"))
+        )
+
+
+class _RouteNode:
+    __slots__ = ("static", "param", "exact", "subtree")
+
+    def __init__(self):
+        self.static: Dict[str, "_RouteNode"] = {}
+        self.param: Optional["_RouteNode"] = None
+        self.exact = _RuleTable()  # Rules for this exact route
+        self.subtree = _RuleTable()  # Rules for this route and everything below it
+
+
+class RateLimitRouter:
+    """
+    Rate limit rules compiled into a segment trie.
+
+    Resolution walks the request path once, so its cost depends on the path
+    depth rather than on the number of rules. Static segments take precedence
+    over "{param}" segments, and the deepest matching route wins.
+    """
+
+    def __init__(self, rules: List[RateLimitRule]):
+        self.rules = list(rules)
+        self.root = _RouteNode()
+        for rule in self.rules:
+            self._insert(rule)
+
+    @staticmethod
+    def _split(path: str) -> List[str]:
+        return [segment for segment in path.split("/") if segment]
+
+    def _insert(self, rule: RateLimitRule):
+        segments = self._split(rule.route)
+        subtree = bool(segments) and segments[-1] == "**"
+        if subtree:
+            segments = segments[:-1]
+
+        node = self.root
+        for segment in segments:
+            if segment == "**":
+                raise ValueError(f"'**' must be the last segment of a route: {rule.route}")
+            if segment.startswith("{") and segment.endswith("}"):
+                if node.param is None:
+                    node.param = _RouteNode()
+                node = node.param
+            else:
+                node = node.static.setdefault(segment, _RouteNode())
+
+        (node.subtree if subtree else node.exact).add(rule)
+
+    def resolve(self, method: str, path: str, tier: str) -> Optional[RateLimitRule]:
+        """Return the most specific rule for a request, or None"""
+        return self._lookup(self.root, self._split(path), 0, method.upper(), tier)
+
+    def _lookup(
+        self, node: _RouteNode, segments: List[str], index: int, method: str, tier: str
+    ) -> Optional[RateLimitRule]:
+        if index == len(segments):
+            rule = node.exact.resolve(method, tier)
+            if rule:
+                return rule
+        else:
+            child = node.static.get(segments[index])
+            if child is not None:
+                rule = self._lookup(child, segments, index + 1, method, tier)
+                if rule:
+                    return rule
+            if node.param is not None:
+                rule = self._lookup(node.param, segments, index + 1, method, tier)
+                if rule:
+                    return rule
+
+        return node.subtree.resolve(method, tier)
+
+
+# 100 requests per minute, admitted locally in leases of 10
+DEFAULT_RATE_LIMIT = RateLimit(100, 60, RateLimitStrategy.SLIDING_WINDOW_COUNTER, lease_size=10)
+AUTH_RATE_LIMIT = RateLimit(5, 60)  # 5 auth requests per minute
+UPLOAD_RATE_LIMIT = RateLimit(10, 60)  # 10 uploads per minute
+
+DEFAULT_RATE_LIMIT_RULES = [
+    # Health checks and metrics scraping are never limited
+    RateLimitRule("/health", ()),
+    RateLimitRule("/metrics", ()),
+    RateLimitRule("/api/v1/auth/**", (AUTH_RATE_LIMIT,), name="auth"),
+    RateLimitRule("/api/v1/documents/**", (UPLOAD_RATE_LIMIT,), name="upload"),
+    RateLimitRule("/api/v1/resources/upload", (UPLOAD_RATE_LIMIT,), methods=("POST",), name="upload"),
+    RateLimitRule(
+        "/api/v1/settings/context-documents/upload", (UPLOAD_RATE_LIMIT,), methods=("POST",), name="upload"
+    ),
+    RateLimitRule("/**", (DEFAULT_RATE_LIMIT,), name="default"),
+]
+
+
+class RateLimitMiddleware:
+    """
+    Middleware for applying rate limits to HTTP requests.
+
+    Plain ASGI: rate limit headers are added to the http.response.start
+    message, so the response body (including streams) is never buffered.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        rate_limits: Union[List[RateLimitRule], Dict[str, RateLimit], None] = None
+    ):
+        self.app = app
+        # Plain {route template: limit} mappings are accepted for convenience
+        if isinstance(rate_limits, dict):
+            rate_limits = [RateLimitRule(route, (limit,)) for route, limit in rate_limits.items()]
+
+        # Custom rules take precedence over the defaults for the same route
+        self.rules = list(rate_limits or []) + DEFAULT_RATE_LIMIT_RULES
+        self.router = RateLimitRouter(self.rules)
 
     def get_client_identifier(self, request: Request) -> str:
         """Generate client identifier for rate limiting"""
@@ -350,38 +891,62 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
 
         return f"ip:{client_ip}"
 
-    def get_rate_limit_for_endpoint(self, request: Request) -> RateLimit:
-        """Determine rate limit for specific endpoint"""
-        path = request.url.path
-
-        # Check for specific endpoint limits
-        for pattern, limit in self.rate_limits.items():
-            if pattern in path:
-                return limit
+    def get_client_tier(self, request: Request) -> str:
+        """Rate limit tier of the client; authentication may set request.state.rate_limit_tier"""
+        tier = getattr(request.state, 'rate_limit_tier', None)
+        if tier:
+            return tier
+        return "user" if getattr(request.state, 'user_id', None) else "anonymous"
 
-        # Apply specific limits for certain endpoints
-        if "/auth/" in path:
-            return self.default_limits["auth"]
-        elif "/upload" in path or "/documents" in path:
-            return self.default_limits["upload"]
-        else:
-            return self.default_limits["default"]
+    def get_rule_for_endpoint(self, request: Request) -> Optional[RateLimitRule]:
+        """Determine the rate limit rule for specific endpoint"""
+        return self.router.resolve(request.method, request.url.path, self.get_client_tier(request))
 
-    async def dispatch(self, request: Request, call_next):
-        # Skip rate limiting for health checks
-        if request.url.path in ["/health", "/metrics"]:
-            return await call_next(request)
+    async def check_rule(self, client_id: str, rule: RateLimitRule) -> Tuple[bool, RateLimit, Dict[str, Any]]:
+        """
+        Check every limit of a rule.
 
-        # Get client identifier and rate limit
+        Returns the denying limit if any, otherwise the limit with the fewest
+        remaining requests, so headers always describe the binding constraint.
+        """
+        if len(rule.limits) == 1:
+            limit = rule.limits[0]
+            allowed, metadata = await rate_limiter.check_rate_limit(f"{client_id}:{rule.name}", limit)
+            return allowed, limit, metadata
+
+        results = await asyncio.gather(*[
+            rate_limiter.check_rate_limit(f"{client_id}:{rule.name}:{index}", limit)
+            for index, limit in enumerate(rule.limits)
+        ])
+
+        binding = None
+        for limit, (allowed, metadata) in zip(rule.limits, results):
+            if not allowed:
+                return False, limit, metadata
+            if binding is None or metadata.get('remaining', 0) < binding[2].get('remaining', 0):
+                binding = (True, limit, metadata)
+        return binding
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        rule = self.get_rule_for_endpoint(request)
+
+        # Routes without limits (health checks, metrics) skip rate limiting
+        if rule is None or not rule.limits:
+            await self.app(scope, receive, send)
+            return
+
+        # Get client identifier and check the rule's limits
         client_id = self.get_client_identifier(request)
-        rate_limit = self.get_rate_limit_for_endpoint(request)
-
-        # Check rate limit
-        allowed, metadata = await rate_limiter.check_rate_limit(client_id, rate_limit)
+        allowed, rate_limit, metadata = await self.check_rule(client_id, rule)
 
         if not allowed:
             # Rate limit exceeded
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
                     "error": "Rate limit exceeded",
@@ -395,16 +960,19 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                     "Retry-After": str(int(metadata.get('reset', time.time() + rate_limit.window) - time.time()))
                 }
             )
-
-        # Add rate limit headers to response
-        response = await call_next(request)
-
-        # Add rate limit info to response headers
-        response.headers["X-RateLimit-Limit"] = str(metadata.get('limit', rate_limit.requests))
-        response.headers["X-RateLimit-Remaining"] = str(metadata.get('remaining', 0))
-        response.headers["X-RateLimit-Reset"] = str(metadata.get('reset', time.time() + rate_limit.window))
-
-        return response
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                # Add rate limit info to response headers
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(metadata.get('limit', rate_limit.requests))
+                headers["X-RateLimit-Remaining"] = str(metadata.get('remaining', 0))
+                headers["X-RateLimit-Reset"] = str(metadata.get('reset', time.time() + rate_limit.window))
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
 
 
 # Decorator for applying rate limits to specific functions
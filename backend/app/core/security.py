@@ -84,4 +84,10 @@ async def get_current_user(
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def get_current_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
+    admins = {email.lower() for email in settings.ADMIN_EMAILS}
+    if current_user.email.lower() not in admins:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
@@ -0,0 +1,484 @@
+"""
+Lightweight request tracing for Core Engine.
+Spans are propagated through contextvars, sampled per trace and exported
+in batches as OTLP/JSON, either to an OTLP/HTTP collector or to a local
+JSON lines file.
+"""
+
+import json
+import random
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import logging
+
+import aiohttp
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.monitoring import TRACING_SPANS, PrometheusMiddleware
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "core-engine"
+# Longest SQL statement recorded on a span
+MAX_STATEMENT_LENGTH = 1000
+
+
+class SpanKind(IntEnum):
+    """OTLP span kinds"""
+    INTERNAL = 1
+    SERVER = 2
+    CLIENT = 3
+
+
+class StatusCode(IntEnum):
+    """OTLP status codes"""
+    UNSET = 0
+    OK = 1
+    ERROR = 2
+
+
+# Span of the code currently running in this task or thread
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    A timed operation within a trace.
+
+    Used as a context manager the span becomes the current span, so spans
+    started inside it are its children. Spans started without a with block
+    (e.g. from SQLAlchemy or aiohttp hooks) must be ended with end().
+    """
+
+    __slots__ = (
+        "tracer", "name", "kind", "trace_id", "span_id", "parent_id",
+        "start_ns", "end_ns", "attributes", "status", "status_message", "_token",
+    )
+
+    sampled = True
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        kind: SpanKind,
+        trace_id: str,
+        parent_id: Optional[str],
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+        self.status = StatusCode.UNSET
+        self.status_message = ""
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_status(self, status: StatusCode, message: str = ""):
+        self.status = status
+        self.status_message = message
+
+    def record_exception(self, exc: BaseException):
+        self.attributes["exception.type"] = type(exc).__name__
+        self.attributes["exception.message"] = str(exc)[:500]
+        self.set_status(StatusCode.ERROR, str(exc)[:200])
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.tracer._finish(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_exception(exc)
+        _current_span.reset(self._token)
+        self._token = None
+        self.end()
+
+
+class _NonRecordingSpan:
+    """Stand-in span when tracing is off or the trace is not sampled"""
+
+    __slots__ = ()
+
+    sampled = False
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_status(self, status: StatusCode, message: str = ""):
+        pass
+
+    def record_exception(self, exc: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+NON_RECORDING_SPAN = _NonRecordingSpan()
+
+
+class _UnsampledRoot(_NonRecordingSpan):
+    """
+    Root of a trace that was not sampled. Becomes the current span so the
+    operations under it are not sampled afresh as traces of their own.
+    """
+
+    __slots__ = ("_token",)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+
+
+class JsonFileExporter:
+    """Appends each OTLP/JSON export request to a JSON lines file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, payload: Dict[str, Any]):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(payload, separators=(",", ":")) + "\n")
+
+
+class OTLPHttpExporter:
+    """Posts OTLP/JSON export requests to a collector's /v1/traces endpoint"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, payload: Dict[str, Any]):
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(payload, separators=(",", ":")).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP/JSON encodes 64-bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class Tracer:
+    """
+    Creates spans and exports finished ones in the background.
+
+    Sampling is decided once per trace, at its root: sample_rate of new
+    traces are recorded and every span beneath a sampled root is recorded
+    with it. Spans started with require_parent=True (database, Redis and
+    HTTP client calls) are only recorded inside an existing trace, so
+    background chatter does not start traces of its own.
+
+    Finished spans go into a bounded queue; a daemon thread sends them to
+    the exporter every export_interval seconds, so exporting never blocks
+    the event loop. Spans arriving while the queue is full are dropped.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        sample_rate: float = 0.1,
+        exporter=None,
+        export_interval: float = 5.0,
+        max_queue_size: int = 10000,
+        max_batch_size: int = 512,
+    ):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self.export_interval = export_interval
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+
+        self._queue: Deque[Span] = deque()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"exported": 0, "dropped": 0, "export_failures": 0}
+
+    @staticmethod
+    def current_span():
+        return _current_span.get()
+
+    def start_span(
+        self,
+        name: str,
+        kind: SpanKind = SpanKind.INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+        require_parent: bool = False,
+        remote_parent: Optional[Tuple[str, str, bool]] = None,
+    ):
+        """
+        Start a span as a child of the current span.
+
+        remote_parent is a (trace_id, span_id, sampled) tuple from an
+        incoming traceparent header, used for server spans.
+        """
+        if not self.enabled:
+            return NON_RECORDING_SPAN
+
+        parent = _current_span.get()
+        if parent is not None:
+            if not parent.sampled:
+                return NON_RECORDING_SPAN
+            return Span(self, name, kind, parent.trace_id, parent.span_id, attributes)
+
+        if remote_parent is not None:
+            trace_id, parent_id, sampled = remote_parent
+            if not sampled:
+                return _UnsampledRoot()
+            return Span(self, name, kind, trace_id, parent_id, attributes)
+
+        if require_parent:
+            return NON_RECORDING_SPAN
+        if random.random() >= self.sample_rate:
+            return _UnsampledRoot()
+        return Span(self, name, kind, f"{random.getrandbits(128):032x}", None, attributes)
+
+    def _finish(self, span: Span):
+        if len(self._queue) >= self.max_queue_size:
+            self.stats["dropped"] += 1
+            TRACING_SPANS.labels(result="dropped").inc()
+            return
+        self._queue.append(span)
+
+    def start(self):
+        """Start the export thread"""
+        if not self.enabled or self.exporter is None:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def shutdown(self, timeout: float = 5.0):
+        """Stop the export thread after a final flush"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.export_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        """Export every queued span; called from the export thread"""
+        while self._queue:
+            batch = []
+            while self._queue and len(batch) < self.max_batch_size:
+                batch.append(self._queue.popleft())
+            try:
+                self.exporter.export(self.to_otlp(batch))
+            except Exception as e:
+                self.stats["export_failures"] += 1
+                TRACING_SPANS.labels(result="failed").inc(len(batch))
+                logger.warning(f"Trace export failed, {len(batch)} spans lost: {e}")
+                return
+            self.stats["exported"] += len(batch)
+            TRACING_SPANS.labels(result="exported").inc(len(batch))
+
+    @staticmethod
+    def to_otlp(spans: List[Span]) -> Dict[str, Any]:
+        """OTLP/JSON ExportTraceServiceRequest for a batch of spans"""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({
+                    "service.name": SERVICE_NAME,
+                    "deployment.environment": settings.ENVIRONMENT,
+                })},
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": [
+                        {
+                            "traceId": span.trace_id,
+                            "spanId": span.span_id,
+                            "parentSpanId": span.parent_id or "",
+                            "name": span.name,
+                            "kind": int(span.kind),
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns),
+                            "attributes": _otlp_attributes(span.attributes),
+                            "status": {"code": int(span.status), "message": span.status_message},
+                        }
+                        for span in spans
+                    ],
+                }],
+            }]
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "queued": len(self._queue),
+            **self.stats,
+        }
+
+
+def _build_exporter():
+    if settings.TRACING_EXPORTER == "file":
+        return JsonFileExporter(settings.TRACING_FILE_PATH)
+    return OTLPHttpExporter(settings.TRACING_OTLP_ENDPOINT)
+
+
+# Global tracer instance
+tracer = Tracer(
+    enabled=settings.TRACING_ENABLED,
+    sample_rate=settings.TRACING_SAMPLE_RATE,
+    exporter=_build_exporter(),
+)
+
+
+def parse_traceparent(value: str) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, span_id, sampled) from a W3C traceparent header"""
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3][:2], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a server span for each HTTP request.
+
+    Continues the caller's trace when a traceparent header is present and
+    returns the trace id of sampled requests in X-Trace-Id.
+    """
+
+    def __init__(self, app: ASGIApp, tracer_instance: Optional[Tracer] = None):
+        self.app = app
+        self.tracer = tracer_instance or tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        remote_parent = None
+        for name, value in scope.get("headers", ()):
+            if name == b"traceparent":
+                remote_parent = parse_traceparent(value.decode("latin-1"))
+                break
+
+        span = self.tracer.start_span(
+            f"{scope['method']} {scope['path']}",
+            kind=SpanKind.SERVER,
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+            remote_parent=remote_parent,
+        )
+        if not span.sampled:
+            with span:
+                await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                span.set_attribute("http.status_code", status_code)
+                if status_code >= 500:
+                    span.set_status(StatusCode.ERROR)
+                MutableHeaders(scope=message)["X-Trace-Id"] = span.trace_id
+            await send(message)
+
+        with span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # Named after the route template so spans group by endpoint
+                route = PrometheusMiddleware.get_route_template(scope)
+                span.name = f"{scope['method']} {route}"
+                span.set_attribute("http.route", route)
+
+
+async def _on_request_start(session, trace_config_ctx, params):
+    trace_config_ctx.span = tracer.start_span(
+        f"HTTP {params.method}",
+        kind=SpanKind.CLIENT,
+        attributes={
+            "http.method": params.method,
+            # Without the query string, which may carry credentials
+            "http.url": str(params.url.with_query(None)),
+            "net.peer.name": params.url.host,
+        },
+        require_parent=True,
+    )
+
+
+async def _on_request_end(session, trace_config_ctx, params):
+    span = trace_config_ctx.span
+    status_code = params.response.status
+    span.set_attribute("http.status_code", status_code)
+    if status_code >= 400:
+        span.set_status(StatusCode.ERROR, f"HTTP {status_code}")
+    span.end()
+
+
+async def _on_request_exception(session, trace_config_ctx, params):
+    span = trace_config_ctx.span
+    span.record_exception(params.exception)
+    span.end()
+
+
+def aiohttp_trace_config() -> aiohttp.TraceConfig:
+    """aiohttp TraceConfig recording a client span per request, for ClientSession(trace_configs=[...])"""
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_request_end.append(_on_request_end)
+    trace_config.on_request_exception.append(_on_request_exception)
+    return trace_config
@@ -15,6 +15,8 @@ from app.core.integration_engine import (
     SyncResult, SyncStatus, IntegrationMetadata, register_integration
 )
 from app.models import Course, Assignment
+from app.core.outbound_governor import outbound_governor
+from app.core.tracing import aiohttp_trace_config
 
 class CanvasConfig(BaseModel):
     """Canvas API configuration"""
@@ -81,7 +83,7 @@ class CanvasIntegration(BaseIntegration[CanvasCourse]):
                 "Authorization": f"Bearer {self.canvas_config.access_token}",
                 "Content-Type": "application/json"
             }
-            self.session = aiohttp.ClientSession(headers=headers)
+            self.session = aiohttp.ClientSession(headers=headers, trace_configs=[aiohttp_trace_config()])
         return self.session
     
     async def _make_request(self, endpoint: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
@@ -90,7 +92,9 @@ class CanvasIntegration(BaseIntegration[CanvasCourse]):
         url = f"{self.canvas_config.api_url.rstrip('/')}/{endpoint.lstrip('/')}"
         
         try:
-            async with session.get(url, params=params or {}) as response:
+            async with outbound_governor.request(
+                "canvas", self.canvas_config.access_token, session, "GET", url, params=params or {}
+            ) as response:
                 response.raise_for_status()
                 return await response.json()
         except aiohttp.ClientError as e:
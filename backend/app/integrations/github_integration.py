@@ -18,6 +18,8 @@ from app.core.integration_engine import (
     BaseIntegration, IntegrationType, IntegrationCapability, 
     SyncResult, SyncStatus, IntegrationMetadata, register_integration
 )
+from app.core.outbound_governor import outbound_governor
+from app.core.tracing import aiohttp_trace_config
 
 class GitHubAuthMode(str, Enum):
     """GitHub authentication modes"""
@@ -153,7 +155,7 @@ class GitHubIntegration(BaseIntegration[GitHubRepository]):
         
         url = f"{self.github_config.api_url}/app/installations/{self.github_config.installation_id}/access_tokens"
         
-        async with aiohttp.ClientSession(headers=headers) as session:
+        async with aiohttp.ClientSession(headers=headers, trace_configs=[aiohttp_trace_config()]) as session:
             async with session.post(url) as response:
                 response.raise_for_status()
                 data = await response.json()
@@ -174,16 +176,24 @@ class GitHubIntegration(BaseIntegration[GitHubRepository]):
                 installation_token = await self._get_installation_token()
                 headers["Authorization"] = f"token {installation_token}"
             
-            self.session = aiohttp.ClientSession(headers=headers)
+            self.session = aiohttp.ClientSession(headers=headers, trace_configs=[aiohttp_trace_config()])
         return self.session
     
+    def _credential_key(self) -> str:
+        """Identity whose GitHub rate limit a request counts against"""
+        if self.github_config.is_github_app_mode():
+            return f"installation:{self.github_config.installation_id}"
+        return self.github_config.access_token or ""
+
     async def _make_request(self, endpoint: str, params: Dict[str, Any] = None) -> Any:
         """Make GitHub API request"""
         session = await self._get_session()
         url = f"{self.github_config.api_url.rstrip('/')}/{endpoint.lstrip('/')}"
         
         try:
-            async with session.get(url, params=params or {}) as response:
+            async with outbound_governor.request(
+                "github", self._credential_key(), session, "GET", url, params=params or {}
+            ) as response:
                 response.raise_for_status()
                 return await response.json()
         except aiohttp.ClientError as e:
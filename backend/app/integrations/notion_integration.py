@@ -15,6 +15,8 @@ from app.core.integration_engine import (
     BaseIntegration, IntegrationType, IntegrationCapability, 
     SyncResult, SyncStatus, IntegrationMetadata, register_integration
 )
+from app.core.outbound_governor import outbound_governor
+from app.core.tracing import aiohttp_trace_config
 
 class NotionConfig(BaseModel):
     """Notion API configuration"""
@@ -97,7 +99,7 @@ class NotionIntegration(BaseIntegration[NotionPage]):
                 "Notion-Version": self.notion_config.notion_version,
                 "Content-Type": "application/json"
             }
-            self.session = aiohttp.ClientSession(headers=headers)
+            self.session = aiohttp.ClientSession(headers=headers, trace_configs=[aiohttp_trace_config()])
         return self.session
     
     async def _make_request(self, endpoint: str, method: str = "GET", data: Dict[str, Any] = None, params: Dict[str, Any] = None) -> Any:
@@ -110,7 +112,9 @@ class NotionIntegration(BaseIntegration[NotionPage]):
             if data and method in ["POST", "PATCH"]:
                 kwargs["json"] = data
             
-            async with session.request(method, url, **kwargs) as response:
+            async with outbound_governor.request(
+                "notion", self.notion_config.access_token, session, method, url, **kwargs
+            ) as response:
                 response.raise_for_status()
                 return await response.json()
         except aiohttp.ClientError as e:
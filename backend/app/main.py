@@ -8,11 +8,16 @@ from app.core.database import init_db
 from app.core.plugin_loader import PluginLoader
 from app.core.agent_registry import AgentRegistry
 from app.core.celery_app import celery_app
-from app.core.monitoring import PrometheusMiddleware, metrics_handler, health_handler, setup_monitoring
-from app.core.cache import cache_manager
+from app.core.monitoring import PrometheusMiddleware, metrics_handler, health_handler, setup_monitoring, shutdown_monitoring
+from app.core.cache import cache_manager, session_cache, install_model_invalidation_hooks
 from app.core.rate_limiter import rate_limiter, RateLimitMiddleware
+from app.core.load_shedding import LoadSheddingMiddleware
+from app.core.loop_monitor import loop_monitor, EventLoopMonitorMiddleware
+from app.core.tracing import tracer, TracingMiddleware
+from app.core.profiler import RequestProfilingMiddleware
 from app.api.v1 import auth, courses, assignments, resources, plugins, workflows, agents, documents, ai_context, credentials as credentials_api
 from app.api.v1 import settings as settings_api
+from app.api.v1 import debug as debug_api
 # Import integrations to register them
 import app.integrations
 import logging
@@ -74,14 +79,23 @@ async def lifespan(app: FastAPI):
     
     # Initialize performance systems
     await cache_manager.connect()
+    install_model_invalidation_hooks()
+    session_cache.start()
     await rate_limiter.connect()
     setup_monitoring()
+    tracer.start()
+    if config_settings.EVENT_LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
 
     logger.info("Core Engine MVP started successfully")
     yield
     # Shutdown
     logger.info("Shutting down Core Engine MVP...")
+    await loop_monitor.stop()
+    await session_cache.stop()
     await cache_manager.disconnect()
+    shutdown_monitoring()
+    tracer.shutdown()
     logger.info("Performance systems shut down")
 
 app = FastAPI(
@@ -92,8 +106,14 @@ app = FastAPI(
 )
 
 # Add performance middleware
+app.add_middleware(RequestProfilingMiddleware)
+app.add_middleware(EventLoopMonitorMiddleware)
+# Inside the rate limiter, so fast 429s never reach the concurrency limiter
+# as latency samples and inflate its limit under abusive traffic
+app.add_middleware(LoadSheddingMiddleware)
 app.add_middleware(RateLimitMiddleware)
 app.add_middleware(PrometheusMiddleware)
+app.add_middleware(TracingMiddleware)
 
 # CORS middleware
 app.add_middleware(
@@ -116,6 +136,7 @@ app.include_router(agents.router, prefix="/api/v1/agents", tags=["ai-agents"])
 app.include_router(documents.router, prefix="/api/v1/documents", tags=["documents"])
 app.include_router(ai_context.router, prefix="/api/v1/ai-context", tags=["ai-context"])
 app.include_router(credentials_api.router, prefix="/api/v1", tags=["credentials"])
+app.include_router(debug_api.router, prefix="/api/v1/debug", tags=["debug"])
 
 @app.get("/")
 async def root():
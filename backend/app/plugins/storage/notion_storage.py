@@ -14,6 +14,7 @@ from app.core.plugin_interface import (
     StoragePlugin, PluginResult, PluginMetadata, PluginType, 
     PluginCapability, PluginConfig, PluginProcessingError
 )
+from app.core.outbound_governor import outbound_governor
 
 try:
     from notion_client import Client
@@ -523,11 +524,19 @@ class NotionStoragePlugin(StoragePlugin):
         
         return 'Untitled'
 
-    async def _make_request(self, func, **kwargs):
+    async def _make_request(self, func, max_retries: int = 3, **kwargs):
         """Make async request to Notion API with error handling"""
         loop = asyncio.get_event_loop()
         try:
-            return await loop.run_in_executor(None, lambda: func(**kwargs))
+            for attempt in range(max_retries + 1):
+                await outbound_governor.acquire("notion", self.integration_token)
+                try:
+                    return await loop.run_in_executor(None, lambda: func(**kwargs))
+                except APIResponseError as e:
+                    # Retry throttled calls after the back-off Notion asked for
+                    limited = await outbound_governor.observe("notion", self.integration_token, e.status, e.headers)
+                    if not limited or attempt == max_retries:
+                        raise
         except APIResponseError as e:
             self.logger.error(f"Notion API error: {e.status_code} - {e.message}")
             raise PluginProcessingError(f"Notion API error: {e.message}", self.metadata.name)
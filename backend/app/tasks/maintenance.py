@@ -0,0 +1,24 @@
+from celery import shared_task
+from app.core.cache import CacheManager
+import logging
+import asyncio
+
+logger = logging.getLogger(__name__)
+
+@shared_task(bind=True)
+def cleanup_expired_cache(self):
+    """Reclaim memory held by keys from invalidated cache generations"""
+    return asyncio.run(_cleanup_expired_cache())
+
+async def _cleanup_expired_cache():
+    """Async implementation of cache cleanup"""
+    manager = CacheManager()
+    manager.local_cache = None
+    await manager.connect(listen=False)
+
+    try:
+        deleted = await manager.purge_all_stale_keys()
+        logger.info(f"Cache cleanup removed {deleted} stale keys")
+        return {"deleted": deleted}
+    finally:
+        await manager.disconnect()
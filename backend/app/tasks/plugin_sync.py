@@ -4,6 +4,7 @@ from sqlalchemy import select
 from app.core.database import AsyncSessionLocal
 from app.models.plugin import UserPluginConfig
 from app.core.plugin_loader import PluginLoader
+from app.core.rate_limiter import rate_limiter
 import logging
 import asyncio
 
@@ -12,12 +13,24 @@ logger = logging.getLogger(__name__)
 @shared_task(bind=True)
 def sync_all_canvas_data(self):
     """Sync Canvas data for all active users"""
-    return asyncio.run(_sync_all_canvas_data())
+    return asyncio.run(_with_rate_limiter(_sync_all_canvas_data()))
 
 @shared_task(bind=True)
 def sync_all_github_data(self):
     """Sync GitHub data for all active users"""
-    return asyncio.run(_sync_all_github_data())
+    return asyncio.run(_with_rate_limiter(_sync_all_github_data()))
+
+async def _with_rate_limiter(sync):
+    """
+    Run a sync with the rate limiter connected to Redis, so the outbound
+    governor shares provider budgets and back-offs with every other worker.
+    The connection belongs to this task's event loop and is closed with it.
+    """
+    await rate_limiter.connect()
+    try:
+        return await sync
+    finally:
+        await rate_limiter.disconnect()
 
 async def _sync_all_canvas_data():
     """Async implementation of Canvas sync"""
@@ -0,0 +1 @@
+# Performance benchmarks; run from backend/ with `python -m benchmarks.<name>`
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Requests per second through the HTTP middleware stack: no middleware, the
+previous BaseHTTPMiddleware implementations and the plain ASGI ones.
+
+Usage (from backend/):
+    python -m benchmarks.middleware_throughput                 # memory fallback limiter
+    python -m benchmarks.middleware_throughput --redis-url redis://localhost:6379/15
+
+Requests are driven straight through the ASGI callable, without a server or
+sockets, so the numbers isolate the cost of the middleware themselves. The
+limit is set high enough that every request is admitted.
+"""
+
+import argparse
+import asyncio
+import time
+
+import redis.asyncio as redis
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import StreamingResponse
+
+from app.core.monitoring import ACTIVE_CONNECTIONS, REQUEST_COUNT, REQUEST_DURATION, PrometheusMiddleware
+from app.core.rate_limiter import (
+    RateLimit,
+    RateLimitMiddleware,
+    RateLimitRule,
+    RateLimitStrategy,
+    rate_limiter,
+)
+
+BENCHMARK_RULES = [
+    RateLimitRule("/**", (RateLimit(10 ** 9, 60, RateLimitStrategy.SLIDING_WINDOW_COUNTER, lease_size=1000),))
+]
+
+
+class LegacyPrometheusMiddleware(BaseHTTPMiddleware):
+    """Copy of the BaseHTTPMiddleware implementation, for comparison"""
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        ACTIVE_CONNECTIONS.inc()
+        try:
+            response = await call_next(request)
+            duration = time.time() - start_time
+            REQUEST_COUNT.labels(
+                method=request.method, endpoint=request.url.path, status_code=response.status_code
+            ).inc()
+            REQUEST_DURATION.labels(method=request.method, endpoint=request.url.path).observe(duration)
+            return response
+        finally:
+            ACTIVE_CONNECTIONS.dec()
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """Copy of the BaseHTTPMiddleware implementation, reusing the rule resolution"""
+
+    def __init__(self, app, rate_limits=None):
+        super().__init__(app)
+        self.limits = RateLimitMiddleware(app, rate_limits)
+
+    async def dispatch(self, request: Request, call_next):
+        rule = self.limits.get_rule_for_endpoint(request)
+        if rule is None or not rule.limits:
+            return await call_next(request)
+
+        client_id = self.limits.get_client_identifier(request)
+        allowed, rate_limit, metadata = await self.limits.check_rule(client_id, rule)
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(metadata.get('limit', rate_limit.requests))
+        response.headers["X-RateLimit-Remaining"] = str(metadata.get('remaining', 0))
+        response.headers["X-RateLimit-Reset"] = str(metadata.get('reset', time.time() + rate_limit.window))
+        return response
+
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/v1/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id, "name": "item"}
+
+    @app.get("/api/v1/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(8):
+                yield b"x" * 1024
+        return StreamingResponse(chunks())
+
+    if stack == "legacy":
+        app.add_middleware(LegacyRateLimitMiddleware, rate_limits=BENCHMARK_RULES)
+        app.add_middleware(LegacyPrometheusMiddleware)
+    elif stack == "asgi":
+        app.add_middleware(RateLimitMiddleware, rate_limits=BENCHMARK_RULES)
+        app.add_middleware(PrometheusMiddleware)
+    return app
+
+
+async def call(app, path: str) -> int:
+    """Send one GET request through the ASGI app and return its status"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    status = 0
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if request_sent:
+            # Like a connected client: no disconnect until cancelled
+            await asyncio.Event().wait()
+        request_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure_rps(app, path: str, requests: int, concurrency: int) -> float:
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            assert await call(app, path) == 200
+
+    # Warm up routing, metric label children and limiter state
+    for _ in range(50):
+        await call(app, path)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return requests / (time.perf_counter() - start)
+
+
+async def run(args) -> None:
+    if args.redis_url:
+        rate_limiter.redis_client = redis.from_url(args.redis_url)
+        rate_limiter._register_scripts()
+        await rate_limiter._load_scripts()
+    else:
+        rate_limiter.redis_client = None
+
+    paths = {"json": "/api/v1/items/1", "stream": "/api/v1/stream"}
+    print(f"{'stack':<8}{'endpoint':<10}{'req/s':>12}{'vs none':>10}")
+    for name, path in paths.items():
+        baseline = None
+        for stack in ("none", "legacy", "asgi"):
+            rps = await measure_rps(build_app(stack), path, args.requests, args.concurrency)
+            baseline = baseline or rps
+            print(f"{stack:<8}{name:<10}{rps:>12.0f}{rps / baseline:>10.2f}")
+
+    if rate_limiter.redis_client:
+        await rate_limiter.redis_client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--redis-url", default=None,
+                        help="Redis for the rate limiter (default: in-memory fallback)")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Per-request latency of RateLimiter checks: legacy multi-round-trip
+implementations versus the atomic Lua scripts.
+
+Usage (from backend/):
+    python -m benchmarks.rate_limiter_latency --redis-url redis://localhost:6379/15
+    python -m benchmarks.rate_limiter_latency --fake   # fakeredis, no network
+
+The "before" numbers come from copies of the original HMGET/compute/HMSET/
+EXPIRE code kept below, so the comparison stays reproducible after the
+limiter itself changed. Over-admission counts how many requests beyond the
+limit each variant let through when checks for one client run concurrently.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Callable, Dict, List
+
+import redis.asyncio as redis
+
+from app.core.rate_limiter import RateLimit, RateLimiter, RateLimitStrategy
+
+
+async def legacy_token_bucket(client, identifier: str, rate_limit: RateLimit) -> bool:
+    """Original token bucket: three awaits, not atomic"""
+    now = time.time()
+    key = f"rate_limit:token:{identifier}"
+    burst = rate_limit.burst or rate_limit.requests
+    refill_rate = rate_limit.requests / rate_limit.window
+
+    bucket_data = await client.hmget(key, "tokens", "last_refill")
+    if bucket_data[0] is None:
+        tokens = float(burst)
+        last_refill = now
+    else:
+        tokens = float(bucket_data[0])
+        last_refill = float(bucket_data[1])
+
+    tokens = min(burst, tokens + (now - last_refill) * refill_rate)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+
+    await client.hset(key, mapping={"tokens": tokens, "last_refill": now})
+    await client.expire(key, rate_limit.window * 2)
+    return allowed
+
+
+async def legacy_leaky_bucket(client, identifier: str, rate_limit: RateLimit) -> bool:
+    """Original leaky bucket: three awaits, not atomic"""
+    now = time.time()
+    key = f"rate_limit:leaky:{identifier}"
+    leak_rate = rate_limit.requests / rate_limit.window
+    bucket_size = rate_limit.burst or rate_limit.requests
+
+    bucket_data = await client.hmget(key, "volume", "last_leak")
+    if bucket_data[0] is None:
+        volume = 0.0
+        last_leak = now
+    else:
+        volume = float(bucket_data[0])
+        last_leak = float(bucket_data[1])
+
+    volume = max(0, volume - (now - last_leak) * leak_rate)
+    allowed = volume < bucket_size
+    if allowed:
+        volume += 1
+
+    await client.hset(key, mapping={"volume": volume, "last_leak": now})
+    await client.expire(key, rate_limit.window * 2)
+    return allowed
+
+
+async def legacy_sliding_window(client, identifier: str, rate_limit: RateLimit) -> bool:
+    """Original sliding window: one pipeline, but same-instant members collide"""
+    now = time.time()
+    key = f"rate_limit:sliding:{identifier}"
+    pipe = client.pipeline()
+    pipe.zremrangebyscore(key, 0, now - rate_limit.window)
+    pipe.zcard(key)
+    pipe.zadd(key, {str(now): now})
+    pipe.expire(key, rate_limit.window)
+    results = await pipe.execute()
+    return results[1] + 1 <= rate_limit.requests
+
+
+LEGACY = {
+    RateLimitStrategy.TOKEN_BUCKET: legacy_token_bucket,
+    RateLimitStrategy.LEAKY_BUCKET: legacy_leaky_bucket,
+    RateLimitStrategy.SLIDING_WINDOW: legacy_sliding_window,
+}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def measure_latency(check: Callable, iterations: int) -> Dict[str, float]:
+    """Sequential checks against distinct clients so every call is admitted"""
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        await check(f"bench-latency-{i % 1000}")
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    return {
+        "p50_us": round(statistics.median(samples), 1),
+        "p99_us": round(percentile(samples, 99), 1),
+        "mean_us": round(statistics.fmean(samples), 1),
+    }
+
+
+async def measure_over_admission(check: Callable, limit: int, concurrency: int) -> int:
+    """Fire concurrent checks for one client and count admissions over the limit"""
+    results = await asyncio.gather(*[check("bench-race") for _ in range(concurrency)])
+    return max(0, sum(1 for allowed in results if allowed) - limit)
+
+
+async def run(args) -> None:
+    if args.fake:
+        import fakeredis
+        client = fakeredis.FakeAsyncRedis()
+    else:
+        client = redis.Redis.from_url(args.redis_url)
+
+    limiter = RateLimiter()
+    limiter.redis_client = client
+    limiter._register_scripts()
+    await limiter._load_scripts()
+
+    # Large window so refills do not mask races during the run
+    rate_limit_args = dict(requests=args.limit, window=3600)
+
+    print(f"{'strategy':<16}{'variant':<9}{'p50 us':>10}{'p99 us':>10}{'mean us':>10}{'over-admit':>12}")
+    for strategy, legacy in LEGACY.items():
+        rate_limit = RateLimit(strategy=strategy, **rate_limit_args)
+
+        async def legacy_check(identifier, rate_limit=rate_limit, legacy=legacy):
+            return await legacy(client, identifier, rate_limit)
+
+        async def lua_check(identifier, rate_limit=rate_limit):
+            allowed, _ = await limiter.check_rate_limit(identifier, rate_limit)
+            return allowed
+
+        for variant, check in (("legacy", legacy_check), ("lua", lua_check)):
+            await client.flushdb()
+            latency = await measure_latency(check, args.iterations)
+            await client.flushdb()
+            over = await measure_over_admission(check, args.limit, args.concurrency)
+            print(
+                f"{strategy.value:<16}{variant:<9}{latency['p50_us']:>10}"
+                f"{latency['p99_us']:>10}{latency['mean_us']:>10}{over:>12}"
+            )
+
+    await client.flushdb()
+    await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    # No default backend: the Redis DB is flushed, so it must be named explicitly
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument("--redis-url", help="Redis to benchmark against (the DB is flushed)")
+    backend.add_argument("--fake", action="store_true", help="Use fakeredis instead of a server")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Throughput, latency and accuracy of RateLimiter under concurrent load.
+
+Usage (from backend/):
+    python -m benchmarks.rate_limiter_suite --fake                  # fakeredis
+    python -m benchmarks.rate_limiter_suite --redis-url redis://localhost:6379/15
+    python -m benchmarks.rate_limiter_suite --memory                # in-process fallback
+    python -m benchmarks.rate_limiter_suite --fake --compare old.json
+
+Thousands of virtual clients each offer requests faster than their limit
+for a fixed duration, in two scenarios: every client with its own key
+("per_client") and all clients sharing one key ("hot_key"). For each
+strategy the suite reports checks per second, p50/p99 check latency and
+the error of admitted requests against what the configured limit allows.
+Results are written as JSON so runs can be compared across commits.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+from typing import Dict, List, Optional
+
+import redis.asyncio as redis
+
+from app.core.rate_limiter import RateLimit, RateLimiter, RateLimitStrategy
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_variants(args, use_redis: bool) -> Dict[str, RateLimit]:
+    """Rate limits to benchmark, keyed by variant name"""
+    limit_args = dict(requests=args.limit, window=args.window)
+    variants = {
+        strategy.value: RateLimit(strategy=strategy, **limit_args)
+        for strategy in RateLimitStrategy
+    }
+    if use_redis:
+        # Leases only apply when a shared Redis budget exists
+        lease_size = max(1, args.limit // 10)
+        for strategy in (RateLimitStrategy.FIXED_WINDOW, RateLimitStrategy.SLIDING_WINDOW_COUNTER):
+            variants[f"{strategy.value}+lease"] = RateLimit(strategy=strategy, lease_size=lease_size, **limit_args)
+    return variants
+
+
+def allowed_admissions(rate_limit: RateLimit, duration: float) -> float:
+    """Requests the configured limit allows a saturating client over duration"""
+    rate = rate_limit.requests / rate_limit.window
+    if rate_limit.strategy in (RateLimitStrategy.TOKEN_BUCKET, RateLimitStrategy.LEAKY_BUCKET):
+        # A full bucket of burst up front, then the refill/leak rate
+        return (rate_limit.burst or rate_limit.requests) + rate * duration
+    return rate * duration
+
+
+async def run_scenario(
+    limiter: RateLimiter,
+    rate_limit: RateLimit,
+    clients: int,
+    keys: int,
+    offered_rate: float,
+    duration: float,
+    run_id: str,
+) -> Dict[str, float]:
+    """
+    Drive `clients` virtual clients spread over `keys` identifiers.
+
+    Each client sends at offered_rate requests per second with jittered
+    spacing until duration has elapsed.
+    """
+    samples: List[float] = []
+    admitted = [0] * keys
+    sent = [0] * keys
+    errors = 0
+
+    # Fixed windows are aligned to the clock; start on a boundary so the
+    # run covers whole windows
+    now = time.time()
+    await asyncio.sleep(rate_limit.window - (now % rate_limit.window))
+    deadline = time.monotonic() + duration
+
+    async def client(index: int):
+        nonlocal errors
+        key = index % keys
+        identifier = f"bench:{run_id}:{key}"
+        interval = 1 / offered_rate
+        # Spread the first requests over one interval
+        await asyncio.sleep(random.random() * interval)
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                allowed, _ = await limiter.check_rate_limit(identifier, rate_limit)
+            except Exception:
+                errors += 1
+                allowed = False
+            samples.append(time.perf_counter() - start)
+            sent[key] += 1
+            admitted[key] += allowed
+            await asyncio.sleep(max(0.0, interval * random.uniform(0.5, 1.5) - (time.perf_counter() - start)))
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*[client(i) for i in range(clients)])
+    wall = time.perf_counter() - wall_start
+
+    allowance = allowed_admissions(rate_limit, duration)
+    # A key that was offered less than its allowance should admit everything
+    expected = [min(allowance, count) for count in sent]
+    key_errors = [
+        (got - want) / want for got, want in zip(admitted, expected) if want
+    ]
+
+    return {
+        "checks": len(samples),
+        "checks_per_second": round(len(samples) / wall, 1),
+        "p50_us": round(statistics.median(samples) * 1_000_000, 1) if samples else None,
+        "p99_us": round(percentile(samples, 99) * 1_000_000, 1) if samples else None,
+        "admitted": sum(admitted),
+        "expected": round(sum(expected), 1),
+        # Signed: positive means over-admission
+        "rate_error": round((sum(admitted) - sum(expected)) / sum(expected), 4) if sum(expected) else None,
+        "max_key_error": round(max(key_errors, key=abs), 4) if key_errors else None,
+        "errors": errors,
+    }
+
+
+async def run(args) -> Dict:
+    if args.memory:
+        client = None
+        backend = "memory"
+    elif args.fake:
+        import fakeredis
+        client = fakeredis.FakeAsyncRedis()
+        backend = "fakeredis"
+    else:
+        client = redis.Redis.from_url(args.redis_url)
+        backend = "redis"
+
+    limiter = RateLimiter()
+    limiter.redis_client = client
+    if client:
+        limiter._register_scripts()
+        await limiter._load_scripts()
+        await client.flushdb()
+
+    offered_rate = args.offered * args.limit / args.window
+    scenarios = {
+        "per_client": dict(clients=args.clients, keys=args.clients, offered_rate=offered_rate),
+        # Contention: every client hits the same key
+        "hot_key": dict(clients=args.hot_key_clients, keys=1, offered_rate=offered_rate),
+    }
+
+    results = {}
+    print(f"{'variant':<32}{'scenario':<12}{'checks/s':>10}{'p50 us':>10}{'p99 us':>10}{'rate err':>10}{'max key':>10}")
+    for name, rate_limit in build_variants(args, client is not None).items():
+        results[name] = {}
+        for scenario, params in scenarios.items():
+            result = await run_scenario(
+                limiter, rate_limit, duration=args.duration, run_id=f"{name}:{scenario}", **params
+            )
+            results[name][scenario] = result
+            print(
+                f"{name:<32}{scenario:<12}{result['checks_per_second']:>10}{result['p50_us']:>10}"
+                f"{result['p99_us']:>10}{result['rate_error']:>10}{result['max_key_error']:>10}"
+            )
+        limiter.leases.clear()
+
+    if client:
+        await client.flushdb()
+        await client.aclose()
+
+    return {
+        "benchmark": "rate_limiter_suite",
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "backend": backend,
+        "config": {
+            "clients": args.clients,
+            "hot_key_clients": args.hot_key_clients,
+            "limit": args.limit,
+            "window": args.window,
+            "offered": args.offered,
+            "duration": args.duration,
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline_path: str) -> None:
+    """Print throughput and p99 changes against a previous results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    print(f"\nvs {baseline_path} (revision {baseline.get('revision')})")
+    print(f"{'variant':<32}{'scenario':<12}{'checks/s':>11}{'p99':>11}{'rate err':>18}")
+    for name, scenarios in current["results"].items():
+        for scenario, result in scenarios.items():
+            old = baseline["results"].get(name, {}).get(scenario)
+            if not old:
+                continue
+            throughput = (result["checks_per_second"] / old["checks_per_second"] - 1) * 100
+            p99 = (result["p99_us"] / old["p99_us"] - 1) * 100
+            error = f"{old['rate_error']}->{result['rate_error']}"
+            print(f"{name:<32}{scenario:<12}{throughput:>+10.1f}%{p99:>+10.1f}%{error:>18}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    # No default backend: the Redis DB is flushed, so it must be named explicitly
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument("--redis-url", help="Redis to benchmark against (the DB is flushed)")
+    backend.add_argument("--fake", action="store_true", help="Use fakeredis instead of a server")
+    backend.add_argument("--memory", action="store_true", help="Use the in-process fallback store")
+    parser.add_argument("--clients", type=int, default=2000, help="Virtual clients, one key each")
+    parser.add_argument("--hot-key-clients", type=int, default=200, help="Virtual clients sharing one key")
+    parser.add_argument("--limit", type=int, default=10, help="Requests allowed per window")
+    parser.add_argument("--window", type=int, default=1, help="Window in seconds")
+    parser.add_argument("--offered", type=float, default=2.0, help="Offered load as a multiple of the limit")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per scenario")
+    parser.add_argument("--output", default="rate_limiter_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,9 @@ from typing import Dict, Any, List
 from datetime import datetime, timedelta
 import logging
 
+from app.core.outbound_governor import outbound_governor
+from app.core.tracing import aiohttp_trace_config
+
 logger = logging.getLogger(__name__)
 
 class PluginClass:
@@ -26,9 +29,14 @@ class PluginClass:
                 "Authorization": f"Bearer {self.access_token}",
                 "Content-Type": "application/json"
             },
-            timeout=aiohttp.ClientTimeout(total=30)
+            timeout=aiohttp.ClientTimeout(total=30),
+            trace_configs=[aiohttp_trace_config()]
         )
     
+    def _get(self, url: str, **kwargs):
+        """GET through the shared outbound rate governor"""
+        return outbound_governor.request("canvas", self.access_token, self.session, "GET", url, **kwargs)
+
     async def cleanup(self):
         """Cleanup resources"""
         if self.session:
@@ -40,7 +48,7 @@ class PluginClass:
             if not self.session:
                 return False
                 
-            async with self.session.get(f"{self.canvas_url}/api/v1/users/self") as response:
+            async with self._get(f"{self.canvas_url}/api/v1/users/self") as response:
                 return response.status == 200
         except Exception as e:
             logger.error(f"Canvas health check failed: {e}")
@@ -52,7 +60,7 @@ class PluginClass:
             courses = []
             url = f"{self.canvas_url}/api/v1/courses"
             
-            async with self.session.get(url, params={"enrollment_state": "active"}) as response:
+            async with self._get(url, params={"enrollment_state": "active"}) as response:
                 if response.status == 200:
                     canvas_courses = await response.json()
                     
@@ -98,7 +106,7 @@ class PluginClass:
             assignments = []
             url = f"{self.canvas_url}/api/v1/courses/{course_id}/assignments"
             
-            async with self.session.get(url) as response:
+            async with self._get(url) as response:
                 if response.status == 200:
                     canvas_assignments = await response.json()
                     
@@ -147,7 +155,7 @@ class PluginClass:
             
             # Get assignments with submissions
             params = {"include": ["submission"], "per_page": 100}
-            async with self.session.get(url, params=params) as response:
+            async with self._get(url, params=params) as response:
                 if response.status == 200:
                     assignments = await response.json()
                     
@@ -210,7 +218,7 @@ class PluginClass:
             url = f"{self.canvas_url}/api/v1/courses/{course_id}/users"
             params = {"enrollment_type": ["teacher"], "per_page": 1}
             
-            async with self.session.get(url, params=params) as response:
+            async with self._get(url, params=params) as response:
                 if response.status == 200:
                     users = await response.json()
                     if users:
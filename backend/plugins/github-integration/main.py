@@ -5,6 +5,9 @@ from datetime import datetime, timedelta
 import logging
 import base64
 
+from app.core.outbound_governor import outbound_governor
+from app.core.tracing import aiohttp_trace_config
+
 logger = logging.getLogger(__name__)
 
 class PluginClass:
@@ -27,9 +30,14 @@ class PluginClass:
                 "Accept": "application/vnd.github.v3+json",
                 "User-Agent": "CoreEngine/1.0"
             },
-            timeout=aiohttp.ClientTimeout(total=30)
+            timeout=aiohttp.ClientTimeout(total=30),
+            trace_configs=[aiohttp_trace_config()]
         )
     
+    def _get(self, url: str, **kwargs):
+        """GET through the shared outbound rate governor"""
+        return outbound_governor.request("github", self.access_token, self.session, "GET", url, **kwargs)
+
     async def cleanup(self):
         """Cleanup resources"""
         if self.session:
@@ -41,7 +49,7 @@ class PluginClass:
             if not self.session:
                 return False
                 
-            async with self.session.get("https://api.github.com/user") as response:
+            async with self._get("https://api.github.com/user") as response:
                 return response.status == 200
         except Exception as e:
             logger.error(f"GitHub health check failed: {e}")
@@ -59,7 +67,7 @@ class PluginClass:
                 "per_page": 100
             }
             
-            async with self.session.get(url, params=params) as response:
+            async with self._get(url, params=params) as response:
                 if response.status == 200:
                     github_repos = await response.json()
                     
@@ -141,7 +149,7 @@ class PluginClass:
                 "per_page": 100
             }
             
-            async with self.session.get(url, params=params) as response:
+            async with self._get(url, params=params) as response:
                 if response.status == 200:
                     github_commits = await response.json()
                     
@@ -231,7 +239,7 @@ class PluginClass:
             url = f"https://api.github.com/repos/{full_name}/commits"
             params = {"per_page": 1}
             
-            async with self.session.get(url, params=params) as response:
+            async with self._get(url, params=params) as response:
                 if response.status == 200:
                     commits = await response.json()
                     return len(commits) > 0
@@ -245,7 +253,7 @@ class PluginClass:
         try:
             url = f"https://api.github.com/repositories/{repository_id}"
             
-            async with self.session.get(url) as response:
+            async with self._get(url) as response:
                 if response.status == 200:
                     return await response.json()
         except Exception as e:
@@ -258,7 +266,7 @@ class PluginClass:
         try:
             url = f"https://api.github.com/repos/{full_name}/commits/{sha}"
             
-            async with self.session.get(url) as response:
+            async with self._get(url) as response:
                 if response.status == 200:
                     commit_data = await response.json()
                     stats = commit_data.get("stats", {})
@@ -287,7 +295,7 @@ class PluginClass:
             else:
                 params["pulls"] = "false"
             
-            async with self.session.get(url, params=params) as response:
+            async with self._get(url, params=params) as response:
                 if response.status == 200:
                     github_issues = await response.json()
                     
@@ -0,0 +1,678 @@
+"""
+Cache manager regression tests, run against fakeredis.
+"""
+
+import asyncio
+import time
+
+import fakeredis
+from prometheus_client import REGISTRY
+
+from app.core import cache as cache_module
+from app.core.cache import CacheManager, LocalCache, SessionCache, cached, cached_many
+
+
+def make_manager(monkeypatch) -> CacheManager:
+    manager = CacheManager()
+    manager.redis_client = fakeredis.FakeAsyncRedis()
+    manager.local_cache = LocalCache()
+    monkeypatch.setattr(cache_module, "cache_manager", manager)
+    return manager
+
+
+def test_l1_hits_do_not_share_caller_objects(monkeypatch):
+    async def scenario():
+        manager = make_manager(monkeypatch)
+
+        value = {"x": 1}
+        await manager.set("k", value)
+        value["x"] = 99
+        first = await manager.get("k")
+        assert first == {"x": 1}
+
+        first["x"] = 42
+        assert await manager.get("k") == {"x": 1}
+
+        await manager.set_many({"a": [1], "b": [2]})
+        (await manager.get_many(["a", "b"]))["a"].append("injected")
+        assert await manager.get_many(["a", "b"]) == {"a": [1], "b": [2]}
+
+    asyncio.run(scenario())
+
+
+def test_cached_result_mutation_not_served_from_l1(monkeypatch):
+    async def scenario():
+        make_manager(monkeypatch)
+
+        @cached(ttl=60, namespace="test")
+        async def load_items():
+            return [{"id": 1}]
+
+        (await load_items()).append({"id": "injected"})
+        (await load_items()).append({"id": "injected"})
+        assert await load_items() == [{"id": 1}]
+
+    asyncio.run(scenario())
+
+
+def test_stale_refresh_never_runs_in_background_with_session(monkeypatch):
+    """A session passed by the caller is only used while the caller awaits"""
+    from unittest import mock
+
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    async def scenario():
+        make_manager(monkeypatch)
+        session = mock.MagicMock(spec=AsyncSession)
+        calls = []
+
+        @cached(ttl=1, namespace="test", stale_ttl=60)
+        async def load(db, item_id):
+            calls.append(asyncio.current_task())
+            return {"id": item_id, "version": len(calls)}
+
+        assert await load(session, 1) == {"id": 1, "version": 1}
+
+        # Push the entry past its soft expiry
+        real_time = time.time
+        monkeypatch.setattr(cache_module.time, "time", lambda: real_time() + 5)
+
+        assert await load(session, 1) == {"id": 1, "version": 2}
+        await asyncio.sleep(0.05)
+        # The refresh ran in the caller's own task, and none followed in the background
+        assert len(calls) == 2
+        assert calls[1] is asyncio.current_task()
+
+    asyncio.run(scenario())
+
+
+def test_evicted_generation_key_does_not_revive_old_entries(monkeypatch):
+    async def scenario():
+        manager = make_manager(monkeypatch)
+
+        await manager.set("k", "old", namespace="ns")
+        assert await manager.clear_namespace("ns")
+        assert await manager.get("k", namespace="ns") is None
+
+        # allkeys-lru evicts the generation key; other workers refetch it
+        await manager.redis_client.delete(f"{cache_module.GENERATION_KEY_PREFIX}ns")
+        manager._generations.clear()
+        assert await manager.get("k", namespace="ns") is None
+
+        await manager.set("k", "new", namespace="ns")
+        assert await manager.get("k", namespace="ns") == "new"
+
+    asyncio.run(scenario())
+
+
+def test_cached_many_merges_hits_and_misses(monkeypatch):
+    async def scenario():
+        make_manager(monkeypatch)
+        loaded = []
+
+        @cached_many(ttl=60, namespace="test", ids_arg="item_ids")
+        async def load(prefix, item_ids):
+            loaded.append(list(item_ids))
+            # Id 3 has no value and is left out
+            return {item_id: f"{prefix}-{item_id}" for item_id in item_ids if item_id != 3}
+
+        assert await load("a", [1, 2]) == {1: "a-1", 2: "a-2"}
+        # Only the misses reach the function; results keep the requested order
+        assert await load("a", item_ids=[3, 2, 4, 1]) == {2: "a-2", 4: "a-4", 1: "a-1"}
+        assert loaded == [[1, 2], [3, 4]]
+
+        assert await load(prefix="a", item_ids=[4, 1]) == {4: "a-4", 1: "a-1"}
+        assert loaded == [[1, 2], [3, 4]]
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_misses_are_computed_once(monkeypatch):
+    async def scenario():
+        make_manager(monkeypatch)
+        calls = []
+
+        @cached(ttl=60, namespace="test")
+        async def load(item_id):
+            calls.append(item_id)
+            await asyncio.sleep(0.05)
+            return {"id": item_id}
+
+        results = await asyncio.gather(*[load(1) for _ in range(10)], load(2))
+        assert results == [{"id": 1}] * 10 + [{"id": 2}]
+        assert sorted(calls) == [1, 2]
+        assert not cache_module._inflight
+
+    asyncio.run(scenario())
+
+
+def test_coalesced_failure_reaches_every_caller_and_is_not_cached(monkeypatch):
+    async def scenario():
+        make_manager(monkeypatch)
+        calls = []
+
+        @cached(ttl=60, namespace="test")
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            if len(calls) == 1:
+                raise RuntimeError("database down")
+            return "ok"
+
+        results = await asyncio.gather(load(), load(), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert await load() == "ok"
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_shared_computation(monkeypatch):
+    async def scenario():
+        make_manager(monkeypatch)
+        calls = []
+
+        @cached(ttl=60, namespace="test")
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        first = asyncio.ensure_future(load())
+        second = asyncio.ensure_future(load())
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        assert await second == "ok"
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_session_calls_are_not_shared_or_shielded(monkeypatch):
+    """A cancelled caller's computation stops instead of running on with its session"""
+    from unittest import mock
+
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    async def scenario():
+        make_manager(monkeypatch)
+        computed_in = []
+        cancelled = []
+
+        @cached(ttl=60, namespace="test", lock_wait=0.1)
+        async def load(db, item_id):
+            computed_in.append(asyncio.current_task())
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                cancelled.append(db)
+                raise
+            return {"id": item_id}
+
+        first_session = mock.MagicMock(spec=AsyncSession)
+        first = asyncio.ensure_future(load(first_session, 1))
+        second = asyncio.ensure_future(load(mock.MagicMock(spec=AsyncSession), 1))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        assert await second == {"id": 1}
+        assert cancelled == [first_session]
+        # Each computation ran in its caller's task, never in a shared one
+        assert computed_in == [first, second]
+
+    asyncio.run(scenario())
+
+
+def test_miss_waits_for_another_worker_holding_the_lock(monkeypatch):
+    async def scenario():
+        manager = make_manager(monkeypatch)
+        calls = []
+
+        @cached(ttl=60, namespace="test", lock_wait=2)
+        async def load():
+            calls.append(1)
+            return "mine"
+
+        # Another worker is recomputing the key and fills it shortly
+        cache_key = load.cache_key()
+        assert await manager.acquire_lock(cache_key, "test")
+
+        async def other_worker_fills():
+            await asyncio.sleep(0.05)
+            await manager.set(cache_key, cache_module._make_entry("theirs", 60, 0.0), 60, "test")
+
+        filler = asyncio.ensure_future(other_worker_fills())
+        assert await load() == "theirs"
+        assert calls == []
+        await filler
+
+    asyncio.run(scenario())
+
+
+def test_stale_value_served_while_refreshed_in_background(monkeypatch):
+    async def scenario():
+        make_manager(monkeypatch)
+        calls = []
+
+        @cached(ttl=1, namespace="test", stale_ttl=60)
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        assert await load() == 1
+
+        real_time = time.time
+        monkeypatch.setattr(cache_module.time, "time", lambda: real_time() + 5)
+
+        # Past the soft expiry the old value comes back at once
+        assert await load() == 1
+        await asyncio.sleep(0.05)
+        assert len(calls) == 2
+        assert await load() == 2
+
+    asyncio.run(scenario())
+
+
+def test_entry_past_hard_expiry_is_recomputed(monkeypatch):
+    async def scenario():
+        manager = make_manager(monkeypatch)
+        calls = []
+
+        @cached(ttl=1, namespace="test", stale_ttl=1)
+        async def load():
+            calls.append(1)
+            return len(calls)
+
+        assert await load() == 1
+        # Redis drops the entry after ttl + stale_ttl
+        await manager.delete(load.cache_key(), "test")
+        assert await load() == 2
+
+    asyncio.run(scenario())
+
+
+def test_xfetch_refreshes_expensive_entries_early(monkeypatch):
+    now = time.time()
+    cheap = {"soft_expiry": now + 10, "delta": 0.001}
+    expensive = {"soft_expiry": now + 10, "delta": 5.0}
+
+    # -ln(1 - 0.5) is about 0.69, so the XFetch offset is delta * beta * 0.69
+    monkeypatch.setattr(cache_module.random, "random", lambda: 0.5)
+    assert not cache_module._should_refresh(cheap, beta=1.0)
+    assert cache_module._should_refresh(expensive, beta=3.0)
+    assert not cache_module._should_refresh(expensive, beta=0.0)
+    assert cache_module._should_refresh({"soft_expiry": now - 1, "delta": 0.0}, beta=0.0)
+
+
+def test_early_refresh_runs_in_background_before_expiry(monkeypatch):
+    async def scenario():
+        make_manager(monkeypatch)
+        calls = []
+
+        @cached(ttl=60, namespace="test", early_refresh_beta=1.0)
+        async def load():
+            calls.append(1)
+            return len(calls)
+
+        assert await load() == 1
+        # Force the XFetch draw to fire well before the soft expiry
+        monkeypatch.setattr(cache_module, "_should_refresh", lambda entry, beta: True)
+        assert await load() == 1
+        await asyncio.sleep(0.02)
+        assert await load() == 2
+
+    asyncio.run(scenario())
+
+
+def test_codec_framing_round_trips():
+    manager = CacheManager()
+    small = {"id": 1, "name": "small"}
+    large = {"items": [{"id": i, "title": "assignment " * 5} for i in range(200)]}
+
+    for compression in ["none", *manager.compressors]:
+        manager.compression = compression
+        for codec in manager.serializers:
+            manager.configure_namespace(codec, codec=codec)
+            for value in (small, large):
+                data = manager._serialize(value, namespace=codec)
+                assert data[0] == cache_module.FRAME_MAGIC
+                assert data[1] & 0x0F == cache_module.CODEC_IDS[codec]
+                # Any method decodes a framed value, since the frame names its codec
+                assert manager._deserialize(data) == value
+                assert manager._deserialize(data, "pickle") == value
+
+            # Only values over the threshold are compressed
+            assert manager._serialize(small, namespace=codec)[1] >> 4 == 0
+            if compression != "none":
+                framed = manager._serialize(large, namespace=codec)
+                assert framed[1] >> 4 == cache_module.COMPRESSION_IDS[compression]
+
+
+def test_unframed_legacy_values_still_decode():
+    import json
+    import pickle
+
+    manager = CacheManager()
+    value = {"id": 1, "tags": ["a", "b"]}
+
+    assert manager._deserialize(json.dumps(value).encode()) == value
+    assert manager._deserialize(pickle.dumps(value), "pickle") == value
+
+
+def test_pickle_method_keeps_pickle_over_namespace_codec():
+    manager = CacheManager()
+    manager.configure_namespace("test", codec="msgpack")
+    value = {"when": (1, 2)}
+
+    data = manager._serialize(value, "pickle", "test")
+    assert data[1] & 0x0F == cache_module.CODEC_IDS["pickle"]
+    assert manager._deserialize(data) == value
+
+
+def test_invalidate_tags_evicts_only_tagged_entries(monkeypatch):
+    async def scenario():
+        manager = make_manager(monkeypatch)
+        await manager.set("course-1", "c1", namespace="courses", tags=["course:1", "user:7"])
+        await manager.set("course-2", "c2", namespace="courses", tags=["course:2", "user:7"])
+        await manager.set("profile", "p", namespace="users", tags=["user:7"])
+        await manager.set("other", "o", namespace="courses")
+
+        assert await manager.invalidate_tags(["course:1"]) == 1
+        assert await manager.get("course-1", "courses") is None
+        assert await manager.get("course-2", "courses") == "c2"
+
+        # A tag spans namespaces
+        assert await manager.invalidate_tags(["user:7"]) == 2
+        assert await manager.get("course-2", "courses") is None
+        assert await manager.get("profile", "users") is None
+        assert await manager.get("other", "courses") == "o"
+        assert not await manager.redis_client.exists(f"{cache_module.TAG_KEY_PREFIX}user:7")
+
+    asyncio.run(scenario())
+
+
+def test_cached_tags_from_arguments(monkeypatch):
+    async def scenario():
+        manager = make_manager(monkeypatch)
+        calls = []
+
+        @cached(ttl=60, namespace="test", tags=lambda user_id: [f"user:{user_id}"])
+        async def load(user_id):
+            calls.append(user_id)
+            return {"user": user_id, "version": len(calls)}
+
+        assert await load(1) == {"user": 1, "version": 1}
+        assert await load(2) == {"user": 2, "version": 2}
+
+        await manager.invalidate_tags(["user:1"])
+        assert await load(1) == {"user": 1, "version": 3}
+        assert await load(2) == {"user": 2, "version": 2}
+
+    asyncio.run(scenario())
+
+
+def test_model_writes_invalidate_tags_after_commit(monkeypatch):
+    from types import SimpleNamespace
+
+    class Note:
+        def __init__(self, note_id):
+            self.id = note_id
+
+    monkeypatch.setitem(cache_module._model_tags, Note, lambda note: [f"note:{note.id}", None])
+
+    async def scenario():
+        manager = make_manager(monkeypatch)
+        await manager.set("note-1", "n1", tags=["note:1"])
+        await manager.set("note-2", "n2", tags=["note:2"])
+
+        session = SimpleNamespace(new=[Note(1)], dirty=[], deleted=[], info={})
+        cache_module._collect_model_tags(session, None)
+        assert session.info["cache_tags"] == {"note:1"}
+
+        rolled_back = SimpleNamespace(new=[Note(2)], dirty=[], deleted=[], info={})
+        cache_module._collect_model_tags(rolled_back, None)
+        cache_module._discard_model_tags(rolled_back)
+
+        cache_module._invalidate_committed_tags(session)
+        cache_module._invalidate_committed_tags(rolled_back)
+        await asyncio.gather(*cache_module._tag_invalidation_tasks)
+
+        assert await manager.get("note-1") is None
+        assert await manager.get("note-2") == "n2"
+
+    asyncio.run(scenario())
+
+
+class MonotonicClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_session_cache_expires_entries(monkeypatch):
+    clock = MonotonicClock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    sessions = SessionCache(tick=1.0, wheel_size=8)
+
+    sessions.set("short", "a", ttl=2)
+    sessions.set("long", "b", ttl=5)
+    # Due in a later rotation of the wheel, in the same slot as "short"
+    sessions.set("lap", "c", ttl=10)
+
+    clock.now += 3
+    assert sessions.clear_expired() == 1
+    assert sessions.get("short") is None
+    assert sessions.get("long") == "b"
+    assert sessions.get("lap") == "c"
+
+    # get() never returns an expired entry, even before the wheel reaches it
+    clock.now += 2.5
+    assert sessions.get("long") is None
+
+    # A long gap sweeps the whole wheel once
+    clock.now += 100
+    assert sessions.clear_expired() == 1
+    assert len(sessions) == 0
+
+
+def test_session_cache_is_bounded_by_entries_and_bytes():
+    sessions = SessionCache(max_entries=3)
+    for key in ("a", "b", "c"):
+        sessions.set(key, key)
+    assert sessions.get("a") == "a"  # "b" is now least recently used
+
+    sessions.set("d", "d")
+    assert len(sessions) == 3
+    assert sessions.get("b") is None
+    assert sessions.get("a") == "a"
+    assert sessions.stats["evictions"] == 1
+
+    sized = SessionCache(max_bytes=10_000)
+    for i in range(20):
+        sized.set(f"blob-{i}", "x" * 1000)
+    assert sized.get_stats()["approx_bytes"] <= 10_000
+    assert sized.get("blob-19") is not None
+    assert sized.get("blob-0") is None
+
+    # Replacing an entry does not leak its old size
+    before = sized.get_stats()["approx_bytes"]
+    sized.set("blob-19", "x" * 1000)
+    assert sized.get_stats()["approx_bytes"] == before
+
+
+def test_cache_keys_are_stable_across_argument_order():
+    generate = cache_module.cache_key_generator
+
+    assert generate(1, "a", flag=None) == cache_module._fast_hash(b"1|'a'|flag=None")
+    assert generate(x=1, y=2) == generate(y=2, x=1)
+    assert generate({"b": 1, "a": [1, 2]}) == generate({"a": [1, 2], "b": 1})
+    assert generate({3, 1, 2}) == generate({2, 3, 1})
+    assert generate(1) != generate("1")
+    assert generate([1, 2]) != generate([2, 1])
+
+
+def test_cache_keys_skip_sessions_and_use_identities():
+    import datetime
+    import uuid
+    from unittest import mock
+
+    from pydantic import BaseModel
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import make_transient_to_detached
+
+    from app.models import Course
+
+    generate = cache_module.cache_key_generator
+
+    # Request-scoped arguments never reach the key
+    assert generate(mock.MagicMock(spec=AsyncSession), 7) == generate(7)
+
+    class Service:
+        pass
+
+    # Stateless helpers are keyed by class, not by their memory address
+    assert generate(Service()) == generate(Service())
+
+    class Query(BaseModel):
+        term: str
+        limit: int = 10
+
+    assert generate(Query(term="x")) == generate(Query(term="x"))
+    assert generate(Query(term="x")) != generate(Query(term="x", limit=5))
+
+    def course(updated_at):
+        instance = Course(id=uuid.UUID(int=5), name="Algorithms", updated_at=updated_at)
+        make_transient_to_detached(instance)
+        return instance
+
+    # Mapped instances are keyed by primary key and updated_at, not by their other attributes
+    first = course(datetime.datetime(2026, 1, 1))
+    renamed = course(datetime.datetime(2026, 1, 1))
+    renamed.name = "Renamed"
+    assert generate(first) == generate(renamed)
+    assert generate(first) != generate(course(datetime.datetime(2026, 1, 2)))
+
+
+def test_registered_key_extractor(monkeypatch):
+    class Account:
+        def __init__(self, account_id, token):
+            self.account_id = account_id
+            self.token = token
+
+    monkeypatch.setitem(cache_module._key_extractors, Account, lambda account: account.account_id)
+
+    generate = cache_module.cache_key_generator
+    assert generate(Account(1, "a")) == generate(Account(1, "b"))
+    assert generate(Account(1, "a")) != generate(Account(2, "a"))
+
+
+def test_default_repr_arguments_warn_once_per_class(monkeypatch, caplog):
+    class Account:
+        def __init__(self, account_id):
+            self.account_id = account_id
+
+    monkeypatch.setattr(cache_module, "_warned_key_types", set())
+    generate = cache_module.cache_key_generator
+
+    with caplog.at_level("WARNING", logger=cache_module.__name__):
+        # Distinct instances collapse onto one key, which is reported
+        assert generate(Account(1)) == generate(Account(2))
+
+    (record,) = caplog.records
+    assert "register_key_extractor(" in record.getMessage()
+    assert "Account" in record.getMessage()
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def tier_counts(namespace: str) -> dict:
+    return {
+        (tier, result): sample("cache_requests_total", namespace=namespace, tier=tier, result=result)
+        for tier in ("l1", "l2") for result in ("hit", "miss")
+    }
+
+
+def tier_deltas(before: dict, namespace: str) -> dict:
+    after = tier_counts(namespace)
+    return {key: after[key] - before[key] for key in after}
+
+
+def test_get_counts_tier_outcomes_and_errors_by_namespace(monkeypatch):
+    async def scenario():
+        manager = make_manager(monkeypatch)
+        before = tier_counts("metrics_get")
+        other_before = tier_counts("core")
+        errors_before = sample("cache_errors_total", namespace="metrics_get", operation="get")
+
+        await manager.set("k", 1, namespace="metrics_get")
+        assert await manager.get("k", "metrics_get") == 1
+        assert await manager.get("absent", "metrics_get") is None
+        manager.local_cache = LocalCache()
+        assert await manager.get("k", "metrics_get") == 1
+
+        assert tier_deltas(before, "metrics_get") == {
+            ("l1", "hit"): 1, ("l1", "miss"): 2, ("l2", "hit"): 1, ("l2", "miss"): 1,
+        }
+        assert set(tier_deltas(other_before, "core").values()) == {0}
+
+        async def broken_get(key):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(manager.redis_client, "get", broken_get)
+        assert await manager.get("other", "metrics_get") is None
+        assert sample("cache_errors_total", namespace="metrics_get", operation="get") == errors_before + 1
+
+    asyncio.run(scenario())
+
+
+def test_get_many_counts_each_key_by_tier(monkeypatch):
+    async def scenario():
+        manager = make_manager(monkeypatch)
+        before = tier_counts("metrics_many")
+        errors_before = sample("cache_errors_total", namespace="metrics_many", operation="get_many")
+
+        await manager.set_many({"a": 1, "b": 2}, namespace="metrics_many")
+        manager.local_cache = LocalCache()
+        assert await manager.get_many(["a", "b", "c"], "metrics_many") == {"a": 1, "b": 2}
+        assert await manager.get_many(["a", "b"], "metrics_many") == {"a": 1, "b": 2}
+
+        assert tier_deltas(before, "metrics_many") == {
+            ("l1", "hit"): 2, ("l1", "miss"): 3, ("l2", "hit"): 2, ("l2", "miss"): 1,
+        }
+
+        async def broken_mget(keys):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(manager.redis_client, "mget", broken_mget)
+        assert await manager.get_many(["x"], "metrics_many") == {}
+        assert sample("cache_errors_total", namespace="metrics_many", operation="get_many") == errors_before + 1
+
+    asyncio.run(scenario())
+
+
+def test_cached_counts_function_outcomes(monkeypatch):
+    @cached(ttl=60, namespace="metrics_cached")
+    async def load(item_id):
+        return {"id": item_id}
+
+    labels = {"function": f"{load.__module__}.{load.__name__}", "namespace": "metrics_cached"}
+    before = {result: sample("cache_function_requests_total", result=result, **labels)
+              for result in ("hit", "stale", "miss")}
+
+    async def scenario():
+        make_manager(monkeypatch)
+        assert await load(1) == {"id": 1}
+        assert await load(1) == {"id": 1}
+        assert await load(2) == {"id": 2}
+
+    asyncio.run(scenario())
+    assert {
+        result: sample("cache_function_requests_total", result=result, **labels) - count
+        for result, count in before.items()
+    } == {"hit": 1, "stale": 0, "miss": 2}
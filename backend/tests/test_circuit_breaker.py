@@ -0,0 +1,98 @@
+"""
+Circuit breaker tests: recovery across the separate event loops Celery tasks run in.
+"""
+
+import asyncio
+
+from app.core.circuit_breaker import CircuitBreaker, CircuitState
+
+
+def make_breaker() -> CircuitBreaker:
+    return CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.01, probe_timeout=5)
+
+
+def test_stop_during_probe_does_not_leave_circuit_half_open():
+    breaker = make_breaker()
+
+    async def slow_probe():
+        await asyncio.sleep(10)
+
+    async def first_task():
+        breaker.trip(slow_probe)
+        await asyncio.sleep(0.05)
+        assert breaker.state is CircuitState.HALF_OPEN
+        breaker.stop()
+
+    asyncio.run(first_task())
+    assert breaker.state is CircuitState.OPEN
+
+    async def healthy_probe():
+        return True
+
+    async def second_task():
+        # What a client does when its first call in the new loop is rejected
+        breaker.trip(healthy_probe)
+        await asyncio.wait_for(breaker.wait_closed(), 1)
+
+    asyncio.run(second_task())
+    assert breaker.allow()
+
+
+def test_success_while_half_open_closes_circuit():
+    breaker = make_breaker()
+    breaker.state = CircuitState.HALF_OPEN
+
+    breaker.before_call()
+    breaker.record_success()
+
+    assert breaker.state is CircuitState.CLOSED
+    assert breaker.allow()
+
+
+def test_wait_closed_across_event_loops():
+    breaker = make_breaker()
+    probe_results = []
+
+    async def probe():
+        if probe_results.pop(0):
+            return True
+        raise ConnectionError("down")
+
+    async def task():
+        probe_results.extend([False, True])
+        breaker.record_failure(probe)
+        assert not breaker.allow()
+        await asyncio.wait_for(breaker.wait_closed(), 1)
+        breaker.stop()
+
+    asyncio.run(task())
+    assert breaker.allow()
+    # A second loop gets its own event rather than one bound to the first
+    asyncio.run(task())
+    assert breaker.allow()
+
+
+def test_cache_and_rate_limiter_have_separate_breakers():
+    from app.core.cache import CacheManager
+    from app.core.rate_limiter import RateLimiter
+
+    cache = CacheManager()
+    limiter = RateLimiter()
+    assert cache.breaker is not limiter.breaker
+
+    async def task():
+        async def down():
+            raise ConnectionError("db0 down")
+
+        # The cache's database failing leaves the rate limiter on Redis
+        cache.breaker.trip(down)
+        assert not cache.breaker.allow()
+        assert limiter.breaker.allow()
+
+        # Disconnecting the rate limiter leaves the cache's probe running
+        await limiter.disconnect()
+        assert cache.breaker._probe_task is not None and not cache.breaker._probe_task.done()
+        await cache.disconnect()
+        assert cache.breaker._probe_task is None
+
+    asyncio.run(task())
@@ -0,0 +1,114 @@
+"""
+Adaptive concurrency limiter tests.
+"""
+
+import asyncio
+import time
+
+from app.core.load_shedding import AdaptiveConcurrencyLimiter, RequestPriority
+
+
+def make_limiter(**kwargs) -> AdaptiveConcurrencyLimiter:
+    options = {"initial_limit": 1, "min_limit": 1, "max_limit": 1, "max_queue_time": 1.0}
+    options.update(kwargs)
+    return AdaptiveConcurrencyLimiter(**options)
+
+
+def test_gradient_grows_when_busy_and_shrinks_as_latency_inflates():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=40, min_limit=10, max_limit=200)
+    limiter.in_flight = 40
+
+    for _ in range(20):
+        limiter._update_limit(0.05)
+    grown = limiter.limit
+    assert grown > 40
+
+    for _ in range(20):
+        limiter._update_limit(0.5)
+    assert limiter.limit < grown
+    assert limiter.limit >= limiter.min_limit
+
+
+def test_limit_does_not_grow_while_mostly_idle():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=40, min_limit=10, max_limit=200)
+    limiter.in_flight = 5
+
+    for _ in range(20):
+        limiter._update_limit(0.05)
+    assert limiter.limit == 40
+
+
+def test_release_hands_slot_to_highest_priority_waiter():
+    async def scenario():
+        # Limit 1 plus one reserved slot that only HIGH priority may use
+        limiter = make_limiter()
+        assert await limiter.acquire(RequestPriority.NORMAL) is None
+        assert await limiter.acquire(RequestPriority.HIGH) is None
+
+        normal = asyncio.ensure_future(limiter.acquire(RequestPriority.NORMAL))
+        await asyncio.sleep(0)
+        high = asyncio.ensure_future(limiter.acquire(RequestPriority.HIGH))
+        await asyncio.sleep(0)
+        assert limiter.get_stats()["waiting"] == 2
+
+        limiter.release(time.monotonic(), sample=False)
+        assert await high is None
+        assert not normal.done()
+        assert limiter.in_flight == 2
+
+        # Back under the NORMAL limit the queued request gets the next slot
+        limiter.release(time.monotonic(), sample=False)
+        limiter.release(time.monotonic(), sample=False)
+        assert await normal is None
+        assert limiter.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_queued_request_is_shed_after_max_queue_time():
+    async def scenario():
+        limiter = make_limiter(max_queue_time=0.01)
+        assert await limiter.acquire(RequestPriority.NORMAL) is None
+
+        assert await limiter.acquire(RequestPriority.NORMAL) == "queue_timeout"
+        assert limiter.get_stats()["waiting"] == 0
+        assert limiter.stats["shed"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_sheds_or_displaces_by_priority():
+    async def scenario():
+        limiter = make_limiter(max_queue_size=1)
+        assert await limiter.acquire(RequestPriority.NORMAL) is None
+        assert await limiter.acquire(RequestPriority.HIGH) is None
+
+        queued = asyncio.ensure_future(limiter.acquire(RequestPriority.NORMAL))
+        await asyncio.sleep(0)
+        assert await limiter.acquire(RequestPriority.NORMAL) == "queue_full"
+
+        # A higher priority request takes the queued request's place
+        high = asyncio.ensure_future(limiter.acquire(RequestPriority.HIGH))
+        assert await queued == "displaced"
+        limiter.release(time.monotonic(), sample=False)
+        assert await high is None
+
+    asyncio.run(scenario())
+
+
+def test_critical_requests_bypass_the_limit():
+    async def scenario():
+        limiter = make_limiter()
+        assert await limiter.acquire(RequestPriority.NORMAL) is None
+        assert await limiter.acquire(RequestPriority.CRITICAL) is None
+        assert limiter.in_flight == 2
+
+    asyncio.run(scenario())
+
+
+def test_rate_limiter_wraps_load_shedding():
+    """Rate limited responses never reach the concurrency limiter"""
+    from app.main import app
+
+    names = [middleware.cls.__name__ for middleware in app.user_middleware]
+    assert names.index("RateLimitMiddleware") < names.index("LoadSheddingMiddleware")
@@ -0,0 +1,131 @@
+"""
+Event loop monitor tests: lag timer, watchdog stack capture and the debug endpoint.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from app.api.v1 import debug as debug_api
+from app.core import security
+from app.core.loop_monitor import BACKGROUND_ENDPOINT, EventLoopMonitor, EventLoopMonitorMiddleware
+from app.core.security import get_current_active_user
+
+
+def block_loop(seconds: float):
+    time.sleep(seconds)
+
+
+async def call_app(app, path: str):
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "path": path, "raw_path": path.encode(),
+        "root_path": "", "scheme": "http", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent[0]["status"]
+
+
+def test_lag_timer_records_late_wakeups():
+    monitor = EventLoopMonitor(interval=0.01, slow_threshold=60)
+
+    async def scenario():
+        monitor.start()
+        assert monitor.running
+        await asyncio.sleep(0.05)
+        assert monitor.stats["samples"] > 0
+
+        block_loop(0.1)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(scenario())
+    assert not monitor.running
+    assert monitor.stats["max_lag"] >= 0.08
+    # Below the threshold, so no stack was captured
+    assert monitor.stats["blocked"] == 0
+
+
+def test_watchdog_captures_blocking_request_stack():
+    monitor = EventLoopMonitor(interval=0.01, slow_threshold=0.05)
+    app = FastAPI()
+
+    @app.get("/loop-test/items/{item_id}")
+    async def get_item(item_id: int):
+        block_loop(0.3)
+        return {"id": item_id}
+
+    wrapped = EventLoopMonitorMiddleware(app, monitor=monitor)
+
+    async def scenario():
+        monitor.start()
+        await asyncio.sleep(0.02)
+        assert await call_app(wrapped, "/loop-test/items/7") == 200
+        assert monitor.active_requests == {}
+        # Let the timer run once more to complete the report
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(scenario())
+
+    assert monitor.stats["blocked"] == 1
+    report = monitor.get_stats()["reports"][0]
+    assert report["endpoint"] == "/loop-test/items/{item_id}"
+    assert (report["method"], report["path"]) == ("GET", "/loop-test/items/7")
+    assert report["lag"] >= 0.25
+    assert any("block_loop" in line for line in report["stack"])
+    assert any("get_item" in line for line in report["stack"])
+
+
+def test_blocking_outside_requests_is_attributed_to_background():
+    monitor = EventLoopMonitor(interval=0.01, slow_threshold=0.05)
+
+    async def scenario():
+        monitor.start()
+        await asyncio.sleep(0.02)
+        block_loop(0.2)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(scenario())
+
+    report = monitor.get_stats(include_stacks=False)["reports"][0]
+    assert report["endpoint"] == BACKGROUND_ENDPOINT
+    assert report["path"] is None
+    assert "stack" not in report
+
+
+def make_debug_client(monkeypatch, email: str) -> TestClient:
+    monkeypatch.setattr(security.settings, "ADMIN_EMAILS", ["admin@example.com"])
+    app = FastAPI()
+    app.include_router(debug_api.router, prefix="/api/v1/debug")
+    app.dependency_overrides[get_current_active_user] = lambda: SimpleNamespace(email=email)
+    return TestClient(app)
+
+
+def test_event_loop_endpoint_requires_admin(monkeypatch):
+    response = make_debug_client(monkeypatch, "student@example.com").get("/api/v1/debug/event-loop")
+    assert response.status_code == 403
+
+    response = make_debug_client(monkeypatch, "Admin@Example.com").get(
+        "/api/v1/debug/event-loop", params={"include_stacks": False}
+    )
+    assert response.status_code == 200
+    assert {"running", "max_lag", "reports"} <= response.json().keys()
+
+
+def test_event_loop_endpoint_rejects_anonymous_requests():
+    app = FastAPI()
+    app.include_router(debug_api.router, prefix="/api/v1/debug")
+    assert TestClient(app).get("/api/v1/debug/event-loop").status_code in (401, 403)
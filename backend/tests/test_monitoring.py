@@ -0,0 +1,169 @@
+"""
+HTTP metrics middleware and system metrics collector tests.
+"""
+
+import threading
+import time
+
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+from starlette.responses import PlainTextResponse
+from starlette.testclient import TestClient
+
+from app.core import monitoring
+from app.core.monitoring import (
+    UNMATCHED_ROUTE,
+    PrometheusMiddleware,
+    SystemMetricsCollector,
+    get_health_status,
+)
+
+
+def request_count(method: str, endpoint: str, status_code: int) -> float:
+    value = REGISTRY.get_sample_value(
+        "http_requests_total",
+        {"method": method, "endpoint": endpoint, "status_code": str(status_code)},
+    )
+    return value or 0.0
+
+
+class RejectPaths:
+    """Answers some paths before routing, as the rate limiter does"""
+
+    def __init__(self, app, prefix: str):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.prefix):
+            await PlainTextResponse("slow down", status_code=429)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+def make_client() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/metrics-test/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    @app.get("/metrics-test/limited/{item_id}")
+    async def limited(item_id: int):
+        return {"id": item_id}
+
+    app.add_middleware(RejectPaths, prefix="/metrics-test/limited/")
+    app.add_middleware(PrometheusMiddleware)
+    return TestClient(app)
+
+
+def test_requests_are_labelled_by_route_template():
+    client = make_client()
+    endpoint = "/metrics-test/items/{item_id}"
+    before = request_count("GET", endpoint, 200)
+
+    for item_id in range(5):
+        assert client.get(f"/metrics-test/items/{item_id}").status_code == 200
+
+    assert request_count("GET", endpoint, 200) == before + 5
+    assert REGISTRY.get_sample_value(
+        "http_requests_total", {"method": "GET", "endpoint": "/metrics-test/items/3", "status_code": "200"}
+    ) is None
+
+
+def test_unrouted_paths_share_the_unmatched_label():
+    client = make_client()
+    before = request_count("GET", UNMATCHED_ROUTE, 404)
+
+    for path in ("/wp-admin.php", "/.env", "/metrics-test/nothing/here"):
+        assert client.get(path).status_code == 404
+
+    assert request_count("GET", UNMATCHED_ROUTE, 404) == before + 3
+
+
+def test_responses_before_routing_use_the_matching_template():
+    client = make_client()
+    endpoint = "/metrics-test/limited/{item_id}"
+    before = request_count("GET", endpoint, 429)
+
+    assert client.get("/metrics-test/limited/1").status_code == 429
+    assert client.get("/metrics-test/limited/2").status_code == 429
+
+    assert request_count("GET", endpoint, 429) == before + 2
+
+
+def test_unknown_methods_are_folded():
+    client = make_client()
+    before = request_count("OTHER", "/metrics-test/items/{item_id}", 405)
+
+    assert client.request("BREW", "/metrics-test/items/1").status_code == 405
+
+    assert request_count("OTHER", "/metrics-test/items/{item_id}", 405) == before + 1
+
+
+def test_collector_thread_fills_snapshot_and_stops():
+    collector = SystemMetricsCollector(interval=0.01)
+    sampled_on = []
+    sample = collector.sample
+
+    def recording_sample():
+        sampled_on.append(threading.current_thread().name)
+        return sample()
+
+    collector.sample = recording_sample
+    assert collector.snapshot() is None
+
+    collector.start()
+    thread = collector._thread
+    deadline = time.monotonic() + 5
+    while collector.snapshot() is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    collector.stop()
+
+    snapshot = collector.snapshot()
+    assert snapshot is not None
+    assert {"cpu_percent", "memory_percent", "disk_percent", "process"} <= snapshot.keys()
+    assert set(sampled_on) == {"system-metrics"}
+    assert not thread.is_alive()
+    assert collector._thread is None
+
+
+def test_stop_interrupts_the_sampling_interval():
+    collector = SystemMetricsCollector(interval=60)
+    collector.start()
+    thread = collector._thread
+
+    start = time.monotonic()
+    collector.stop()
+
+    assert not thread.is_alive()
+    assert time.monotonic() - start < 1
+
+
+def test_health_status_reads_the_snapshot_without_sampling(monkeypatch):
+    collector = SystemMetricsCollector()
+    monkeypatch.setattr(monitoring, "system_metrics", collector)
+
+    def blocked(*args, **kwargs):
+        raise AssertionError("psutil called on the event loop")
+
+    for name in ("cpu_percent", "virtual_memory", "disk_usage", "getloadavg"):
+        monkeypatch.setattr(monitoring.psutil, name, blocked)
+
+    assert get_health_status()["system"] is None
+
+    collector._snapshot = {
+        "timestamp": 1000.0,
+        "cpu_percent": 95.0,
+        "memory_percent": 85.0,
+        "memory_used_bytes": 1,
+        "disk_percent": 10.0,
+        "disk_used_bytes": 1,
+        "load_average": 2.0,
+        "process": {"cpu_percent": 5.0, "rss_bytes": 1, "threads": 4, "open_fds": 10},
+    }
+    status = get_health_status()
+    assert status["status"] == "degraded"
+    assert status["health_score"] == 60
+    assert status["system"]["cpu_percent"] == 95.0
+    assert status["system"]["sampled_at"] == 1000.0
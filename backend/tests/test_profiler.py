@@ -0,0 +1,159 @@
+"""
+Profiler tests: sampled collapsed stacks, per-request cProfile and the debug endpoints.
+"""
+
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from app.api.v1 import debug as debug_api
+from app.core import profiler as profiler_module
+from app.core import security
+from app.core.profiler import ProfilerBusyError, RequestProfileStore, RequestProfilingMiddleware, SamplingProfiler
+from app.core.security import get_current_active_user
+
+
+def spin_for_profile(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def start_thread(name: str, target, *args) -> threading.Thread:
+    thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_profile_returns_collapsed_stacks():
+    stop = threading.Event()
+    busy = start_thread("busy-worker", spin_for_profile, stop)
+    idle = start_thread("idle-worker", threading.Event().wait, 5)
+    try:
+        output = SamplingProfiler().profile(0.2, interval=0.005)
+    finally:
+        stop.set()
+        busy.join()
+
+    lines = output.strip().split("\n")
+    parsed = [re.fullmatch(r"(.+) (\d+)", line).groups() for line in lines]
+    counts = [int(count) for _, count in parsed]
+    assert counts == sorted(counts, reverse=True)
+
+    busy_stacks = [stack.split(";") for stack, _ in parsed if stack.startswith("busy-worker;")]
+    assert busy_stacks
+    # Outermost frame first, each labelled "function (path:line)"
+    assert any(
+        frame.startswith("spin_for_profile (tests/test_profiler.py:")
+        for stack in busy_stacks for frame in stack
+    )
+    # Threads parked waiting are left out by default
+    assert not any(stack.startswith("idle-worker;") for stack, _ in parsed)
+    assert idle.is_alive()
+
+
+def test_profile_includes_idle_threads_on_request():
+    idle = start_thread("idle-worker", threading.Event().wait, 5)
+    output = SamplingProfiler().profile(0.05, interval=0.005, include_idle=True)
+    assert idle.is_alive()
+    assert any(line.startswith("idle-worker;") for line in output.split("\n"))
+
+
+def test_concurrent_profile_is_refused():
+    profiler = SamplingProfiler()
+    first = start_thread("first-profile", profiler.profile, 0.5, 0.01)
+    deadline = time.monotonic() + 1
+    while not profiler._lock.locked() and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+    with pytest.raises(ProfilerBusyError):
+        profiler.profile(0.05)
+    first.join()
+    # Free again once the first profile finished
+    assert profiler.profile(0.01, 0.005).endswith("\n")
+
+
+def make_profiled_client(monkeypatch, store: RequestProfileStore, token: str = "s3cret") -> TestClient:
+    monkeypatch.setattr(profiler_module.settings, "PROFILING_TOKEN", token)
+    app = FastAPI()
+
+    @app.get("/profile-test/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    app.add_middleware(RequestProfilingMiddleware, store=store)
+    return TestClient(app)
+
+
+def test_request_with_token_is_profiled(monkeypatch):
+    store = RequestProfileStore()
+    client = make_profiled_client(monkeypatch, store)
+
+    response = client.get("/profile-test/items/1", headers={"X-Profile": "s3cret"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    (listed,) = store.list()
+    assert listed["id"] == profile_id
+    assert (listed["method"], listed["path"]) == ("GET", "/profile-test/items/1")
+    report = store.render(profile_id, limit=500)
+    assert report.startswith("GET /profile-test/items/1 took ")
+    assert "get_item" in report
+
+
+@pytest.mark.parametrize("configured, sent", [("s3cret", "wrong"), ("s3cret", None), ("", "")])
+def test_request_without_matching_token_is_not_profiled(monkeypatch, configured, sent):
+    store = RequestProfileStore()
+    client = make_profiled_client(monkeypatch, store, token=configured)
+
+    headers = {"X-Profile": sent} if sent is not None else {}
+    response = client.get("/profile-test/items/1", headers=headers)
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert store.list() == []
+
+
+def make_debug_client(monkeypatch, email: str) -> TestClient:
+    monkeypatch.setattr(security.settings, "ADMIN_EMAILS", ["admin@example.com"])
+    app = FastAPI()
+    app.include_router(debug_api.router, prefix="/api/v1/debug")
+    app.dependency_overrides[get_current_active_user] = lambda: SimpleNamespace(email=email)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "path", ["/api/v1/debug/profile?seconds=0.01", "/api/v1/debug/profiles", "/api/v1/debug/profiles/1-1"]
+)
+def test_profiling_endpoints_require_admin(monkeypatch, path):
+    assert make_debug_client(monkeypatch, "student@example.com").get(path).status_code == 403
+
+
+def test_profiling_endpoints_for_admins(monkeypatch):
+    store = RequestProfileStore()
+    monkeypatch.setattr(debug_api, "request_profiles", store)
+    make_profiled_client(monkeypatch, store).get("/profile-test/items/1", headers={"X-Profile": "s3cret"})
+    (profile,) = store.list()
+    client = make_debug_client(monkeypatch, "admin@example.com")
+
+    listed = client.get("/api/v1/debug/profiles").json()
+    assert [entry["id"] for entry in listed] == [profile["id"]]
+    report = client.get(f"/api/v1/debug/profiles/{profile['id']}", params={"sort": "tottime", "limit": 5})
+    assert report.status_code == 200
+    assert report.text.startswith("GET /profile-test/items/1")
+    assert client.get("/api/v1/debug/profiles/0-0").status_code == 404
+
+    sampled = client.get("/api/v1/debug/profile", params={"seconds": 0.05, "interval": 0.01, "include_idle": True})
+    assert sampled.status_code == 200
+    assert sampled.headers["content-type"].startswith("text/plain")
+    assert re.search(r" \d+$", sampled.text.strip().split("\n")[0])
+
+    async def busy(*args):
+        raise ProfilerBusyError("A profile is already running")
+
+    monkeypatch.setattr(debug_api.sampling_profiler, "profile_async", busy)
+    assert client.get("/api/v1/debug/profile", params={"seconds": 1}).status_code == 409
+    assert client.get("/api/v1/debug/profile", params={"seconds": 3600}).status_code == 422
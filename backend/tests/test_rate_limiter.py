@@ -0,0 +1,489 @@
+"""
+Rate limiter regression tests, run against fakeredis with a simulated clock.
+"""
+
+import asyncio
+
+import fakeredis
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from app.core import rate_limiter as rate_limiter_module
+from app.core.circuit_breaker import BreakerRedis, CircuitState
+from app.core.rate_limiter import (
+    MemoryStore,
+    RateLimit,
+    RateLimiter,
+    RateLimitMiddleware,
+    RateLimitRouter,
+    RateLimitRule,
+    RateLimitStrategy,
+)
+
+
+class FakeClock:
+    """Stands in for the time module inside rate_limiter"""
+
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+async def admitted_per_window(rate_limit: RateLimit, windows: int, requests_per_window: int, clock: FakeClock):
+    limiter = RateLimiter()
+    limiter.redis_client = fakeredis.FakeAsyncRedis()
+    limiter._register_scripts()
+    await limiter._load_scripts()
+
+    step = rate_limit.window / requests_per_window
+    admitted = []
+    for _ in range(windows):
+        count = 0
+        for _ in range(requests_per_window):
+            allowed, _ = await limiter.check_rate_limit("client", rate_limit)
+            count += allowed
+            clock.now += step
+        admitted.append(count)
+    await limiter.redis_client.aclose()
+    return admitted
+
+
+@pytest.mark.parametrize("lease_size", [None, 10])
+def test_sliding_window_counter_sustained_overload(monkeypatch, lease_size):
+    """A client kept over its limit is admitted about the limit in every window"""
+    # Start exactly on a window boundary
+    clock = FakeClock(1_000_000.0)
+    monkeypatch.setattr(rate_limiter_module, "time", clock)
+    rate_limit = RateLimit(100, 2, RateLimitStrategy.SLIDING_WINDOW_COUNTER, lease_size=lease_size)
+
+    admitted = asyncio.run(admitted_per_window(rate_limit, windows=4, requests_per_window=500, clock=clock))
+
+    assert admitted[0] == 100
+    for count in admitted[1:]:
+        # Never over the limit, and not locked out once the window turns over
+        assert 90 <= count <= 100, admitted
+
+
+def test_fixed_window_lease_refused_until_window_end(monkeypatch):
+    clock = FakeClock(1_000_000.0)
+    monkeypatch.setattr(rate_limiter_module, "time", clock)
+    rate_limit = RateLimit(100, 2, RateLimitStrategy.FIXED_WINDOW, lease_size=10)
+
+    admitted = asyncio.run(admitted_per_window(rate_limit, windows=3, requests_per_window=500, clock=clock))
+
+    assert admitted == [100, 100, 100]
+
+
+class FakeBreakerRedis(fakeredis.FakeAsyncRedis, BreakerRedis):
+    """BreakerRedis over a fakeredis server, whose PING can be made to hang"""
+
+    probe_delay = 0.0
+
+    async def probe(self):
+        await asyncio.sleep(self.probe_delay)
+        return await super().probe()
+
+
+def test_sync_task_uses_redis_again_after_recovery(monkeypatch):
+    """A Celery task ending mid-probe does not keep later tasks off Redis"""
+    from app.tasks.plugin_sync import _with_rate_limiter
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(rate_limiter_module, "BreakerRedis", lambda **kwargs: FakeBreakerRedis(server=server, **kwargs))
+    limiter = RateLimiter()
+    breaker = limiter.breaker
+    breaker.recovery_timeout = 0.01
+    monkeypatch.setattr(rate_limiter_module, "rate_limiter", limiter)
+    monkeypatch.setattr("app.tasks.plugin_sync.rate_limiter", limiter)
+
+    async def sync_while_redis_hangs():
+        # The task finishes while the breaker's PING is still waiting
+        FakeBreakerRedis.probe_delay = 10
+        while breaker.state is not CircuitState.HALF_OPEN:
+            await asyncio.sleep(0.01)
+        return limiter.redis_client
+
+    async def sync():
+        return limiter.redis_client
+
+    server.connected = False
+    assert asyncio.run(_with_rate_limiter(sync_while_redis_hangs())) is None
+
+    server.connected = True
+    FakeBreakerRedis.probe_delay = 0.0
+    assert asyncio.run(_with_rate_limiter(sync())) is not None
+    assert breaker.allow()
+
+
+def test_leases_stay_bounded_within_one_window(monkeypatch):
+    """Clients rotating identifiers inside one window cannot grow the lease table"""
+    clock = FakeClock(1_000_000.0)
+    monkeypatch.setattr(rate_limiter_module, "time", clock)
+    rate_limit = RateLimit(100, 60, lease_size=10)
+
+    async def scenario():
+        limiter = RateLimiter(max_leases=100)
+        limiter.redis_client = fakeredis.FakeAsyncRedis()
+        limiter._register_scripts()
+        await limiter._load_scripts()
+
+        for i in range(1000):
+            allowed, _ = await limiter.check_rate_limit(f"client-{i}", rate_limit)
+            assert allowed
+            assert len(limiter.leases) <= 100
+
+        # The most recent client keeps its lease
+        assert "client-999" in limiter.leases
+        assert limiter.lease_stats["evicted_leases"] >= 900
+        await limiter.redis_client.aclose()
+
+    asyncio.run(scenario())
+
+
+async def make_redis_limiter() -> RateLimiter:
+    limiter = RateLimiter()
+    limiter.redis_client = fakeredis.FakeAsyncRedis()
+    limiter._register_scripts()
+    await limiter._load_scripts()
+    return limiter
+
+
+async def count_admitted(limiter: RateLimiter, rate_limit: RateLimit, requests: int) -> int:
+    results = await asyncio.gather(*[
+        limiter.check_rate_limit("client", rate_limit) for _ in range(requests)
+    ])
+    return sum(allowed for allowed, _ in results)
+
+
+@pytest.mark.parametrize("strategy", [
+    RateLimitStrategy.TOKEN_BUCKET,
+    RateLimitStrategy.LEAKY_BUCKET,
+    RateLimitStrategy.SLIDING_WINDOW,
+])
+@pytest.mark.parametrize("backend", ["redis", "memory"])
+def test_bucket_scripts_admit_exactly_the_limit(monkeypatch, strategy, backend):
+    """Concurrent checks never overshoot, and capacity returns at the configured rate"""
+    clock = FakeClock(1_000_000.0)
+    monkeypatch.setattr(rate_limiter_module, "time", clock)
+    # 1 request per second, bursts of 10
+    rate_limit = RateLimit(10, 10, strategy)
+
+    async def scenario():
+        limiter = await make_redis_limiter() if backend == "redis" else RateLimiter()
+
+        assert await count_admitted(limiter, rate_limit, 50) == 10
+        if strategy == RateLimitStrategy.SLIDING_WINDOW:
+            # Refused requests count too, so capacity returns once they leave the window
+            clock.now += rate_limit.window + 1
+            expected = 10
+        else:
+            clock.now += 3
+            expected = 3
+        assert await count_admitted(limiter, rate_limit, 50) == expected
+
+        if backend == "redis":
+            await limiter.redis_client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_state_keeps_fractional_tokens(monkeypatch):
+    clock = FakeClock(1_000_000.0)
+    monkeypatch.setattr(rate_limiter_module, "time", clock)
+    rate_limit = RateLimit(10, 10, RateLimitStrategy.TOKEN_BUCKET, burst=1)
+
+    async def scenario():
+        limiter = await make_redis_limiter()
+        assert await count_admitted(limiter, rate_limit, 1) == 1
+
+        # Half a token twice makes one whole token
+        clock.now += 0.5
+        assert await count_admitted(limiter, rate_limit, 1) == 0
+        clock.now += 0.5
+        assert await count_admitted(limiter, rate_limit, 1) == 1
+
+        assert await limiter.redis_client.ttl("rate_limit:token:client") == 20
+        await limiter.redis_client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_memory_store_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(rate_limiter_module, "time", FakeClock(1000.0))
+    store = MemoryStore(max_entries=3)
+    for key in ("a", "b", "c"):
+        store.set(key, key, ttl=60)
+    assert store.get("a") == "a"  # "b" is now least recently used
+
+    store.set("d", "d", ttl=60)
+    assert len(store) == 3
+    assert "b" not in store
+    assert store.get("a") == "a"
+    assert store.stats["evicted"] == 1
+
+
+def test_memory_store_expires_entries(monkeypatch):
+    clock = FakeClock(1000.0)
+    monkeypatch.setattr(rate_limiter_module, "time", clock)
+    store = MemoryStore(sweep_interval=30)
+    store.set("short", 1, ttl=5)
+    store.set("long", 2, ttl=60)
+    for i in range(10):
+        store.set(f"idle-{i}", i, ttl=10)
+
+    clock.now += 6
+    assert store.get("short") is None
+    assert store.stats["expired"] == 1
+    # Expired entries nobody reads again are dropped by the periodic sweep
+    assert len(store) == 11
+
+    clock.now += 30
+    assert store.get("long") == 2
+    assert len(store) == 1
+    assert store.stats["expired"] == 11
+
+
+def test_memory_fallback_stays_bounded_under_many_clients(monkeypatch):
+    monkeypatch.setattr(rate_limiter_module, "time", FakeClock(1_000_000.0))
+    limiter = RateLimiter()
+    limiter.memory_store = MemoryStore(max_entries=100)
+    rate_limit = RateLimit(5, 60)
+
+    async def scenario():
+        for i in range(1000):
+            allowed, _ = await limiter.check_rate_limit(f"client-{i}", rate_limit)
+            assert allowed
+
+    asyncio.run(scenario())
+    assert len(limiter.memory_store) == 100
+
+
+def test_route_trie_resolution_precedence():
+    limit = RateLimit(1, 60)
+    rules = [
+        RateLimitRule("/api/items/{item_id}", (limit,), name="item"),
+        RateLimitRule("/api/items/featured", (limit,), name="featured"),
+        RateLimitRule("/api/items/{item_id}/history", (limit,), name="history"),
+        RateLimitRule("/api/items/featured/**", (limit,), name="featured-subtree"),
+        RateLimitRule("/api/items/{item_id}", (limit,), methods=("post",), name="item-write"),
+        RateLimitRule("/api/items/{item_id}", (limit,), tiers=("premium",), name="item-premium"),
+        RateLimitRule("/api/items/{item_id}", (limit,), name="shadowed"),
+        RateLimitRule("/api/**", (limit,), name="api"),
+        RateLimitRule("/**", (limit,), name="default"),
+    ]
+    router = RateLimitRouter(rules)
+
+    def resolve(path, method="GET", tier="anonymous"):
+        rule = router.resolve(method, path, tier)
+        return rule.name if rule else None
+
+    # Static segments beat {param} segments
+    assert resolve("/api/items/featured") == "featured"
+    assert resolve("/api/items/42") == "item"
+    # An exact rule beats a subtree rule at the same node
+    assert resolve("/api/items/featured/history") == "featured-subtree"
+    assert resolve("/api/items/42/history") == "history"
+    # The deepest matching subtree wins, up to the catch-all
+    assert resolve("/api/items/42/history/7") == "api"
+    assert resolve("/api/other") == "api"
+    assert resolve("/") == "default"
+    assert resolve("/static/app.js") == "default"
+    # Method and tier specific rules beat wildcards; the first declared wins
+    assert resolve("/api/items/42", method="post") == "item-write"
+    assert resolve("/api/items/42", tier="premium") == "item-premium"
+    # Trailing and repeated slashes do not change the route
+    assert resolve("/api/items//42/") == "item"
+
+
+def test_route_trie_falls_back_from_static_to_param_branch():
+    limit = RateLimit(1, 60)
+    router = RateLimitRouter([
+        RateLimitRule("/users/me", (limit,), name="me"),
+        RateLimitRule("/users/{user_id}/courses", (limit,), name="courses"),
+    ])
+
+    # "me" matches the static branch, which has no "courses" child
+    assert router.resolve("GET", "/users/me/courses", "user").name == "courses"
+    assert router.resolve("GET", "/users/me/other", "user") is None
+
+    with pytest.raises(ValueError):
+        RateLimitRouter([RateLimitRule("/users/**/courses", (limit,))])
+
+
+def test_default_rules_and_custom_rule_precedence():
+    middleware = RateLimitMiddleware(app=None, rate_limits={"/api/v1/auth/login": RateLimit(3, 60)})
+    router = middleware.router
+
+    assert router.resolve("GET", "/health", "anonymous").limits == ()
+    assert router.resolve("POST", "/api/v1/auth/login", "anonymous").limits == (RateLimit(3, 60),)
+    assert router.resolve("POST", "/api/v1/auth/register", "anonymous").name == "auth"
+    assert router.resolve("POST", "/api/v1/resources/upload", "user").name == "upload"
+    assert router.resolve("GET", "/api/v1/resources/upload", "user").name == "default"
+
+
+@pytest.mark.parametrize("strategy", [RateLimitStrategy.FIXED_WINDOW, RateLimitStrategy.SLIDING_WINDOW_COUNTER])
+def test_renewal_finishing_after_window_end_moves_to_new_window(monkeypatch, strategy):
+    """A refused renewal that lands after the window turns over is not retried on the old window"""
+    clock = FakeClock(1_000_020.0)  # window [1_000_020, 1_000_080)
+    monkeypatch.setattr(rate_limiter_module, "time", clock)
+    rate_limit = RateLimit(10, 60, strategy, lease_size=10)
+
+    async def scenario():
+        limiter = await make_redis_limiter()
+        assert await count_admitted(limiter, rate_limit, 10) == 10
+
+        lease_script = limiter.scripts["lease"]
+        calls = []
+
+        async def slow_lease(keys, args):
+            calls.append(keys[0])
+            result = await lease_script(keys=keys, args=args)
+            if len(calls) == 1:
+                # The refusal comes back just after the window ended
+                clock.now = 1_000_081.0
+            return result
+
+        limiter.scripts["lease"] = slow_lease
+        allowed, metadata = await asyncio.wait_for(limiter.check_rate_limit("client", rate_limit), 1)
+
+        prefix = limiter._lease_prefix(rate_limit)
+        assert calls == [
+            f"rate_limit:{prefix}:client:1000020",
+            f"rate_limit:{prefix}:client:1000080",
+        ]
+        # Only a sliding window counter still weighs the full previous window
+        assert allowed == (strategy == RateLimitStrategy.FIXED_WINDOW)
+        assert metadata["reset"] == 1_000_140
+        await limiter.redis_client.aclose()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize(
+    "strategy",
+    [RateLimitStrategy.SLIDING_WINDOW, RateLimitStrategy.TOKEN_BUCKET, RateLimitStrategy.LEAKY_BUCKET],
+)
+def test_lease_size_rejected_for_unsupported_strategies(strategy):
+    with pytest.raises(ValueError, match=strategy.value):
+        RateLimit(10, 60, strategy, lease_size=5)
+    assert RateLimit(10, 60, strategy).lease_size is None
+
+
+@pytest.mark.parametrize("strategy", [RateLimitStrategy.FIXED_WINDOW, RateLimitStrategy.SLIDING_WINDOW_COUNTER])
+def test_toggling_lease_size_keeps_window_usage(monkeypatch, strategy):
+    """Leased and unleased checks count against the same keys"""
+    clock = FakeClock(1_000_020.0)
+    monkeypatch.setattr(rate_limiter_module, "time", clock)
+
+    async def scenario():
+        limiter = await make_redis_limiter()
+        assert await count_admitted(limiter, RateLimit(10, 60, strategy), 6) == 6
+        # Turning leases on mid-window leaves only the remaining budget
+        assert await count_admitted(limiter, RateLimit(10, 60, strategy, lease_size=3), 10) == 4
+        await limiter.redis_client.aclose()
+
+    asyncio.run(scenario())
+
+
+def make_limited_client(monkeypatch) -> TestClient:
+    monkeypatch.setattr(rate_limiter_module, "time", FakeClock(1_000_020.0))
+    monkeypatch.setattr(rate_limiter_module, "rate_limiter", RateLimiter())
+    app = FastAPI()
+
+    @app.get("/rl-test/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    app.add_middleware(RateLimitMiddleware, rate_limits={"/rl-test/items/{item_id}": RateLimit(2, 60)})
+    return TestClient(app)
+
+
+def test_middleware_headers_on_allowed_and_limited_responses(monkeypatch):
+    client = make_limited_client(monkeypatch)
+
+    first = client.get("/rl-test/items/1")
+    assert first.status_code == 200
+    assert first.json() == {"id": 1}
+    assert first.headers["X-RateLimit-Limit"] == "2"
+    assert first.headers["X-RateLimit-Remaining"] == "1"
+    assert first.headers["X-RateLimit-Reset"] == "1000080"
+
+    assert client.get("/rl-test/items/2").headers["X-RateLimit-Remaining"] == "0"
+
+    limited = client.get("/rl-test/items/3")
+    assert limited.status_code == 429
+    assert limited.json()["error"] == "Rate limit exceeded"
+    assert limited.headers["X-RateLimit-Limit"] == "2"
+    assert limited.headers["X-RateLimit-Remaining"] == "0"
+    assert limited.headers["X-RateLimit-Reset"] == "1000080"
+    assert limited.headers["Retry-After"] == "60"
+
+
+def test_middleware_streams_response_body_through(monkeypatch):
+    monkeypatch.setattr(rate_limiter_module, "rate_limiter", RateLimiter())
+    chunks = [b"a", b"b", b"c"]
+
+    async def streaming_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    middleware = RateLimitMiddleware(streaming_app)
+    scope = {
+        "type": "http", "method": "GET", "path": "/api/v1/courses", "query_string": b"",
+        "headers": [], "client": ("10.0.0.1", 1234),
+    }
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, None, send))
+
+    # Every chunk is forwarded as its own message, not buffered into one
+    assert [message.get("body") for message in sent[1:]] == chunks + [b""]
+    headers = dict(sent[0]["headers"])
+    assert headers[b"x-ratelimit-limit"] == b"100"
+    assert headers[b"x-ratelimit-remaining"] == b"99"
+
+
+@pytest.mark.parametrize("scope_type", ["websocket", "lifespan"])
+def test_middleware_passes_non_http_scopes_through(monkeypatch, scope_type):
+    limiter = RateLimiter()
+    monkeypatch.setattr(rate_limiter_module, "rate_limiter", limiter)
+    calls = []
+
+    async def inner_app(scope, receive, send):
+        calls.append((scope, receive, send))
+
+    async def receive():
+        return {}
+
+    async def send(message):
+        pass
+
+    scope = {"type": scope_type, "path": "/ws"}
+    asyncio.run(RateLimitMiddleware(inner_app)(scope, receive, send))
+
+    assert calls == [(scope, receive, send)]
+    assert len(limiter.memory_store) == 0
+
+
+def test_main_app_registers_plain_asgi_middlewares_in_order():
+    """Prometheus wraps the rate limiter, so 429s are counted; neither buffers responses"""
+    from starlette.middleware.base import BaseHTTPMiddleware
+
+    from app.core.monitoring import PrometheusMiddleware
+    from app.main import app
+
+    names = [middleware.cls.__name__ for middleware in app.user_middleware]
+    assert names.index("PrometheusMiddleware") < names.index("RateLimitMiddleware")
+    assert not issubclass(RateLimitMiddleware, BaseHTTPMiddleware)
+    assert not issubclass(PrometheusMiddleware, BaseHTTPMiddleware)
@@ -0,0 +1,195 @@
+"""
+Tracer tests: sampling, context propagation, OTLP/JSON export and client span hooks.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from yarl import URL
+
+from app.core import database
+from app.core import tracing
+from app.core.tracing import NON_RECORDING_SPAN, SpanKind, StatusCode, Tracer
+
+
+class ListExporter:
+    def __init__(self):
+        self.payloads = []
+
+    def export(self, payload):
+        self.payloads.append(payload)
+
+
+def make_tracer(monkeypatch, sample_rate: float = 1.0) -> Tracer:
+    tracer = Tracer(enabled=True, sample_rate=sample_rate, exporter=ListExporter())
+    monkeypatch.setattr(tracing, "tracer", tracer)
+    monkeypatch.setattr(database, "tracer", tracer)
+    return tracer
+
+
+def exported_spans(tracer: Tracer):
+    tracer.flush()
+    return [
+        span
+        for payload in tracer.exporter.payloads
+        for resource in payload["resourceSpans"]
+        for scope in resource["scopeSpans"]
+        for span in scope["spans"]
+    ]
+
+
+def test_sampling_is_decided_once_per_root(monkeypatch):
+    tracer = make_tracer(monkeypatch, sample_rate=0.5)
+    draws = iter([0.2, 0.9])
+    monkeypatch.setattr(tracing.random, "random", lambda: next(draws))
+
+    with tracer.start_span("sampled root") as root:
+        assert root.sampled
+        with tracer.start_span("child") as child:
+            assert child.sampled and child.trace_id == root.trace_id
+
+    with tracer.start_span("unsampled root") as root:
+        assert not root.sampled
+        # Children follow the root instead of drawing again
+        with tracer.start_span("child") as child:
+            assert child is NON_RECORDING_SPAN
+    assert tracer.current_span() is None
+
+    assert [span["name"] for span in exported_spans(tracer)] == ["child", "sampled root"]
+
+
+def test_parent_propagates_through_contextvars(monkeypatch):
+    tracer = make_tracer(monkeypatch)
+
+    async def handler():
+        with tracer.start_span("request", kind=SpanKind.SERVER) as root:
+            async def work(name):
+                with tracer.start_span(name) as span:
+                    await asyncio.sleep(0)
+                    return span
+
+            first, second = await asyncio.gather(work("first"), work("second"))
+            assert tracer.current_span() is root
+        return root, first, second
+
+    root, first, second = asyncio.run(handler())
+    assert root.parent_id is None
+    for span in (first, second):
+        assert (span.trace_id, span.parent_id) == (root.trace_id, root.span_id)
+    assert tracer.current_span() is None
+
+
+def test_client_spans_require_a_parent(monkeypatch):
+    tracer = make_tracer(monkeypatch)
+
+    span = tracer.start_span("redis.GET", kind=SpanKind.CLIENT, require_parent=True)
+    assert span is NON_RECORDING_SPAN
+    with span:
+        assert tracer.current_span() is None
+
+    with tracer.start_span("request") as root:
+        with tracer.start_span("redis.GET", kind=SpanKind.CLIENT, require_parent=True) as client:
+            assert client.parent_id == root.span_id
+
+    assert [span["name"] for span in exported_spans(tracer)] == ["redis.GET", "request"]
+
+
+def test_otlp_json_payload_shape(monkeypatch):
+    tracer = make_tracer(monkeypatch)
+
+    with tracer.start_span("request", kind=SpanKind.SERVER, attributes={"http.method": "GET"}) as root:
+        root.set_attribute("http.status_code", 200)
+        root.set_attribute("cache.hit", True)
+        root.set_attribute("ratio", 0.5)
+        root.set_attribute("missing", None)
+        with pytest.raises(ValueError):
+            with tracer.start_span("failing"):
+                raise ValueError("bad input")
+
+    tracer.flush()
+    (payload,) = tracer.exporter.payloads
+    (resource,) = payload["resourceSpans"]
+    assert {"key": "service.name", "value": {"stringValue": tracing.SERVICE_NAME}} in resource["resource"]["attributes"]
+    (scope,) = resource["scopeSpans"]
+    assert scope["scope"] == {"name": "app.core.tracing"}
+    failing, request = scope["spans"]
+
+    assert request["traceId"] == root.trace_id and len(request["traceId"]) == 32
+    assert len(request["spanId"]) == 16
+    assert request["parentSpanId"] == ""
+    assert request["kind"] == int(SpanKind.SERVER)
+    assert int(request["endTimeUnixNano"]) >= int(request["startTimeUnixNano"])
+    assert request["attributes"] == [
+        {"key": "http.method", "value": {"stringValue": "GET"}},
+        {"key": "http.status_code", "value": {"intValue": "200"}},
+        {"key": "cache.hit", "value": {"boolValue": True}},
+        {"key": "ratio", "value": {"doubleValue": 0.5}},
+    ]
+    assert request["status"] == {"code": int(StatusCode.UNSET), "message": ""}
+
+    assert failing["parentSpanId"] == request["spanId"]
+    assert failing["status"] == {"code": int(StatusCode.ERROR), "message": "bad input"}
+    assert {"key": "exception.type", "value": {"stringValue": "ValueError"}} in failing["attributes"]
+
+
+def test_database_hooks_record_query_spans(monkeypatch):
+    tracer = make_tracer(monkeypatch)
+    conn = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+
+    # Outside a trace, queries are not recorded
+    context = SimpleNamespace()
+    database.receive_before_cursor_execute(conn, None, "SELECT 1", None, context, False)
+    assert context._trace_span is NON_RECORDING_SPAN
+    database.receive_after_cursor_execute(conn, None, "SELECT 1", None, context, False)
+
+    with tracer.start_span("request") as root:
+        context = SimpleNamespace()
+        database.receive_before_cursor_execute(conn, None, "SELECT * FROM users", None, context, False)
+        database.receive_after_cursor_execute(conn, None, "SELECT * FROM users", None, context, False)
+
+        failed = SimpleNamespace()
+        database.receive_before_cursor_execute(conn, None, "SELECT broken", None, failed, False)
+        database.receive_handle_error(SimpleNamespace(
+            execution_context=failed, original_exception=RuntimeError("syntax error"),
+        ))
+
+    query, error, _ = tracer._queue
+    assert query.parent_id == root.span_id
+    assert query.kind is SpanKind.CLIENT
+    assert query.attributes["db.system"] == "postgresql"
+    assert query.attributes["db.statement"] == "SELECT * FROM users"
+    assert error.status is StatusCode.ERROR
+    assert error.attributes["exception.type"] == "RuntimeError"
+
+
+def test_aiohttp_hooks_record_client_spans(monkeypatch):
+    tracer = make_tracer(monkeypatch)
+    url = URL("https://api.github.com/repos/org/repo?access_token=secret")
+
+    async def scenario():
+        with tracer.start_span("request") as root:
+            ok = SimpleNamespace()
+            await tracing._on_request_start(None, ok, SimpleNamespace(method="GET", url=url))
+            await tracing._on_request_end(None, ok, SimpleNamespace(response=SimpleNamespace(status=404)))
+
+            failed = SimpleNamespace()
+            await tracing._on_request_start(None, failed, SimpleNamespace(method="POST", url=url))
+            await tracing._on_request_exception(None, failed, SimpleNamespace(exception=TimeoutError("slow")))
+        return root
+
+    root = asyncio.run(scenario())
+    not_found, timed_out, _ = tracer._queue
+
+    assert not_found.name == "HTTP GET"
+    assert not_found.parent_id == root.span_id
+    assert not_found.attributes["http.url"] == "https://api.github.com/repos/org/repo"
+    assert not_found.attributes["net.peer.name"] == "api.github.com"
+    assert not_found.attributes["http.status_code"] == 404
+    assert not_found.status is StatusCode.ERROR
+    assert timed_out.attributes["exception.type"] == "TimeoutError"
+
+    # Calls outside a trace get no span
+    context = SimpleNamespace()
+    asyncio.run(tracing._on_request_start(None, context, SimpleNamespace(method="GET", url=url)))
+    assert context.span is NON_RECORDING_SPAN